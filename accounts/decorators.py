@@ -1,7 +1,12 @@
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
+from django.conf import settings
+from django.db import connection
 from functools import wraps
 from django.shortcuts import render
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def group_required(group_name):
@@ -24,3 +29,35 @@ def group_required(group_name):
         
         return _wrapped_view
     return decorator
+
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL queries a view may run to render its page, whatever
+    the number of rows.
+    The budget is checked by the query budget tests (see staff/tests.py); with
+    DEBUG on, requests that go over it are also logged as warnings.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not settings.DEBUG:
+                return view_func(request, *args, **kwargs)
+
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                response = view_func(request, *args, **kwargs)
+            if len(queries) > max_queries:
+                logger.warning(
+                    "%s ran %s queries, over its budget of %s", view_func.__name__, len(queries), max_queries
+                )
+            return response
+
+        _wrapped_view.query_budget = max_queries
+        return _wrapped_view
+    return decorator
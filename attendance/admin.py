@@ -1,6 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import AttendanceLog, LeaveRequest
+from .models import AttendanceLog, AttendanceSummary, CalendarDay, LeaveRequest, PunchCompaction, PunchEvent, ShiftSchedule, TimeClock
 
 @admin.register(AttendanceLog)
 class AttendanceLogAdmin(admin.ModelAdmin):
@@ -9,24 +9,45 @@ class AttendanceLogAdmin(admin.ModelAdmin):
     search_fields = ("employee__employee_no", "employee__last_name", "employee__first_name")
     date_hierarchy = "date"
     ordering = ("-date", "employee__employee_no")
+    list_select_related = ("employee", "summary")
     
     def employee_no(self, obj):
         return obj.employee.employee_no
     employee_no.short_description = "Employee ID"
     
     def work_hours(self, obj):
-        if obj.time_in and obj.time_out:
-            from datetime import datetime, timedelta
-            time_in = datetime.combine(obj.date, obj.time_in)
-            time_out = datetime.combine(obj.date, obj.time_out)
-            if time_out < time_in:  # Handle overnight shifts
-                time_out += timedelta(days=1)
-            duration = time_out - time_in
-            hours = duration.total_seconds() / 3600
-            return f"{hours:.2f} hrs"
+        summary = getattr(obj, "summary", None)
+        if summary and summary.complete:
+            return f"{summary.worked_hours:.2f} hrs"
         return "Incomplete"
     work_hours.short_description = "Work Hours"
 
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ("date", "employee", "present", "complete", "work_hours", "overtime_hours", "late_minutes", "night_hours", "updated_at")
+    list_filter = ("date", "present", "complete", "employee__department")
+    search_fields = ("employee__employee_no", "employee__last_name", "employee__first_name")
+    date_hierarchy = "date"
+    ordering = ("-date", "employee__employee_no")
+    list_select_related = ("employee",)
+    readonly_fields = ("log", "employee", "date", "present", "complete", "worked_seconds", "overtime_seconds", "late_seconds", "night_seconds", "updated_at")
+    
+    def has_add_permission(self, request):
+        # Rows are maintained from AttendanceLog
+        return False
+    
+    def work_hours(self, obj):
+        return f"{obj.worked_hours:.2f} hrs"
+    work_hours.short_description = "Work Hours"
+    
+    def overtime_hours(self, obj):
+        return f"{obj.overtime_hours:.2f} hrs"
+    overtime_hours.short_description = "Overtime"
+    
+    def night_hours(self, obj):
+        return f"{obj.night_hours:.2f} hrs"
+    night_hours.short_description = "Night Hours"
+
 @admin.register(LeaveRequest)
 class LeaveRequestAdmin(admin.ModelAdmin):
     list_display = ("employee", "employee_no", "leave_type", "start_date", "end_date", "days_count", "status_badge", "decided_by", "created_at")
@@ -68,3 +89,74 @@ class LeaveRequestAdmin(admin.ModelAdmin):
             color, obj.get_status_display()
         )
     status_badge.short_description = "Status"
+
+@admin.register(CalendarDay)
+class CalendarDayAdmin(admin.ModelAdmin):
+    list_display = ("date", "weekday", "name", "kind")
+    list_filter = ("kind",)
+    search_fields = ("name",)
+    date_hierarchy = "date"
+    ordering = ("date",)
+    
+    def weekday(self, obj):
+        return obj.date.strftime("%A")
+    weekday.short_description = "Day"
+
+@admin.register(ShiftSchedule)
+class ShiftScheduleAdmin(admin.ModelAdmin):
+    list_display = ("name", "applies_to", "start_time", "end_time", "grace_minutes")
+    list_filter = ("department",)
+    search_fields = ("name", "department", "employee__employee_no", "employee__last_name")
+    list_select_related = ("employee",)
+    autocomplete_fields = ("employee",)
+    
+    def applies_to(self, obj):
+        if obj.employee_id:
+            return obj.employee
+        return obj.department or "Everyone else"
+    applies_to.short_description = "Applies To"
+
+@admin.register(PunchEvent)
+class PunchEventAdmin(admin.ModelAdmin):
+    list_display = ("punched_at", "employee", "device", "received_at", "compacted")
+    list_filter = ("compacted", "device")
+    search_fields = ("employee__employee_no", "employee__last_name", "device")
+    date_hierarchy = "punched_at"
+    list_select_related = ("employee",)
+    readonly_fields = ("employee", "punched_at", "device", "received_at", "compacted")
+    
+    def has_add_permission(self, request):
+        # Punches come from the time clocks and are never edited
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(PunchCompaction)
+class PunchCompactionAdmin(admin.ModelAdmin):
+    list_display = ("last_event_id", "events", "updated_at")
+    readonly_fields = ("last_event_id", "events", "updated_at")
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(TimeClock)
+class TimeClockAdmin(admin.ModelAdmin):
+    list_display = ("name", "active", "last_seen_at", "created_at")
+    list_filter = ("active",)
+    search_fields = ("name",)
+    readonly_fields = ("last_seen_at", "created_at")
+    actions = ["issue_new_tokens"]
+    
+    def save_model(self, request, obj, form, change):
+        token = None if change else obj.issue_token()
+        super().save_model(request, obj, form, change)
+        if token:
+            messages.warning(request, f"Token for {obj.name} (shown only once): {token}")
+    
+    @admin.action(description="Issue new tokens (the old ones stop working)")
+    def issue_new_tokens(self, request, queryset):
+        for clock in queryset:
+            token = clock.issue_token()
+            clock.save(update_fields=["token_hash"])
+            messages.warning(request, f"Token for {clock.name} (shown only once): {token}")
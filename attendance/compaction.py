@@ -0,0 +1,108 @@
+"""
+Punch compaction
+Time clocks append PunchEvent rows, any number per person per day, and
+payroll reads one AttendanceLog per day. compact_punches folds the punches
+not yet marked compacted into those daily rows: first punch in, last punch
+out. A punch belongs to the workday that starts
+DAY_STARTS_BEFORE_SHIFT before the employee's shift, so a night shift's
+morning punch closes the previous day's log and the time out is earlier
+than the time in, as attendance summaries expect for overnight shifts.
+Only the days that received punches are recomputed, each from all of its
+punches, with one query for the punches, one upsert for the logs, one for
+their summaries and one update marking the punches per batch. Each punch is
+marked by id rather than found past a high-water mark: ids are handed out
+before commit, so a slow writer can commit a punch below ids already
+compacted, and it is still picked up by the next pass.
+"""
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.utils import timezone
+from .importer import upsert_logs
+from .models import AttendanceLog, PunchCompaction, PunchEvent
+from .shifts import seconds, shifts_for
+
+
+BATCH_SIZE = 5000
+# A workday runs for 24 hours from this long before the shift start
+DAY_STARTS_BEFORE_SHIFT = 6 * 3600
+
+
+def workday(punched_at, shift):
+    """Date of the workday a (local) punch time falls in"""
+    return (punched_at - timedelta(seconds=seconds(shift.start) - DAY_STARTS_BEFORE_SHIFT)).date()
+
+
+def fold_days(days, shifts):
+    """AttendanceLogs (unsaved) for the (employee id, workday) pairs from all of their punches"""
+    first_day = min(day for _, day in days)
+    last_day = max(day for _, day in days)
+    # Wide enough for any shift start; punches outside the wanted days are dropped below
+    window_start = timezone.make_aware(datetime.combine(first_day - timedelta(days=1), time()))
+    window_end = timezone.make_aware(datetime.combine(last_day + timedelta(days=2), time()))
+
+    spans = {}
+    for employee_id, punched_at in PunchEvent.objects.filter(
+        employee_id__in={employee_id for employee_id, _ in days},
+        punched_at__gte=window_start,
+        punched_at__lt=window_end,
+    ).values_list('employee_id', 'punched_at'):
+        punched_at = timezone.localtime(punched_at).replace(microsecond=0, tzinfo=None)
+        key = (employee_id, workday(punched_at, shifts[employee_id]))
+        if key not in days:
+            continue
+        first, last = spans.get(key, (punched_at, punched_at))
+        spans[key] = (min(first, punched_at), max(last, punched_at))
+
+    return [
+        AttendanceLog(
+            employee_id=employee_id,
+            date=day,
+            time_in=first.time(),
+            # A single punch is a time in without a time out
+            time_out=last.time() if last > first else None,
+        )
+        for (employee_id, day), (first, last) in spans.items()
+    ]
+
+
+def compact_punches(batch_size=BATCH_SIZE):
+    """
+    Fold the next batch of uncompacted punches into AttendanceLog and mark
+    them compacted, in one transaction. Concurrent callers wait for each
+    other on the PunchCompaction row. Returns a dict with the events read,
+    the logs written and the highest event id compacted so far.
+    """
+    with transaction.atomic():
+        state, _ = PunchCompaction.objects.select_for_update().get_or_create(pk=1)
+        events = list(PunchEvent.objects.filter(compacted=False).order_by('pk').values_list(
+            'pk', 'employee_id', 'punched_at'
+        )[:batch_size])
+        if not events:
+            return {'events': 0, 'logs': 0, 'last_event_id': state.last_event_id}
+
+        shifts = shifts_for({employee_id for _, employee_id, _ in events})
+        days = {
+            (employee_id, workday(timezone.localtime(punched_at).replace(tzinfo=None), shifts[employee_id]))
+            for _, employee_id, punched_at in events
+        }
+        logs = fold_days(days, shifts)
+        upsert_logs(logs, update_remarks=False, shifts=shifts)
+        # By id: a punch committed meanwhile below the last id was not folded in
+        PunchEvent.objects.filter(pk__in=[pk for pk, _, _ in events]).update(compacted=True)
+
+        state.last_event_id = max(state.last_event_id, events[-1][0])
+        state.events += len(events)
+        state.save(update_fields=['last_event_id', 'events', 'updated_at'])
+    return {'events': len(events), 'logs': len(logs), 'last_event_id': state.last_event_id}
+
+
+def compact_all_punches(batch_size=BATCH_SIZE):
+    """Compact batches until no uncompacted punches are left; returns the totals"""
+    totals = {'events': 0, 'logs': 0, 'last_event_id': 0}
+    while True:
+        result = compact_punches(batch_size)
+        totals['events'] += result['events']
+        totals['logs'] += result['logs']
+        totals['last_event_id'] = result['last_event_id']
+        if result['events'] < batch_size:
+            return totals
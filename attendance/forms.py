@@ -1,4 +1,5 @@
 from django import forms
+from .importer import FORMAT_CHOICES
 from .models import AttendanceLog, LeaveRequest
 
 class AttendanceLogForm(forms.ModelForm):
@@ -19,3 +20,7 @@ class LeaveRequestForm(forms.ModelForm):
             'start_date': forms.DateInput(attrs={'type': 'date'}),
             'end_date': forms.DateInput(attrs={'type': 'date'}),
         }
+
+class AttendanceImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV with an employee_no,date,time_in,time_out[,remarks] header, or a fixed-width DTR export')
+    file_format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='csv', label='Format')
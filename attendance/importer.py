@@ -0,0 +1,169 @@
+"""
+Bulk attendance import
+Daily time records (DTR) from biometric terminals arrive as CSV with a
+header row (employee_no, date, time_in, time_out and optionally remarks)
+or as fixed-width text laid out as FIXED_WIDTH_COLUMNS. import_attendance
+reads the file as a stream and works through it CHUNK_SIZE rows at a
+time: rows are validated, employee numbers are resolved through a dict
+built once per import, and each chunk is upserted on (employee, date)
+with one bulk_create(update_conflicts=True) and its summaries refreshed,
+in its own transaction. Bad rows are reported by line and skipped; the
+rest of the file is imported, and importing the same file again changes
+nothing.
+"""
+import csv
+import time as clock
+from datetime import date, time
+from itertools import islice
+from django.db import transaction
+from employees.models import Employee
+from .models import AttendanceLog
+from .summaries import refresh_summaries
+
+
+CHUNK_SIZE = 2000
+# Errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 200
+
+FORMAT_CHOICES = (
+    ('csv', 'CSV with header row'),
+    ('fixed', 'Fixed-width DTR'),
+)
+REQUIRED_COLUMNS = ('employee_no', 'date', 'time_in', 'time_out')
+# (column, first character, end) of a fixed-width line; remarks run to the end of the line
+FIXED_WIDTH_COLUMNS = (
+    ('employee_no', 0, 10),
+    ('date', 10, 20),
+    ('time_in', 20, 28),
+    ('time_out', 28, 36),
+    ('remarks', 36, None),
+)
+
+
+class ImportFormatError(Exception):
+    """The file cannot be read as the given format at all"""
+
+
+def csv_rows(lines):
+    """Yield (line number, {column: value}) from CSV lines with a header row"""
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ImportFormatError(f"Missing columns: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def fixed_width_rows(lines):
+    """Yield (line number, {column: value}) from fixed-width lines, skipping blank ones"""
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield number, {column: line[start:end] for column, start, end in FIXED_WIDTH_COLUMNS}
+
+
+def parse_time(value):
+    """HH:MM or HH:MM:SS, or None for a blank value"""
+    value = value.strip()
+    return time.fromisoformat(value) if value else None
+
+
+def validate(row, employees):
+    """AttendanceLog for one row, or raise ValueError saying what is wrong with it"""
+    employee_no = (row.get('employee_no') or '').strip()
+    employee_id = employees.get(employee_no)
+    if employee_id is None:
+        raise ValueError(f"Unknown employee number {employee_no!r}")
+    try:
+        day = date.fromisoformat((row.get('date') or '').strip())
+    except ValueError:
+        raise ValueError(f"Invalid date {row.get('date')!r} (expected YYYY-MM-DD)")
+    try:
+        time_in = parse_time(row.get('time_in') or '')
+        time_out = parse_time(row.get('time_out') or '')
+    except ValueError:
+        raise ValueError(f"Invalid time {row.get('time_in')!r}/{row.get('time_out')!r} (expected HH:MM)")
+    if time_out is not None and time_in is None:
+        raise ValueError("Time out without a time in")
+    return AttendanceLog(
+        employee_id=employee_id,
+        date=day,
+        time_in=time_in,
+        time_out=time_out,
+        remarks=(row.get('remarks') or '').strip()[:255],
+    )
+
+
+def upsert_logs(logs, update_remarks=True, shifts=None):
+    """
+    Insert or update the logs on (employee, date) and refresh their
+    summaries (shifts as for refresh_summaries); returns the saved logs
+    """
+    fields = ['time_in', 'time_out'] + (['remarks'] if update_remarks else [])
+    with transaction.atomic():
+        AttendanceLog.objects.bulk_create(
+            logs,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=fields,
+        )
+        # bulk_create does not return the primary keys of upserted rows; read them back in one query
+        keys = {(log.employee_id, log.date) for log in logs}
+        saved = [
+            log for log in AttendanceLog.objects.filter(
+                employee_id__in={employee_id for employee_id, _ in keys},
+                date__gte=min(day for _, day in keys),
+                date__lte=max(day for _, day in keys),
+            ).only('pk', 'employee_id', 'date', 'time_in', 'time_out')
+            if (log.employee_id, log.date) in keys
+        ]
+        refresh_summaries(saved, shifts)
+    return saved
+
+
+def import_attendance(lines, file_format='csv', chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Import DTR rows from an iterable of text lines (an open file works).
+    Returns a dict with the rows read, logs imported, rows rejected, the
+    first MAX_REPORTED_ERRORS (line, error) pairs, the seconds taken and
+    the rows per second. progress, if given, is called with the result so
+    far after each chunk. Raises ImportFormatError if the file has the
+    wrong layout.
+    """
+    started = clock.perf_counter()
+    rows = csv_rows(lines) if file_format == 'csv' else fixed_width_rows(lines)
+    employees = dict(Employee.objects.values_list('employee_no', 'pk'))
+    result = {'rows': 0, 'imported': 0, 'rejected': 0, 'errors': [], 'seconds': 0.0, 'rows_per_second': 0.0}
+    update_remarks = None
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        if update_remarks is None:
+            # Only overwrite remarks when the file has them
+            update_remarks = file_format != 'csv' or 'remarks' in chunk[0][1]
+
+        # The last row wins when a chunk repeats an employee and date
+        logs = {}
+        for line, row in chunk:
+            try:
+                log = validate(row, employees)
+            except ValueError as e:
+                result['rejected'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append((line, str(e)))
+                continue
+            logs[log.employee_id, log.date] = log
+
+        if logs:
+            upsert_logs(list(logs.values()), update_remarks)
+        result['rows'] += len(chunk)
+        result['imported'] += len(logs)
+        result['seconds'] = clock.perf_counter() - started
+        if progress:
+            progress(result)
+
+    result['seconds'] = clock.perf_counter() - started
+    result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+    return result
@@ -0,0 +1,137 @@
+"""
+Time-clock ingestion
+Time clocks and kiosks post batches of punches to the punch_ingest view,
+authenticated by a TimeClock token, as JSON lines or a JSON array of
+{"employee_no": ..., "timestamp": ...} records. A batch is validated as a
+whole: employee numbers are resolved with one query, duplicates of
+punches already stored for the device (or repeated within the batch) are
+found with one indexed query, and the new punches are written with one
+bulk insert in the same transaction. Every record gets a result, in the
+order it was sent, so a clock can resend exactly the records that failed.
+Punches reach AttendanceLog through attendance.compaction.
+"""
+import json
+from datetime import datetime
+from django.db import transaction
+from django.utils import timezone
+from employees.models import Employee
+from .models import PunchEvent, TimeClock
+
+
+# Larger batches are refused (HTTP 413); clocks should split them
+MAX_PUNCHES = 5000
+BULK_BATCH_SIZE = 1000
+
+
+class IngestError(Exception):
+    """The request body cannot be read as a batch of punches"""
+
+
+def authenticate_clock(request):
+    """The active TimeClock whose token is in the Authorization header (Bearer), or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return TimeClock.objects.filter(token_hash=TimeClock.hash_token(token.strip()), active=True).first()
+
+
+def parse_batch(body, content_type):
+    """
+    Records of a request body: a JSON array (or {"punches": [...]}) for
+    application/json, otherwise one JSON object per line. A line that is not
+    JSON becomes an error string in place of its record.
+    """
+    text = body.decode('utf-8')
+    if content_type == 'application/json':
+        try:
+            records = json.loads(text)
+        except ValueError as e:
+            raise IngestError(f"Invalid JSON: {e}")
+        if isinstance(records, dict):
+            records = records.get('punches')
+        if not isinstance(records, list):
+            raise IngestError("Expected a list of punches")
+        return records
+
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            records.append("Line is not valid JSON")
+    return records
+
+
+def parse_timestamp(value):
+    """Aware datetime of an ISO 8601 timestamp; one without an offset is local time"""
+    punched_at = datetime.fromisoformat(value)
+    if timezone.is_naive(punched_at):
+        punched_at = timezone.make_aware(punched_at)
+    return punched_at
+
+
+def ingest_punches(clock, records):
+    """
+    Validate, deduplicate and store a batch of records from clock.
+    Returns one {'status': 'created' | 'duplicate' | 'rejected', 'error': ...}
+    result per record, in order.
+    """
+    results = [None] * len(records)
+    valid = []
+    for index, record in enumerate(records):
+        if isinstance(record, str):
+            results[index] = {'status': 'rejected', 'error': record}
+            continue
+        if not isinstance(record, dict):
+            results[index] = {'status': 'rejected', 'error': 'Expected an object'}
+            continue
+        employee_no = record.get('employee_no')
+        try:
+            punched_at = parse_timestamp(record.get('timestamp'))
+        except (TypeError, ValueError):
+            results[index] = {'status': 'rejected', 'error': 'timestamp must be an ISO 8601 date and time'}
+            continue
+        if not isinstance(employee_no, str) or not employee_no:
+            results[index] = {'status': 'rejected', 'error': 'employee_no is required'}
+            continue
+        valid.append((index, employee_no, punched_at))
+
+    employees = dict(Employee.objects.filter(
+        employee_no__in={employee_no for _, employee_no, _ in valid}
+    ).values_list('employee_no', 'pk')) if valid else {}
+
+    punches = []
+    for index, employee_no, punched_at in valid:
+        employee_id = employees.get(employee_no)
+        if employee_id is None:
+            results[index] = {'status': 'rejected', 'error': f"Unknown employee number {employee_no!r}"}
+        else:
+            punches.append((index, employee_id, punched_at))
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Writing the clock row first serializes batches from the same clock, so the check below
+        # sees every earlier batch (and SQLite takes its write lock before reading)
+        TimeClock.objects.filter(pk=clock.pk).update(last_seen_at=now)
+        existing = set()
+        if punches:
+            existing = set(PunchEvent.objects.filter(
+                device=clock.name,
+                employee_id__in={employee_id for _, employee_id, _ in punches},
+                punched_at__gte=min(punched_at for _, _, punched_at in punches),
+                punched_at__lte=max(punched_at for _, _, punched_at in punches),
+            ).values_list('employee_id', 'punched_at'))
+
+        new = []
+        for index, employee_id, punched_at in punches:
+            if (employee_id, punched_at) in existing:
+                results[index] = {'status': 'duplicate'}
+                continue
+            existing.add((employee_id, punched_at))
+            new.append(PunchEvent(employee_id=employee_id, punched_at=punched_at, device=clock.name, received_at=now))
+            results[index] = {'status': 'created'}
+
+        PunchEvent.objects.bulk_create(new, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+    return results
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+from attendance.compaction import compact_punches, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Folds new time-clock punches into the daily attendance logs used by payroll'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Compact until no uncompacted punches are left, then exit')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait between passes when idle (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Punches per batch (default: {BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Punch compaction started'))
+
+        try:
+            while True:
+                close_old_connections()
+                started = time.perf_counter()
+                result = compact_punches(options['batch_size'])
+                if result['events']:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(self.style.SUCCESS(
+                        f"  ✓ {result['events']} punches into {result['logs']} attendance logs "
+                        f"in {elapsed:.2f}s (through #{result['last_event_id']})"
+                    ))
+                if result['events'] < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping punch compaction')
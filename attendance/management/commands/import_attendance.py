@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from attendance.importer import import_attendance, ImportFormatError, CHUNK_SIZE, FORMAT_CHOICES
+
+
+class Command(BaseCommand):
+    help = 'Imports daily time records (CSV or fixed-width DTR) into the attendance logs, updating existing days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (employee_no,date,time_in,time_out[,remarks]) or fixed-width DTR file')
+        parser.add_argument('--format', choices=[choice for choice, _ in FORMAT_CHOICES],
+                            help='File layout (default: csv for .csv files, otherwise fixed)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Rows per upsert (default: {CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'fixed')
+
+        def progress(result):
+            self.stdout.write(f"  {result['rows']} rows, {result['imported']} imported, "
+                              f"{result['rejected']} rejected ({result['seconds']:.1f}s)")
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as lines:
+                result = import_attendance(lines, file_format, options['chunk_size'], progress)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for line, error in result['errors']:
+            self.stdout.write(self.style.WARNING(f'  Line {line}: {error}'))
+        if result['rejected'] > len(result['errors']):
+            self.stdout.write(self.style.WARNING(f"  ... and {result['rejected'] - len(result['errors'])} more"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Imported {result['imported']} attendance logs from {result['rows']} rows "
+            f"in {result['seconds']:.2f}s ({result['rows_per_second']:.0f} rows/s), {result['rejected']} rejected"
+        ))
@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from attendance.models import PunchEvent, TimeClock
+from employees.models import Employee
+
+
+class Command(BaseCommand):
+    help = ('Simulates many time clocks posting punches to a running server at shift change and reports '
+            'throughput and latency (creates loadtest-* time clocks and their punches)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/attendance/punches/', help='Punch ingestion URL')
+        parser.add_argument('--devices', type=int, default=20, help='Simulated time clocks, each posting in its own thread (default: 20)')
+        parser.add_argument('--requests', type=int, default=25, help='Batches each clock posts (default: 25)')
+        parser.add_argument('--batch', type=int, default=200, help='Punches per batch (default: 200)')
+        parser.add_argument('--resend', type=float, default=0.05,
+                            help='Fraction of punches sent again in a later batch, as clocks do after a timeout (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the loadtest-* clocks and their punches afterwards')
+
+    def handle(self, *args, **options):
+        employee_nos = list(Employee.objects.filter(active=True).values_list('employee_no', flat=True))
+        if not employee_nos:
+            raise CommandError('No active employees; seed some first')
+
+        # Fresh tokens for the simulated clocks
+        tokens = {}
+        for n in range(options['devices']):
+            clock, _ = TimeClock.objects.get_or_create(name=f'loadtest-{n:03d}', defaults={'token_hash': f'pending-{n}'})
+            tokens[clock.name] = clock.issue_token()
+            clock.active = True
+            clock.save()
+
+        shift_change = timezone.localtime().replace(microsecond=0)
+
+        def run_device(name):
+            rng = random.Random(f"{options['seed']}-{name}")
+            latencies = []
+            counts = {'created': 0, 'duplicate': 0, 'rejected': 0, 'failed': 0}
+            sent = []
+            for _ in range(options['requests']):
+                batch = []
+                for _ in range(options['batch']):
+                    if sent and rng.random() < options['resend']:
+                        batch.append(rng.choice(sent))
+                        continue
+                    punched_at = shift_change + timedelta(seconds=rng.randint(-1800, 1800), milliseconds=rng.randint(0, 999))
+                    record = {'employee_no': rng.choice(employee_nos), 'timestamp': punched_at.isoformat()}
+                    sent.append(record)
+                    batch.append(record)
+                body = '\n'.join(json.dumps(record) for record in batch).encode()
+                request = urllib.request.Request(options['url'], data=body, method='POST', headers={
+                    'Authorization': f'Bearer {tokens[name]}',
+                    'Content-Type': 'application/x-ndjson',
+                })
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=60) as response:
+                        result = json.load(response)
+                    for status in ('created', 'duplicate', 'rejected'):
+                        counts[status] += result[status]
+                except (urllib.error.URLError, OSError, ValueError):
+                    counts['failed'] += len(batch)
+                latencies.append(time.perf_counter() - started)
+            return latencies, counts
+
+        self.stdout.write(self.style.NOTICE(
+            f"{options['devices']} clocks x {options['requests']} batches x {options['batch']} punches -> {options['url']}"
+        ))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['devices']) as pool:
+            outcomes = list(pool.map(run_device, tokens))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for device_latencies, _ in outcomes for latency in device_latencies)
+        totals = {status: sum(counts[status] for _, counts in outcomes) for status in outcomes[0][1]}
+        punches = sum(totals.values())
+
+        def percentile(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+        self.stdout.write(f'{punches} punches in {len(latencies)} requests over {elapsed:.2f}s')
+        self.stdout.write(f'  Throughput: {punches / elapsed:.0f} punches/s, {len(latencies) / elapsed:.1f} requests/s')
+        self.stdout.write(f'  Latency: p50 {percentile(0.5):.0f} ms, p95 {percentile(0.95):.0f} ms, max {latencies[-1] * 1000:.0f} ms')
+        self.stdout.write(f"  Created {totals['created']}, duplicates {totals['duplicate']}, "
+                          f"rejected {totals['rejected']}, failed {totals['failed']}")
+
+        if options['cleanup']:
+            clocks = TimeClock.objects.filter(name__in=tokens)
+            PunchEvent.objects.filter(device__in=tokens).delete()
+            clocks.delete()
+            self.stdout.write('  Removed the loadtest clocks and their punches')
+
+        if totals['failed']:
+            self.stdout.write(self.style.ERROR(f"✗ {totals['failed']} punches were not accepted by the server"))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Every batch was accepted'))
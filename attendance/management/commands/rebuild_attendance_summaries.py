@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from datetime import date
+from attendance.models import AttendanceLog
+from attendance.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the attendance summary rows used by payroll from the raw attendance logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Only logs on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        logs = AttendanceLog.objects.all()
+        if options['since']:
+            logs = logs.filter(date__gte=options['since'])
+
+        count = rebuild_summaries(logs)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} attendance summaries'))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.BooleanField(default=False)),
+                ('complete', models.BooleanField(default=False)),
+                ('worked_seconds', models.PositiveIntegerField(default=0)),
+                ('overtime_seconds', models.PositiveIntegerField(default=0)),
+                ('late_seconds', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='employees.employee')),
+                ('log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='attendance.attendancelog')),
+            ],
+            options={
+                'verbose_name_plural': 'attendance summaries',
+                'ordering': ['-date'],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('REGULAR_HOLIDAY', 'Regular Holiday'), ('SPECIAL_HOLIDAY', 'Special Non-Working Day'), ('WORKDAY', 'Special Working Day')], default='REGULAR_HOLIDAY', max_length=20)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
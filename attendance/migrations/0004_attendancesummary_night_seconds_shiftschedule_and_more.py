@@ -0,0 +1,39 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('attendance', '0003_calendarday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesummary',
+            name='night_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ShiftSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('department', models.CharField(blank=True, max_length=100)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('grace_minutes', models.PositiveIntegerField(default=0, help_text='Arrivals this many minutes after the start are not late')),
+                ('employee', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shift_schedule', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['department', 'name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shiftschedule',
+            constraint=models.UniqueConstraint(condition=models.Q(('employee__isnull', True)), fields=('department',), name='unique_department_shift'),
+        ),
+    ]
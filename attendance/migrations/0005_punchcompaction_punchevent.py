@@ -0,0 +1,38 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('attendance', '0004_attendancesummary_night_seconds_shiftschedule_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PunchCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('events', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PunchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('punched_at', models.DateTimeField()),
+                ('device', models.CharField(blank=True, max_length=50)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('employee', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='punches', to='employees.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'punched_at'], name='punch_employee_time')],
+            },
+        ),
+    ]
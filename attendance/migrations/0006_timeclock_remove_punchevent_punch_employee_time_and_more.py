@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_punchcompaction_punchevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeClock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Recorded as the device of its punches', max_length=50, unique=True)),
+                ('token_hash', models.CharField(editable=False, max_length=64, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='punchevent',
+            name='punch_employee_time',
+        ),
+        migrations.AddConstraint(
+            model_name='punchevent',
+            constraint=models.UniqueConstraint(fields=('employee', 'punched_at', 'device'), name='unique_punch'),
+        ),
+    ]
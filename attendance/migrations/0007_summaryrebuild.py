@@ -0,0 +1,27 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('attendance', '0006_timeclock_remove_punchevent_punch_employee_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRebuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, max_length=100)),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.14 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+def mark_compacted(apps, schema_editor):
+    """Punches up to the old high-water mark were folded in already"""
+    PunchCompaction = apps.get_model('attendance', 'PunchCompaction')
+    PunchEvent = apps.get_model('attendance', 'PunchEvent')
+    state = PunchCompaction.objects.filter(pk=1).first()
+    if state is not None:
+        PunchEvent.objects.filter(pk__lte=state.last_event_id).update(compacted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_summaryrebuild'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='punchevent',
+            name='compacted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_compacted, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='punchevent',
+            index=models.Index(condition=models.Q(('compacted', False)), fields=['id'], name='punch_uncompacted'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import hashlib
+import secrets
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from employees.models import Employee
 
 class AttendanceLog(models.Model):
@@ -14,6 +18,43 @@ class AttendanceLog(models.Model):
         unique_together = ('employee', 'date')
         ordering = ['-date']
 
+class AttendanceSummary(models.Model):
+    """Per-day figures derived from an AttendanceLog, kept up to date on write (see attendance.summaries)"""
+    log = models.OneToOneField(AttendanceLog, on_delete=models.CASCADE, related_name='summary')
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_summaries')
+    date = models.DateField()
+    present = models.BooleanField(default=False)
+    complete = models.BooleanField(default=False)
+    worked_seconds = models.PositiveIntegerField(default=0)
+    overtime_seconds = models.PositiveIntegerField(default=0)
+    late_seconds = models.PositiveIntegerField(default=0)
+    night_seconds = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'date')
+        ordering = ['-date']
+        verbose_name_plural = 'attendance summaries'
+
+    def __str__(self):
+        return f"{self.employee} {self.date}"
+
+    @property
+    def worked_hours(self):
+        return self.worked_seconds / 3600
+
+    @property
+    def overtime_hours(self):
+        return self.overtime_seconds / 3600
+
+    @property
+    def late_minutes(self):
+        return self.late_seconds // 60
+
+    @property
+    def night_hours(self):
+        return self.night_seconds / 3600
+
 class LeaveRequest(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
@@ -32,3 +73,112 @@ class LeaveRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+class CalendarDay(models.Model):
+    """A holiday, or a rest day declared a working day (see attendance.workdays)"""
+    KIND_CHOICES = (
+        ('REGULAR_HOLIDAY', 'Regular Holiday'),
+        ('SPECIAL_HOLIDAY', 'Special Non-Working Day'),
+        ('WORKDAY', 'Special Working Day'),
+    )
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='REGULAR_HOLIDAY')
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.name}"
+
+class ShiftSchedule(models.Model):
+    """Working hours of one employee, of a department, or (with neither) of everyone else (see attendance.shifts)"""
+    name = models.CharField(max_length=100)
+    employee = models.OneToOneField(Employee, null=True, blank=True, on_delete=models.CASCADE, related_name='shift_schedule')
+    department = models.CharField(max_length=100, blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    grace_minutes = models.PositiveIntegerField(default=0, help_text='Arrivals this many minutes after the start are not late')
+
+    class Meta:
+        ordering = ['department', 'name']
+        constraints = [
+            # One schedule per department, and one company default (blank department)
+            models.UniqueConstraint(fields=['department'], condition=models.Q(employee__isnull=True),
+                                    name='unique_department_shift'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+    def clean(self):
+        if self.employee_id and self.department:
+            raise ValidationError("A shift schedule is for an employee or a department, not both.")
+
+class SummaryRebuild(models.Model):
+    """Summaries to re-measure after a shift schedule change, rebuilt off the request (see attendance.summaries)"""
+    # The changed schedule's scope: an employee, a department, or neither for everyone
+    employee = models.ForeignKey(Employee, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    department = models.CharField(max_length=100, blank=True)
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+
+    def __str__(self):
+        return f"Rebuild {self.employee_id or self.department or 'all'} summaries"
+
+class PunchEvent(models.Model):
+    """A raw time-clock punch; attendance.compaction folds it into AttendanceLog and marks it compacted"""
+    # No single-column index: the unique (employee, punched_at, device) index below covers lookups by employee
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='punches', db_index=False)
+    punched_at = models.DateTimeField()
+    device = models.CharField(max_length=50, blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    compacted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # A device reports a punch once; the index also serves lookups by employee and time
+            models.UniqueConstraint(fields=['employee', 'punched_at', 'device'], name='unique_punch'),
+        ]
+        indexes = [
+            # Only the punches still to compact, so the index stays small as the log grows
+            models.Index(fields=['id'], condition=models.Q(compacted=False), name='punch_uncompacted'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.punched_at}"
+
+class PunchCompaction(models.Model):
+    """Punch compaction progress (a single row, see attendance.compaction); passes lock it to run one at a time"""
+    last_event_id = models.BigIntegerField(default=0)
+    events = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Punches compacted through #{self.last_event_id}"
+
+class TimeClock(models.Model):
+    """A time clock or kiosk allowed to post punches (see attendance.ingest); only a hash of its token is kept"""
+    name = models.CharField(max_length=50, unique=True, help_text='Recorded as the device of its punches')
+    token_hash = models.CharField(max_length=64, unique=True, editable=False)
+    active = models.BooleanField(default=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def issue_token(self):
+        """Give the clock a new token and return it; the caller saves the clock"""
+        token = secrets.token_urlsafe(32)
+        self.token_hash = self.hash_token(token)
+        return token
@@ -0,0 +1,95 @@
+"""
+Shift schedules and the night window
+An employee works the ShiftSchedule assigned to them, else their
+department's, else the company default (a schedule with neither), else
+DEFAULT_SHIFT. shifts_for resolves the shifts of a whole batch of
+employees with two queries. Times are handled as seconds from midnight of
+the log's date, so intersecting a log's interval with the night window or
+measuring it against the scheduled start is a few integer comparisons.
+"""
+from collections import namedtuple
+from datetime import time
+from django.db.models import Q
+from employees.models import Employee
+from .models import ShiftSchedule
+
+
+DAY_SECONDS = 24 * 3600
+# Night differential is earned for work between these times
+NIGHT_START = 22 * 3600
+NIGHT_END = 6 * 3600
+
+Shift = namedtuple('Shift', 'start end grace_seconds')
+# Used when no ShiftSchedule applies: 9:00 to 18:00, no grace period
+DEFAULT_SHIFT = Shift(time(9, 0), time(18, 0), 0)
+
+
+def seconds(value):
+    """Seconds from midnight of a time"""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def shift_of(schedule):
+    return Shift(schedule.start_time, schedule.end_time, schedule.grace_minutes * 60)
+
+
+def shifts_for(employee_ids):
+    """Map employee id -> Shift for the given ids (two queries)"""
+    employee_ids = set(employee_ids)
+    if not employee_ids:
+        return {}
+    departments = dict(Employee.objects.filter(pk__in=employee_ids).values_list('pk', 'department'))
+    by_employee = {}
+    by_department = {}
+    default = DEFAULT_SHIFT
+    for schedule in ShiftSchedule.objects.filter(
+        Q(employee__in=employee_ids)
+        | Q(employee__isnull=True, department__in=set(departments.values()))
+        | Q(employee__isnull=True, department='')
+    ):
+        if schedule.employee_id:
+            by_employee[schedule.employee_id] = shift_of(schedule)
+        elif schedule.department:
+            by_department[schedule.department] = shift_of(schedule)
+        else:
+            default = shift_of(schedule)
+    return {
+        employee_id: by_employee.get(employee_id) or by_department.get(departments.get(employee_id), default)
+        for employee_id in employee_ids
+    }
+
+
+def night_seconds(start, end):
+    """
+    Seconds of the interval [start, end) inside the night window, with start
+    and end in seconds from midnight of the log's date (end may run into the
+    next day). The windows that can overlap are the one ending this morning,
+    tonight's and, for long shifts, tomorrow night's.
+    """
+    total = 0
+    for day in (-DAY_SECONDS, 0, DAY_SECONDS):
+        window_start = day + NIGHT_START
+        window_end = day + DAY_SECONDS + NIGHT_END
+        total += max(min(end, window_end) - max(start, window_start), 0)
+    return total
+
+
+def late_seconds(time_in, shift):
+    """
+    Seconds after the scheduled start an arrival is, or 0 within the grace
+    period. An arrival up to 12 hours before the start is early, so overnight
+    shifts are measured across midnight.
+    """
+    late = (seconds(time_in) - seconds(shift.start)) % DAY_SECONDS
+    if late > DAY_SECONDS // 2 or late <= shift.grace_seconds:
+        return 0
+    return late
+
+
+def affected_logs(employee_id, department):
+    """Q on AttendanceLog for the logs whose shift a schedule with this scope decides"""
+    if employee_id:
+        return Q(employee_id=employee_id)
+    if department:
+        return Q(employee__department=department)
+    return Q()
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import AttendanceLog, ShiftSchedule, SummaryRebuild
+from .summaries import refresh_summaries
+
+@receiver(post_save, sender=AttendanceLog)
+def attendance_log_saved(sender, instance, raw=False, **kwargs):
+    # Deleting a log cascades to its summary
+    if not raw:
+        refresh_summaries([instance])
+
+def queue_rebuild(*scopes):
+    """Queue a rebuild of the summaries whose shift schedules with these (employee id, department) scopes decide"""
+    SummaryRebuild.objects.bulk_create([
+        SummaryRebuild(employee_id=employee_id, department=department) for employee_id, department in set(scopes)
+    ])
+
+@receiver(pre_save, sender=ShiftSchedule)
+def shift_schedule_saving(sender, instance, raw=False, **kwargs):
+    # Remember who the schedule applied to, in case the edit moves it
+    instance._previous_scope = None
+    if not raw and instance.pk:
+        instance._previous_scope = ShiftSchedule.objects.filter(pk=instance.pk).values_list('employee_id', 'department').first()
+
+@receiver(post_save, sender=ShiftSchedule)
+def shift_schedule_saved(sender, instance, raw=False, **kwargs):
+    # Re-measuring the logs can cover every log there is; the payroll worker does it (see rebuild_queued_summaries)
+    if not raw:
+        scopes = [(instance.employee_id, instance.department)]
+        if getattr(instance, '_previous_scope', None) is not None:
+            scopes.append(instance._previous_scope)
+        queue_rebuild(*scopes)
+
+@receiver(post_delete, sender=ShiftSchedule)
+def shift_schedule_deleted(sender, instance, origin=None, **kwargs):
+    # Only when schedules themselves are deleted; deleting the employee takes their logs too
+    if getattr(origin, 'model', type(origin)) is ShiftSchedule:
+        queue_rebuild((instance.employee_id, instance.department))
@@ -0,0 +1,169 @@
+"""
+Attendance summaries
+Every AttendanceLog has an AttendanceSummary row with its worked, overtime,
+late and night seconds. Lateness is measured against the employee's shift
+and night seconds are the part of the day's interval between 22:00 and
+06:00 (see attendance.shifts). Payroll and reports add these up instead of
+working hours out again from time_in/time_out. A shift schedule change
+queues a SummaryRebuild instead of re-measuring the logs it covers in the
+request; the payroll worker rebuilds them, and does so before computing a
+run.
+"""
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+from django.db.models import Count, Q, Sum
+from .models import AttendanceLog, AttendanceSummary, SummaryRebuild
+from .shifts import DAY_SECONDS, DEFAULT_SHIFT, affected_logs, seconds, shifts_for, night_seconds, late_seconds
+from .workdays import work_calendar, rest_days
+
+
+# Hours beyond this in a day are overtime
+STANDARD_WORK_SECONDS = 8 * 3600
+
+BULK_BATCH_SIZE = 500
+
+SUMMARY_FIELDS = [
+    'employee', 'date', 'present', 'complete',
+    'worked_seconds', 'overtime_seconds', 'late_seconds', 'night_seconds', 'updated_at',
+]
+
+# workdays_present counts days present on working days; the holiday counts are days present on holidays
+PeriodTotals = namedtuple(
+    'PeriodTotals',
+    'days days_present worked_seconds overtime_seconds late_seconds '
+    'workdays_present regular_holidays_worked special_holidays_worked night_seconds',
+    defaults=(0, 0, 0, 0),
+)
+EMPTY_TOTALS = PeriodTotals(0, 0, 0, 0, 0)
+
+
+def summarize(log, shift=DEFAULT_SHIFT):
+    """Build the (unsaved) summary row for a log, measuring lateness against shift"""
+    worked = overtime = late = night = 0
+    if log.time_in and log.time_out:
+        start = seconds(log.time_in)
+        end = seconds(log.time_out)
+
+        # Handle overnight shift
+        if end < start:
+            end += DAY_SECONDS
+
+        worked = end - start
+        overtime = max(worked - STANDARD_WORK_SECONDS, 0)
+        night = night_seconds(start, end)
+
+    if log.time_in:
+        late = late_seconds(log.time_in, shift)
+
+    return AttendanceSummary(
+        log=log,
+        employee_id=log.employee_id,
+        date=log.date,
+        present=log.time_in is not None,
+        complete=bool(log.time_in and log.time_out),
+        worked_seconds=worked,
+        overtime_seconds=overtime,
+        late_seconds=late,
+        night_seconds=night,
+    )
+
+
+def refresh_summaries(logs, shifts=None):
+    """
+    Create or update the summary rows for saved logs in bulk.
+    Call this after writing logs with bulk_create/update, which skip the
+    post_save signal that keeps single saves in sync. The employees'
+    shifts are resolved for the whole batch at once unless given.
+    """
+    if shifts is None:
+        shifts = shifts_for({log.employee_id for log in logs})
+    summaries = [summarize(log, shifts[log.employee_id]) for log in logs]
+    AttendanceSummary.objects.bulk_create(
+        summaries,
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['log'],
+        update_fields=SUMMARY_FIELDS,
+    )
+    return len(summaries)
+
+
+def rebuild_summaries(logs=None):
+    """Recompute summary rows for the given logs (default: all), in batches"""
+    if logs is None:
+        logs = AttendanceLog.objects.all()
+    logs = logs.only('pk', 'employee_id', 'date', 'time_in', 'time_out').order_by('pk')
+
+    total = 0
+    batch = []
+    for log in logs.iterator(chunk_size=BULK_BATCH_SIZE):
+        batch.append(log)
+        if len(batch) == BULK_BATCH_SIZE:
+            total += refresh_summaries(batch)
+            batch = []
+    if batch:
+        total += refresh_summaries(batch)
+    return total
+
+
+def rebuild_queued_summaries():
+    """
+    Rebuild the summaries of the logs the queued SummaryRebuilds cover, in
+    one pass, and remove those entries. Entries queued meanwhile are left for
+    the next call. Returns the number of summaries rebuilt.
+    """
+    queued = list(SummaryRebuild.objects.values_list('pk', 'employee_id', 'department'))
+    if not queued:
+        return 0
+    scopes = [affected_logs(employee_id, department) for _, employee_id, department in queued]
+    logs = AttendanceLog.objects.all()
+    # An empty Q (the company default) covers every log
+    if all(scopes):
+        logs = logs.filter(reduce(or_, scopes))
+    total = rebuild_summaries(logs)
+    SummaryRebuild.objects.filter(pk__lte=queued[-1][0]).delete()
+    return total
+
+
+def django_week_days(weekdays):
+    """date__week_day numbers (Sunday = 1) for Python weekday numbers (Monday = 0)"""
+    return [(weekday + 1) % 7 + 1 for weekday in weekdays]
+
+
+def period_totals(employees, period_start, period_end, calendar=None):
+    """
+    Map employee id -> PeriodTotals for the period, from one grouped query.
+    employees may be a queryset or a list of ids; employees without
+    attendance are left out (use EMPTY_TOTALS). The days present are split
+    by the kind of day with the calendar (an attendance.workdays.WorkCalendar,
+    loaded if not given), in the same query.
+    """
+    if calendar is None:
+        calendar = work_calendar(period_start, period_end)
+    regular = calendar.holiday_dates(period_start, period_end, 'REGULAR_HOLIDAY')
+    special = calendar.holiday_dates(period_start, period_end, 'SPECIAL_HOLIDAY')
+    on_duty = (
+        Q(date__week_day__in=django_week_days(set(range(7)) - set(rest_days())))
+        | Q(date__in=calendar.workday_overrides(period_start, period_end))
+    ) & ~Q(date__in=regular + special)
+
+    rows = AttendanceSummary.objects.filter(
+        employee__in=employees,
+        date__gte=period_start,
+        date__lte=period_end
+    ).order_by().values('employee_id').annotate(
+        days=Count('pk'),
+        days_present=Count('pk', filter=Q(present=True)),
+        worked=Sum('worked_seconds'),
+        overtime=Sum('overtime_seconds'),
+        late=Sum('late_seconds'),
+        night=Sum('night_seconds'),
+        workdays_present=Count('pk', filter=Q(present=True) & on_duty),
+        regular_holidays=Count('pk', filter=Q(present=True, date__in=regular)),
+        special_holidays=Count('pk', filter=Q(present=True, date__in=special)),
+    ).values_list(
+        'employee_id', 'days', 'days_present', 'worked', 'overtime', 'late',
+        'workdays_present', 'regular_holidays', 'special_holidays', 'night',
+    )
+    return {employee_id: PeriodTotals(*totals) for employee_id, *totals in rows}
@@ -0,0 +1,237 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from employees.models import Employee, SalaryGrade
+from .compaction import compact_punches, compact_all_punches
+from .importer import import_attendance
+from .ingest import MAX_PUNCHES
+from .models import AttendanceLog, AttendanceSummary, PunchCompaction, PunchEvent, ShiftSchedule, TimeClock
+
+
+def create_employees(count, prefix='A'):
+    grade = SalaryGrade.objects.create(code=f'{prefix}-GRADE', base_pay=Decimal('22000.00'))
+    return [
+        Employee.objects.create(
+            user=User.objects.create(username=f'{prefix.lower()}{i}'), employee_no=f'{prefix}{i:03d}',
+            first_name='Clock', last_name=f'Worker{i}', department='Ops', position='Staff', salary_grade=grade,
+        )
+        for i in range(count)
+    ]
+
+
+class AttendanceImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = create_employees(5)
+        cls.staff = User.objects.create_user('import-staff')
+        cls.staff.groups.add(Group.objects.get(name='Staff'))
+
+    def test_csv_upserts_and_rejects_bad_rows(self):
+        AttendanceLog.objects.create(employee=self.employees[0], date=date(2025, 3, 3), time_in=time(7),
+                                     remarks='Manual entry')
+        lines = StringIO(
+            "employee_no,date,time_in,time_out\n"
+            "A000,2025-03-03,08:00,17:00\n"
+            "A001,2025-03-03,09:30,18:00\n"
+            "NOBODY,2025-03-03,08:00,17:00\n"
+            "A002,2025-02-30,08:00,17:00\n"
+            "A003,2025-03-03,,17:00\n"
+            "A004,2025-03-03,8 am,17:00\n"
+            "A001,2025-03-03,09:15,18:00\n"
+        )
+        result = import_attendance(lines, chunk_size=3)
+
+        self.assertEqual((result['rows'], result['rejected']), (7, 4))
+        self.assertEqual([line for line, _ in result['errors']], [4, 5, 6, 7])
+        self.assertEqual(AttendanceLog.objects.count(), 2)
+        updated = AttendanceLog.objects.get(employee=self.employees[0])
+        # Times are replaced; remarks are kept because the file has none
+        self.assertEqual((updated.time_in, updated.time_out, updated.remarks), (time(8), time(17), 'Manual entry'))
+        # The later of two rows for the same day wins, and summaries follow the imported times
+        self.assertEqual(AttendanceSummary.objects.get(employee=self.employees[1]).late_seconds, 15 * 60)
+        self.assertEqual(AttendanceSummary.objects.get(employee=self.employees[0]).worked_seconds, 9 * 3600)
+
+        # Importing the same file again changes nothing
+        lines.seek(0)
+        import_attendance(lines)
+        self.assertEqual(AttendanceLog.objects.count(), 2)
+
+    def test_fixed_width_and_constant_queries_per_chunk(self):
+        def dtr(days):
+            return [
+                f"{employee.employee_no:<10}2025-03-{day:02d}{'08:00':<8}{'17:30':<8}Terminal 1\n"
+                for employee in self.employees for day in range(1, days + 1)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            import_attendance(dtr(2), 'fixed', chunk_size=1000)
+        with CaptureQueriesContext(connection) as large:
+            result = import_attendance(dtr(8), 'fixed', chunk_size=1000)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual((result['imported'], result['rejected']), (40, 0))
+        self.assertEqual(AttendanceSummary.objects.count(), 40)
+        self.assertEqual(AttendanceLog.objects.filter(remarks='Terminal 1').count(), 40)
+
+    def test_upload_view(self):
+        self.client.force_login(self.staff)
+        upload = SimpleUploadedFile('dtr.csv', b"employee_no,date,time_in,time_out,remarks\nA002,2025-03-04,08:00,,Kiosk\n")
+        response = self.client.post(reverse('attendance_import'), {'file': upload, 'file_format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['imported'], 1)
+        self.assertEqual(AttendanceLog.objects.get(employee=self.employees[2]).remarks, 'Kiosk')
+
+        upload = SimpleUploadedFile('dtr.csv', b"name,day\nx,y\n")
+        response = self.client.post(reverse('attendance_import'), {'file': upload, 'file_format': 'csv'})
+        self.assertIn('Missing columns', str(response.context['form'].errors))
+
+
+class PunchCompactionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day_worker, cls.night_worker, cls.absent = create_employees(3, prefix='P')
+        ShiftSchedule.objects.create(name='Graveyard', employee=cls.night_worker, start_time=time(22), end_time=time(6))
+
+    def punch(self, employee, day, hour, minute=0, **kwargs):
+        return PunchEvent(employee=employee, punched_at=timezone.make_aware(datetime.combine(day, time(hour, minute))),
+                          **kwargs)
+
+    def test_first_in_last_out_and_overnight(self):
+        day = date(2025, 3, 3)
+        PunchEvent.objects.bulk_create([
+            self.punch(self.day_worker, day, 8, 2),
+            self.punch(self.day_worker, day, 12),
+            self.punch(self.day_worker, day, 13),
+            self.punch(self.day_worker, day + timedelta(days=1), 0, 30),
+            self.punch(self.night_worker, day, 22, 5),
+            self.punch(self.night_worker, day + timedelta(days=1), 6, 10),
+            self.punch(self.night_worker, day + timedelta(days=1), 21, 58),
+        ])
+        result = compact_punches()
+        self.assertEqual((result['events'], result['logs']), (7, 3))
+
+        logs = {(log.employee_id, log.date): (log.time_in, log.time_out) for log in AttendanceLog.objects.all()}
+        self.assertEqual(logs, {
+            # Overtime past midnight stays on the day it started
+            (self.day_worker.pk, day): (time(8, 2), time(0, 30)),
+            # The night shift's morning punch closes the previous day; the next evening's opens a new day
+            (self.night_worker.pk, day): (time(22, 5), time(6, 10)),
+            (self.night_worker.pk, day + timedelta(days=1)): (time(21, 58), None),
+        })
+        summary = AttendanceSummary.objects.get(employee=self.night_worker, date=day)
+        self.assertEqual((summary.worked_seconds, summary.night_seconds), (8 * 3600 + 5 * 60, 7 * 3600 + 55 * 60))
+
+    def test_incremental(self):
+        day = date(2025, 3, 4)
+        PunchEvent.objects.bulk_create([self.punch(self.day_worker, day, 8), self.punch(self.absent, day, 9)])
+        compact_punches()
+        self.assertEqual(AttendanceLog.objects.get(employee=self.day_worker).time_out, None)
+
+        # A later punch for the same day is folded in with the earlier ones, only that day is rewritten
+        self.punch(self.day_worker, day, 17, 45).save()
+        with self.assertNumQueries(14):
+            result = compact_punches()
+        self.assertEqual((result['events'], result['logs']), (1, 1))
+        self.assertEqual(AttendanceLog.objects.get(employee=self.day_worker).time_out, time(17, 45))
+        state = PunchCompaction.objects.get()
+        self.assertEqual((state.last_event_id, state.events), (PunchEvent.objects.latest('pk').pk, 3))
+
+        # Nothing new: nothing is compacted again
+        self.assertEqual(compact_punches()['events'], 0)
+
+    def test_punch_committed_below_compacted_ids(self):
+        day = date(2025, 3, 5)
+        self.punch(self.day_worker, day, 8, pk=1001).save()
+        self.punch(self.day_worker, day, 12, pk=1003).save()
+        self.assertEqual(compact_all_punches(batch_size=1)['events'], 2)
+
+        # A slow writer commits the id it was given before the others
+        self.punch(self.day_worker, day, 17, pk=1002).save()
+        result = compact_punches()
+        self.assertEqual((result['events'], result['last_event_id']), (1, 1003))
+        self.assertEqual(AttendanceLog.objects.get(employee=self.day_worker).time_out, time(17))
+        self.assertFalse(PunchEvent.objects.filter(compacted=False).exists())
+
+
+class PunchIngestTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = create_employees(4, prefix='K')
+        cls.clock = TimeClock(name='Lobby kiosk')
+        cls.token = cls.clock.issue_token()
+        cls.clock.save()
+
+    def post(self, body, content_type='application/x-ndjson', token=None):
+        return self.client.post(reverse('punch_ingest'), body, content_type=content_type,
+                                HTTP_AUTHORIZATION=f'Bearer {token or self.token}')
+
+    def lines(self, *records):
+        return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+    def test_requires_an_active_clock_token(self):
+        self.assertEqual(self.post('', token='wrong').status_code, 401)
+        self.assertEqual(self.client.post(reverse('punch_ingest')).status_code, 401)
+        TimeClock.objects.filter(pk=self.clock.pk).update(active=False)
+        self.assertEqual(self.post('').status_code, 401)
+
+    def test_json_lines_with_per_record_results(self):
+        PunchEvent.objects.create(employee=self.employees[1], device='Lobby kiosk',
+                                  punched_at=timezone.make_aware(datetime(2025, 3, 3, 8, 5)))
+        response = self.post(self.lines(
+            {'employee_no': 'K000', 'timestamp': '2025-03-03T08:00:00+08:00'},
+            {'employee_no': 'K001', 'timestamp': '2025-03-03T08:05:00'},
+            {'employee_no': 'NOBODY', 'timestamp': '2025-03-03T08:00:00'},
+            {'employee_no': 'K002', 'timestamp': 'yesterday'},
+            'not json',
+            '',
+            # Sent twice in one batch, as a clock retrying does
+            {'employee_no': 'K000', 'timestamp': '2025-03-03T00:00:00Z'},
+        ))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['duplicate'], body['rejected']), (1, 2, 3))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'duplicate', 'rejected', 'rejected', 'rejected', 'duplicate'])
+        self.assertIn('NOBODY', body['results'][2]['error'])
+        self.assertEqual(PunchEvent.objects.count(), 2)
+
+        # Another device may report the same employee at the same instant
+        other = TimeClock(name='Gate')
+        token = other.issue_token()
+        other.save()
+        response = self.post(self.lines({'employee_no': 'K000', 'timestamp': '2025-03-03T08:00:00'}), token=token)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertIsNotNone(TimeClock.objects.get(name='Gate').last_seen_at)
+
+    def test_json_array_and_batch_limit(self):
+        records = [{'employee_no': 'K003', 'timestamp': f'2025-03-04T{hour:02d}:00:00'} for hour in (8, 17)]
+        response = self.post(json.dumps({'punches': records}), content_type='application/json')
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(self.post('{"punches": 3}', content_type='application/json').status_code, 400)
+        self.assertEqual(self.post('\n'.join(['{}'] * (MAX_PUNCHES + 1))).status_code, 413)
+
+        # Ingested punches compact into the day's attendance
+        compact_punches()
+        log = AttendanceLog.objects.get(employee=self.employees[3])
+        self.assertEqual((log.date, log.time_in, log.time_out), (date(2025, 3, 4), time(8), time(17)))
+
+    def test_constant_queries_per_batch(self):
+        def batch(day):
+            return self.lines(*(
+                {'employee_no': employee.employee_no, 'timestamp': f'2025-03-{day:02d}T{hour:02d}:{minute:02d}:00'}
+                for employee in self.employees for hour in (8, 12, 13, 17) for minute in (0, 1)
+            ))
+
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.lines({'employee_no': 'K000', 'timestamp': '2025-03-05T08:00:00'}))
+        with CaptureQueriesContext(connection) as large:
+            response = self.post(batch(6))
+        self.assertEqual(response.json()['created'], 32)
+        self.assertEqual(len(large), len(small))
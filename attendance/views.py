@@ -1,15 +1,23 @@
+import io
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from accounts.decorators import group_required
-from .models import AttendanceLog, LeaveRequest
-from .forms import AttendanceLogForm, LeaveRequestForm
+from accounts.decorators import group_required, query_budget
+from .models import AttendanceLog, AttendanceSummary, LeaveRequest
+from .forms import AttendanceLogForm, AttendanceImportForm, LeaveRequestForm
+from .importer import import_attendance, ImportFormatError
+from .ingest import authenticate_clock, parse_batch, ingest_punches, IngestError, MAX_PUNCHES
 from employees.models import Employee
 
+@query_budget(12)
 @login_required
 @group_required('Staff')
 def attendance_list(request):
-    from datetime import date, time
+    from datetime import date
     
     # Get all logs (limited to 200 for display)
     logs = AttendanceLog.objects.select_related('employee').all()[:200]
@@ -22,9 +30,8 @@ def attendance_list(request):
     present_today = today_logs.filter(time_in__isnull=False).count()
     absent_today = Employee.objects.filter(active=True).count() - present_today
     
-    # Calculate late arrivals (arrived after 9:00 AM)
-    late_time = time(9, 0)  # 9:00 AM
-    late_count = today_logs.filter(time_in__gt=late_time).count()
+    # Late arrivals, measured against each employee's shift when the log was summarized
+    late_count = AttendanceSummary.objects.filter(date=today, late_seconds__gt=0).count()
     
     context = {
         'logs': logs,
@@ -34,6 +41,7 @@ def attendance_list(request):
     }
     return render(request, 'attendance/attendance_list.html', context)
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def attendance_create(request):
@@ -46,6 +54,52 @@ def attendance_create(request):
         form = AttendanceLogForm()
     return render(request, 'attendance/attendance_form.html', {'form': form, 'title': 'Create Attendance Log'})
 
+@query_budget(9)
+@login_required
+@group_required('Staff')
+def attendance_import(request):
+    """Upload a DTR file and upsert its rows into the attendance logs"""
+    result = None
+    if request.method == 'POST':
+        form = AttendanceImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Read the upload as a text stream; large files stay in their temporary file
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_attendance(lines, form.cleaned_data['file_format'])
+            except (ImportFormatError, UnicodeDecodeError) as e:
+                form.add_error('file', str(e))
+            else:
+                message = f"Imported {result['imported']} attendance logs from {result['rows']} rows."
+                if result['rejected']:
+                    messages.warning(request, f"{message} {result['rejected']} rows were rejected.")
+                else:
+                    messages.success(request, message)
+    else:
+        form = AttendanceImportForm()
+    return render(request, 'attendance/attendance_import.html', {'form': form, 'result': result})
+
+@csrf_exempt
+@require_POST
+def punch_ingest(request):
+    """Time clocks post batches of punches here (see attendance.ingest)"""
+    clock = authenticate_clock(request)
+    if clock is None:
+        return JsonResponse({'error': 'A valid time clock token is required'}, status=401)
+    try:
+        records = parse_batch(request.body, request.content_type)
+    except (IngestError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if len(records) > MAX_PUNCHES:
+        return JsonResponse({'error': f'At most {MAX_PUNCHES} punches per request'}, status=413)
+
+    results = ingest_punches(clock, records)
+    counts = {'created': 0, 'duplicate': 0, 'rejected': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return JsonResponse({**counts, 'results': results})
+
+@query_budget(8)
 @login_required
 def leave_submit(request):
     try:
@@ -68,6 +122,7 @@ def leave_submit(request):
         form = LeaveRequestForm()
     return render(request, 'attendance/leave_form.html', {'form': form, 'title': 'Submit Leave Request'})
 
+@query_budget(12)
 @login_required
 @group_required('Staff')
 def leave_queue(request):
@@ -101,6 +156,7 @@ def leave_decide(request, pk, decision):
         lr.save()
     return redirect('leave_queue')
 
+@query_budget(9)
 @login_required
 def my_leave_history(request):
     """Employee view of their own leave requests"""
@@ -112,6 +168,7 @@ def my_leave_history(request):
     
     return render(request, 'attendance/my_leave_history.html', {'leaves': leaves})
 
+@query_budget(9)
 @login_required
 def my_attendance_records(request):
     """Employee view of their own attendance records"""
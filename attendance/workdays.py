@@ -0,0 +1,134 @@
+"""
+Working-day calendar
+A day is a holiday if it is in CalendarDay as one, a working day if it is
+not a holiday and not a weekly rest day (PAYROLL_REST_DAYS) unless
+CalendarDay declares it a working day, and a paid day if it is a working
+day or a holiday that does not fall on a rest day. Each year is compiled
+once into prefix sums of its days, so counting working days, paid
+days or holidays over any range is a couple of lookups, whatever its
+length. Loading a calendar costs one query for the holidays of its years.
+"""
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from django.conf import settings
+from .models import CalendarDay
+
+
+HOLIDAY_KINDS = ('REGULAR_HOLIDAY', 'SPECIAL_HOLIDAY')
+COUNTS = ('working', 'paid', 'REGULAR_HOLIDAY', 'SPECIAL_HOLIDAY')
+
+
+def rest_days():
+    return tuple(getattr(settings, 'PAYROLL_REST_DAYS', (5, 6)))
+
+
+class YearIndex:
+    """One year's calendar as prefix sums (entry i counts the days before day i of the year)"""
+
+    def __init__(self, year, entries, rest):
+        self.year = year
+        self.first = date(year, 1, 1)
+        self.length = (date(year + 1, 1, 1) - self.first).days
+        kinds = dict(entries)
+        # Holiday dates in order, per kind, for filtering attendance by date
+        self.dates = {kind: sorted(day for day, k in entries if k == kind) for kind in HOLIDAY_KINDS}
+        self.workday_overrides = sorted(day for day, k in entries if k == 'WORKDAY')
+
+        self.prefix = {name: array('H', [0]) for name in COUNTS}
+        for i in range(self.length):
+            day = self.first + timedelta(days=i)
+            kind = kinds.get(day)
+            resting = day.weekday() in rest and kind != 'WORKDAY'
+            flags = {
+                'working': kind not in HOLIDAY_KINDS and not resting,
+                'paid': not resting,
+                'REGULAR_HOLIDAY': kind == 'REGULAR_HOLIDAY',
+                'SPECIAL_HOLIDAY': kind == 'SPECIAL_HOLIDAY',
+            }
+            for name, flag in flags.items():
+                self.prefix[name].append(self.prefix[name][-1] + flag)
+
+    def count(self, name, start, end):
+        """Days of the kind name from start to end inclusive, both within the year"""
+        prefix = self.prefix[name]
+        return prefix[(end - self.first).days + 1] - prefix[(start - self.first).days]
+
+
+@lru_cache(maxsize=32)
+def compile_year(year, entries, rest):
+    """YearIndex for the year's (date, kind) entries, shared while they are unchanged"""
+    return YearIndex(year, entries, rest)
+
+
+class WorkCalendar:
+    """Compiled calendar for the years from start to end"""
+
+    def __init__(self, years):
+        # year -> YearIndex
+        self.years = years
+
+    @classmethod
+    def load(cls, start, end):
+        entries = {year: [] for year in range(start.year, end.year + 1)}
+        for day, kind in CalendarDay.objects.filter(
+            date__gte=date(start.year, 1, 1),
+            date__lte=date(end.year, 12, 31)
+        ).order_by('date').values_list('date', 'kind'):
+            entries[day.year].append((day, kind))
+        rest = rest_days()
+        return cls({year: compile_year(year, tuple(days), rest) for year, days in entries.items()})
+
+    def _ranges(self, start, end):
+        """(YearIndex, start, end) pieces of the range, one per year it touches"""
+        for year in range(start.year, end.year + 1):
+            yield self.years[year], max(start, date(year, 1, 1)), min(end, date(year, 12, 31))
+
+    def count(self, name, start, end):
+        if end < start:
+            return 0
+        return sum(index.count(name, first, last) for index, first, last in self._ranges(start, end))
+
+    def working_days(self, start, end):
+        """Scheduled working days (holidays and rest days excluded)"""
+        return self.count('working', start, end)
+
+    def paid_days(self, start, end):
+        """Working days plus holidays that do not fall on rest days"""
+        return self.count('paid', start, end)
+
+    def holidays(self, start, end, kind=None):
+        if kind is None:
+            return sum(self.count(kind, start, end) for kind in HOLIDAY_KINDS)
+        return self.count(kind, start, end)
+
+    def holiday_dates(self, start, end, kind):
+        """Dates of the holidays of the kind in the range"""
+        dates = []
+        for index, first, last in self._ranges(start, end):
+            days = index.dates[kind]
+            dates.extend(days[bisect_left(days, first):bisect_right(days, last)])
+        return dates
+
+    def workday_overrides(self, start, end):
+        """Rest days declared working days in the range"""
+        dates = []
+        for index, first, last in self._ranges(start, end):
+            days = index.workday_overrides
+            dates.extend(days[bisect_left(days, first):bisect_right(days, last)])
+        return dates
+
+    def fingerprint(self, start, end):
+        """Hash of everything that decides the kinds of the days in the range"""
+        parts = [f"rest:{rest_days()}"]
+        for kind in HOLIDAY_KINDS:
+            parts.append(f"{kind}:{self.holiday_dates(start, end, kind)}")
+        parts.append(f"WORKDAY:{self.workday_overrides(start, end)}")
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def work_calendar(start, end):
+    """WorkCalendar covering start to end (one query)"""
+    return WorkCalendar.load(start, end)
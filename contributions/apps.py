@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContributionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contributions'
+
+    def ready(self):
+        from . import signals  # noqa
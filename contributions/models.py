@@ -165,3 +165,24 @@ class TaxTable(models.Model):
             return tax.quantize(Decimal('0.01'))
         except:
             return Decimal('0.00')
+
+
+class RateTableVersion(models.Model):
+    """Single-row version stamp, bumped whenever any contribution or tax row changes"""
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Rate tables v{self.version}"
+    
+    @classmethod
+    def current(cls):
+        """Current version number (0 if the tables were never edited)"""
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def bump(cls):
+        """Increment the version so every process reloads its compiled rates"""
+        updated = cls.objects.filter(pk=1).update(version=models.F('version') + 1)
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
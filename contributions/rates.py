@@ -0,0 +1,238 @@
+"""
+Compiled, in-memory form of the contribution and tax tables
+Every active row is loaded once per process and grouped into versions by
+effective date; the set in force on a date is compiled once and reused until
+the tables change.
+"""
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from django.utils import timezone
+from .models import SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable, RateTableVersion
+
+
+ZERO = Decimal('0.00')
+TAX_EXEMPT_CEILING = Decimal('250000')
+
+SSSBracket = namedtuple('SSSBracket', 'min_salary max_salary employee employer ec total')
+PhilHealthRate = namedtuple('PhilHealthRate', 'premium_rate max_contribution')
+PagibigRate = namedtuple('PagibigRate', 'employee_rate employer_rate max_employee max_employer')
+
+
+class TaxSchedule:
+    """Annual withholding tax as a piecewise-linear function of taxable income"""
+
+    def __init__(self, brackets):
+        # brackets: (min_compensation, base_tax, tax_rate), one per breakpoint
+        brackets = sorted(brackets, key=lambda b: b[0])
+        self.breakpoints = tuple(b[0] for b in brackets)
+        self.segments = tuple((b[1], b[2]) for b in brackets)
+
+    def __call__(self, annual_taxable_income):
+        """Same result as TaxTable.get_withholding_tax"""
+        if annual_taxable_income <= TAX_EXEMPT_CEILING:
+            return ZERO
+
+        i = bisect_right(self.breakpoints, annual_taxable_income) - 1
+        if i < 0:
+            return ZERO
+
+        base_tax, tax_rate = self.segments[i]
+        excess = annual_taxable_income - self.breakpoints[i]
+        return (base_tax + excess * tax_rate).quantize(Decimal('0.01'))
+
+
+class ContributionRates:
+    """Immutable lookup index over one set of SSS, PhilHealth, Pag-IBIG and tax tables"""
+
+    def __init__(self, sss_brackets, philhealth, pagibig, tax_brackets, version=0, effective=None):
+        # SSS brackets sorted by lower bound; the first row wins on duplicate bounds
+        brackets = {}
+        for bracket in sorted(sss_brackets, key=lambda b: b.min_salary):
+            brackets.setdefault(bracket.min_salary, bracket)
+        self.sss_brackets = tuple(brackets.values())
+        self.sss_bounds = tuple(b.min_salary for b in self.sss_brackets)
+        self.sss_top = max(self.sss_brackets, key=lambda b: b.max_salary) if self.sss_brackets else None
+
+        self.philhealth = philhealth
+        self.pagibig = pagibig
+        self.withholding_tax = TaxSchedule(tax_brackets)
+        self.version = version
+        # Effective dates of the SSS, PhilHealth, Pag-IBIG and tax versions in this set
+        self.effective = effective
+
+        # Identifies the rates themselves, whatever version stamp they were loaded under
+        self.fingerprint = hashlib.sha256(repr((
+            self.sss_brackets,
+            self.philhealth,
+            self.pagibig,
+            self.withholding_tax.breakpoints,
+            self.withholding_tax.segments,
+        )).encode()).hexdigest()
+
+    @classmethod
+    def load(cls, version=None, as_of=None):
+        """Compile the tables in force on as_of (default: today) from the database"""
+        return RateCatalog.load(version=version).rates(as_of or timezone.localdate())
+
+    def sss(self, salary):
+        """Same result as SSSContributionTable.get_contribution"""
+        row = None
+        i = bisect_right(self.sss_bounds, salary) - 1
+        if i >= 0 and salary <= self.sss_brackets[i].max_salary:
+            row = self.sss_brackets[i]
+        if row is None:
+            # If salary is above max, use the highest bracket
+            row = self.sss_top
+        if row is None:
+            return {'employee': ZERO, 'employer': ZERO, 'ec': ZERO, 'total': ZERO}
+        return {
+            'employee': row.employee,
+            'employer': row.employer,
+            'ec': row.ec,
+            'total': row.total,
+        }
+
+    def philhealth_contribution(self, salary):
+        """Same result as PhilHealthContributionTable.get_contribution"""
+        table = self.philhealth
+        if not table:
+            return {'employee': ZERO, 'employer': ZERO, 'total': ZERO}
+
+        contribution = salary * table.premium_rate
+        if table.max_contribution and contribution > table.max_contribution:
+            contribution = table.max_contribution
+
+        return {
+            'employee': (contribution / 2).quantize(Decimal('0.01')),
+            'employer': (contribution / 2).quantize(Decimal('0.01')),
+            'total': contribution.quantize(Decimal('0.01')),
+        }
+
+    def pagibig_contribution(self, salary):
+        """Same result as PagibigContributionTable.get_contribution"""
+        table = self.pagibig
+        if not table:
+            return {'employee': ZERO, 'employer': ZERO, 'total': ZERO}
+
+        employee_share = salary * table.employee_rate
+        if table.max_employee and employee_share > table.max_employee:
+            employee_share = table.max_employee
+
+        employer_share = salary * table.employer_rate
+        if table.max_employer and employer_share > table.max_employer:
+            employer_share = table.max_employer
+
+        return {
+            'employee': employee_share.quantize(Decimal('0.01')),
+            'employer': employer_share.quantize(Decimal('0.01')),
+            'total': (employee_share + employer_share).quantize(Decimal('0.01')),
+        }
+
+
+class RateCatalog:
+    """
+    Every active contribution and tax row, grouped into versions by effective date.
+    A version stays in force until the next effective date of the same table.
+    """
+
+    TABLES = ('sss', 'philhealth', 'pagibig', 'tax')
+
+    def __init__(self, sss, philhealth, pagibig, tax, version=0):
+        # Each table maps effective_date -> that version's rows
+        self.tables = {'sss': sss, 'philhealth': philhealth, 'pagibig': pagibig, 'tax': tax}
+        self.dates = {name: sorted(rows) for name, rows in self.tables.items()}
+        self.version = version
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, version=None):
+        """Load every active row from the database (one query per table)"""
+        if version is None:
+            version = RateTableVersion.current()
+
+        sss = defaultdict(list)
+        for r in SSSContributionTable.objects.filter(is_active=True).order_by('effective_date', 'min_salary', 'pk'):
+            sss[r.effective_date].append(
+                SSSBracket(r.min_salary, r.max_salary, r.employee_share, r.employer_share, r.ec_share, r.total)
+            )
+
+        # Lowest pk wins among PhilHealth/Pag-IBIG rows with the same effective date
+        philhealth = {}
+        for r in PhilHealthContributionTable.objects.filter(is_active=True).order_by('effective_date', 'pk'):
+            philhealth.setdefault(r.effective_date, PhilHealthRate(r.premium_rate, r.max_contribution))
+
+        pagibig = {}
+        for r in PagibigContributionTable.objects.filter(is_active=True).order_by('effective_date', 'pk'):
+            pagibig.setdefault(r.effective_date, PagibigRate(
+                r.employee_rate,
+                r.employer_rate,
+                r.max_employee_contribution,
+                r.max_employer_contribution,
+            ))
+
+        # Highest pk wins on duplicate lower bounds
+        tax = defaultdict(dict)
+        for r in TaxTable.objects.filter(is_active=True).order_by('effective_date', 'min_compensation', 'pk'):
+            tax[r.effective_date][r.min_compensation] = (r.min_compensation, r.base_tax, r.tax_rate)
+
+        return cls(
+            dict(sss),
+            philhealth,
+            pagibig,
+            {effective_date: list(brackets.values()) for effective_date, brackets in tax.items()},
+            version=version,
+        )
+
+    def effective_dates(self, as_of):
+        """Effective date of each table's version in force on as_of (None if the table is empty)"""
+        key = []
+        for name in self.TABLES:
+            dates = self.dates[name]
+            if not dates:
+                key.append(None)
+                continue
+            # Before a table's first version, fall back to that first version
+            key.append(dates[max(bisect_right(dates, as_of) - 1, 0)])
+        return tuple(key)
+
+    def rates(self, as_of):
+        """Compiled ContributionRates for the tables in force on as_of"""
+        key = self.effective_dates(as_of)
+        rates = self._compiled.get(key)
+        if rates is None:
+            with self._lock:
+                sss, philhealth, pagibig, tax = (self.tables[name].get(d) for name, d in zip(self.TABLES, key))
+                rates = ContributionRates(sss or (), philhealth, pagibig, tax or (), version=self.version, effective=key)
+                self._compiled[key] = rates
+        return rates
+
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def get_rates(as_of=None):
+    """
+    Return the compiled rates in force on as_of (default: today).
+    Costs one small query to compare version stamps; reloads only when
+    another process (or this one) has edited the tables. Each set of
+    rates is compiled once per version and shared.
+    """
+    global _catalog
+    version = RateTableVersion.current()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _lock:
+            catalog = RateCatalog.load(version=version)
+            _catalog = catalog
+    return catalog.rates(as_of or timezone.localdate())
+
+
+def invalidate_rates():
+    """Drop this process's compiled rates"""
+    global _catalog
+    _catalog = None
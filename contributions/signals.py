@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable, RateTableVersion
+from .rates import invalidate_rates
+
+RATE_TABLES = (SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable)
+
+@receiver(post_save)
+@receiver(post_delete)
+def rate_table_changed(sender, **kwargs):
+    if sender in RATE_TABLES:
+        RateTableVersion.bump()
+        invalidate_rates()
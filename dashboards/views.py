@@ -1,7 +1,8 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from accounts.decorators import group_required
+from accounts.decorators import group_required, query_budget
 
+@query_budget(7)
 @login_required
 def employee_dashboard(request):
     """
@@ -10,6 +11,7 @@ def employee_dashboard(request):
     """
     return render(request, 'dashboards/employee_dashboard.html')
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def staff_dashboard(request):
@@ -4,6 +4,7 @@ from django.utils import timezone
 from django.db import models
 from employees.models import Employee, SalaryGrade
 from attendance.models import AttendanceLog, LeaveRequest
+from attendance.summaries import rebuild_summaries, BULK_BATCH_SIZE
 from payroll.models import PayrollRun, Payslip, Loan, OtherDeduction
 from contributions.models import SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable
 from datetime import date, datetime, timedelta
@@ -264,6 +265,7 @@ class Command(BaseCommand):
         
         employees = Employee.objects.filter(active=True)
         total_records = 0
+        logs = []
         
         # Generate attendance for past months
         end_date = date.today()
@@ -294,19 +296,21 @@ class Command(BaseCommand):
                     if random.random() < 0.1:
                         time_out = time_out.replace(hour=random.randint(19, 21))
                     
-                    AttendanceLog.objects.get_or_create(
+                    logs.append(AttendanceLog(
                         employee=employee,
                         date=current_date,
-                        defaults={
-                            'time_in': time_in.time(),
-                            'time_out': time_out.time(),
-                            'remarks': random.choice(['', '', '', 'On time', 'Overtime']) if random.random() < 0.2 else ''
-                        }
-                    )
+                        time_in=time_in.time(),
+                        time_out=time_out.time(),
+                        remarks=random.choice(['', '', '', 'On time', 'Overtime']) if random.random() < 0.2 else ''
+                    ))
                     total_records += 1
             
             current_date += timedelta(days=1)
         
+        # Existing days are kept as they are; summaries are refreshed for the new rows
+        AttendanceLog.objects.bulk_create(logs, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+        rebuild_summaries(AttendanceLog.objects.filter(date__gte=start_date, date__lte=end_date))
+        
         self.stdout.write(self.style.SUCCESS(f'  ✓ Created {total_records} attendance records'))
 
     def create_leave_requests(self):
@@ -1,10 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Min, Max
-from accounts.decorators import group_required
+from django.db.models import Min, Max, ProtectedError
+from accounts.decorators import group_required, query_budget
 from .models import Employee, SalaryGrade
 from .forms import EmployeeForm, SalaryGradeForm
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def employee_list(request):
@@ -17,6 +19,7 @@ def employee_list(request):
     }
     return render(request, 'employees/employee_list.html', context)
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def employee_create(request):
@@ -29,6 +32,7 @@ def employee_create(request):
         form = EmployeeForm()
     return render(request, 'employees/employee_form.html', {'form': form, 'title': 'Create Employee'})
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def employee_update(request, pk):
@@ -47,10 +51,16 @@ def employee_update(request, pk):
 def employee_delete(request, pk):
     obj = get_object_or_404(Employee, pk=pk)
     if request.method == 'POST':
-        obj.delete()
+        try:
+            obj.delete()
+        except ProtectedError:
+            # Payslips and the loan repayment ledger are kept for the records
+            messages.error(request, f"{obj} has payroll history and cannot be deleted; deactivate them instead.")
+            return redirect('employee_update', pk=obj.pk)
         return redirect('employee_list')
     return render(request, 'employees/confirm_delete.html', {'object': obj, 'type': 'Employee'})
 
+@query_budget(14)
 @login_required
 @group_required('Staff')
 def salarygrade_list(request):
@@ -69,6 +79,7 @@ def salarygrade_list(request):
     }
     return render(request, 'employees/salarygrade_list.html', context)
 
+@query_budget(8)
 @login_required
 @group_required('Staff')
 def salarygrade_create(request):
@@ -81,6 +92,7 @@ def salarygrade_create(request):
         form = SalaryGradeForm()
     return render(request, 'employees/salarygrade_form.html', {'form': form, 'title': 'Create Salary Grade'})
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def salarygrade_update(request, pk):
@@ -94,6 +106,7 @@ def salarygrade_update(request, pk):
         form = SalaryGradeForm(instance=obj)
     return render(request, 'employees/salarygrade_form.html', {'form': form, 'title': 'Update Salary Grade'})
 
+@query_budget(9)
 @login_required
 def my_salary_info(request):
     """Employee view of their own salary information"""
@@ -1,32 +1,111 @@
-from django.contrib import admin
-from django.utils.html import format_html
-from .models import PayrollRun, Payslip, Loan, OtherDeduction
+from django.contrib import admin, messages
+from django.db.models import Count, Sum
+from django.utils.html import format_html, format_html_join
+from .models import PayrollRun, Payslip, Loan, LoanRepayment, OtherDeduction, PayrollJob, PayrollRunMetrics, YearToDate
+from .workflow import TransitionError, transition_runs
+
+
+def phase_table(obj):
+    """Phase timings of a PayrollRunMetrics row as a small HTML table"""
+    rows = format_html_join(
+        "", "<tr><td>{}</td><td style='text-align: right;'>{} ms</td><td style='text-align: right;'>{}%</td><td style='text-align: right;'>{} calls</td><td style='text-align: right;'>{} queries</td></tr>",
+        (
+            (phase["name"], f"{phase['ms']:.1f}", f"{phase['percent']:.1f}", phase["calls"], phase["queries"])
+            for phase in obj.phase_rows
+        ),
+    )
+    return format_html("<table>{}</table>", rows)
+phase_table.short_description = "Phases"
+
+
+class PayrollRunMetricsInline(admin.TabularInline):
+    model = PayrollRunMetrics
+    extra = 0
+    can_delete = False
+    fields = ("operation", "created_at", "employees", "total_seconds", "total_queries", "employee_percentiles", phase_table)
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class LoanRepaymentInline(admin.TabularInline):
+    model = LoanRepayment
+    extra = 0
+    can_delete = False
+    fields = ("payroll_run", "payslip", "amount", "balance_after", "created_at")
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(PayrollRun)
 class PayrollRunAdmin(admin.ModelAdmin):
-    list_display = ("id", "pay_period", "employee_count", "total_gross", "total_net", "created_by", "created_at")
-    list_filter = ("period_start", "period_end", "created_by")
+    list_display = ("id", "pay_period", "run_type", "status", "employee_count", "total_gross", "total_net", "created_by", "created_at")
+    list_filter = ("run_type", "status", "period_start", "period_end", "created_by")
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
-    readonly_fields = ("created_at",)
+    # Status only moves through payroll.workflow (the run page buttons and the actions below)
+    readonly_fields = ("status", "posted_at", "created_at")
+    inlines = [PayrollRunMetricsInline]
+    actions = ["move_to_review", "approve", "mark_paid", "cancel"]
+    
+    def get_queryset(self, request):
+        # Per-row counts and totals in the changelist query itself
+        return super().get_queryset(request).select_related("created_by").annotate(
+            payslip_count=Count("payslips"),
+            gross_total=Sum("payslips__gross_pay"),
+            net_total=Sum("payslips__net_pay"),
+        )
     
     def pay_period(self, obj):
         return f"{obj.period_start.strftime('%b %d')} - {obj.period_end.strftime('%b %d, %Y')}"
     pay_period.short_description = "Pay Period"
     
     def employee_count(self, obj):
-        return obj.payslips.count()
+        return obj.payslip_count
     employee_count.short_description = "Employees"
     
     def total_gross(self, obj):
-        total = sum(p.gross_pay for p in obj.payslips.all())
+        total = obj.gross_total or 0
         return f"₱{total:,.2f}"
     total_gross.short_description = "Total Gross"
     
     def total_net(self, obj):
-        total = sum(p.net_pay for p in obj.payslips.all())
+        total = obj.net_total or 0
         return f"₱{total:,.2f}"
     total_net.short_description = "Total Net"
+    
+    def transition(self, request, queryset, status):
+        """Move the selected runs together and report each run that could not move"""
+        try:
+            outcomes = transition_runs(list(queryset), status, request.user)
+        except TransitionError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        moved = sum(1 for error in outcomes.values() if error is None)
+        if moved:
+            self.message_user(request, f"{moved} payroll run(s) updated to {status}.", messages.SUCCESS)
+        for run_id, error in outcomes.items():
+            if error:
+                self.message_user(request, f"Run #{run_id}: {error}", messages.WARNING)
+    
+    @admin.action(description="Move selected runs to review")
+    def move_to_review(self, request, queryset):
+        self.transition(request, queryset, "REVIEW")
+    
+    @admin.action(description="Approve selected runs")
+    def approve(self, request, queryset):
+        self.transition(request, queryset, "APPROVED")
+    
+    @admin.action(description="Mark selected runs as paid (deposits and posts loans)")
+    def mark_paid(self, request, queryset):
+        self.transition(request, queryset, "PAID")
+    
+    @admin.action(description="Cancel selected runs")
+    def cancel(self, request, queryset):
+        self.transition(request, queryset, "CANCELLED")
 
 @admin.register(Payslip)
 class PayslipAdmin(admin.ModelAdmin):
@@ -42,7 +121,8 @@ class PayslipAdmin(admin.ModelAdmin):
             "fields": ("employee", "payroll_run")
         }),
         ("Earnings", {
-            "fields": ("gross_pay", "overtime_pay")
+            "fields": ("gross_pay", "overtime_pay", "holiday_pay", "night_differential", "thirteenth_month_pay",
+                       "absences", "tardiness_hours")
         }),
         ("Government Deductions", {
             "fields": ("sss", "philhealth", "pagibig", "tax")
@@ -105,11 +185,43 @@ class LoanAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ("created_at",)
+    inlines = [LoanRepaymentInline]
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Set when the loan is added; afterwards only posting moves it, in step with the repayment ledger
+        if obj is not None:
+            return self.readonly_fields + ("remaining_balance",)
+        return self.readonly_fields
     
     def employee_no(self, obj):
         return obj.employee.employee_no
     employee_no.short_description = "Employee ID"
 
+@admin.register(LoanRepayment)
+class LoanRepaymentAdmin(admin.ModelAdmin):
+    list_display = ("loan", "payroll_run", "amount", "balance_after", "created_at")
+    list_filter = ("loan__loan_type", "created_at")
+    search_fields = ("loan__employee__employee_no", "loan__employee__last_name", "loan__employee__first_name")
+    list_select_related = ("loan__employee", "payroll_run")
+    readonly_fields = ("loan", "payslip", "payroll_run", "amount", "balance_after", "created_at")
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(YearToDate)
+class YearToDateAdmin(admin.ModelAdmin):
+    list_display = ("employee", "year", "periods", "gross", "contributions", "taxable", "tax_withheld", "updated_at")
+    list_filter = ("year", "employee__department")
+    search_fields = ("employee__employee_no", "employee__last_name", "employee__first_name")
+    # Maintained by posting and manage.py rebuild_year_to_date
+    readonly_fields = ("employee", "year", "periods", "gross", "contributions", "taxable", "tax_withheld", "updated_at")
+    
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(OtherDeduction)
 class OtherDeductionAdmin(admin.ModelAdmin):
     list_display = ("employee", "employee_no", "description", "amount", "is_recurring", "is_active", "created_at")
@@ -134,3 +246,28 @@ class OtherDeductionAdmin(admin.ModelAdmin):
     def employee_no(self, obj):
         return obj.employee.employee_no
     employee_no.short_description = "Employee ID"
+
+@admin.register(PayrollJob)
+class PayrollJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "payroll_run", "kind", "status", "processed", "total", "payslips_created", "worker", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    ordering = ("-created_at",)
+    readonly_fields = ("created_at", "started_at", "finished_at", "updated_at")
+
+
+@admin.register(PayrollRunMetrics)
+class PayrollRunMetricsAdmin(admin.ModelAdmin):
+    list_display = ("id", "payroll_run", "operation", "employees", "total_seconds", "total_queries", "p90_ms", "created_at")
+    list_filter = ("operation",)
+    list_select_related = ("payroll_run",)
+    ordering = ("-created_at",)
+    fields = ("payroll_run", "operation", "created_at", "employees", "total_seconds", "total_queries", "employee_percentiles", phase_table)
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def p90_ms(self, obj):
+        p90 = obj.employee_percentiles.get("p90")
+        return f"{p90 * 1000:.3f}" if p90 is not None else "-"
+    p90_ms.short_description = "p90 per employee (ms)"
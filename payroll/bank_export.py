@@ -6,16 +6,18 @@ import csv
 from io import StringIO
 from datetime import datetime
 from decimal import Decimal
+from .metrics import NULL_METRICS
 
 
 class BankFileExporter:
     """Export payslips to bank transfer file format"""
     
-    def __init__(self, payroll_run):
+    def __init__(self, payroll_run, metrics=None):
         self.payroll_run = payroll_run
         self.payslips = payroll_run.payslips.filter(
             salary_deposited=False
         ).select_related('employee')
+        self.metrics = metrics or NULL_METRICS
     
     def generate_csv(self):
         """Generate CSV format for bank transfer"""
@@ -33,16 +35,20 @@ class BankFileExporter:
         ])
         
         # Data rows
-        for payslip in self.payslips:
-            emp = payslip.employee
-            writer.writerow([
-                emp.employee_no,
-                f"{emp.last_name}, {emp.first_name}",
-                emp.bank_name or 'N/A',
-                emp.bank_account or 'N/A',
-                f"{payslip.net_pay:.2f}",
-                f"Payroll {self.payroll_run.period_start} to {self.payroll_run.period_end}"
-            ])
+        with self.metrics.phase('load_payslips'):
+            payslips = list(self.payslips)
+        with self.metrics.phase('write_rows'):
+            for payslip in payslips:
+                with self.metrics.employee():
+                    emp = payslip.employee
+                    writer.writerow([
+                        emp.employee_no,
+                        f"{emp.last_name}, {emp.first_name}",
+                        emp.bank_name or 'N/A',
+                        emp.bank_account or 'N/A',
+                        f"{payslip.net_pay:.2f}",
+                        f"Payroll {self.payroll_run.period_start} to {self.payroll_run.period_end}"
+                    ])
         
         buffer.seek(0)
         return buffer.getvalue()
@@ -107,15 +113,17 @@ Breakdown by Bank:
     
     def mark_as_generated(self):
         """Mark payslips as bank file generated"""
-        self.payslips.update(bank_file_generated=True)
+        with self.metrics.phase('mark_generated'):
+            self.payslips.update(bank_file_generated=True)
 
 
-def export_to_excel(payroll_run):
+def export_to_excel(payroll_run, metrics=None):
     """Export payroll to Excel using openpyxl"""
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill, Alignment
     from io import BytesIO
     
+    metrics = metrics or NULL_METRICS
     wb = Workbook()
     ws = wb.active
     ws.title = "Payroll"
@@ -141,44 +149,49 @@ def export_to_excel(payroll_run):
         cell.alignment = Alignment(horizontal='center')
     
     # Data rows
-    payslips = payroll_run.payslips.all().select_related('employee')
-    
-    for payslip in payslips:
-        emp = payslip.employee
-        ws.append([
-            emp.employee_no,
-            f"{emp.last_name}, {emp.first_name}",
-            emp.department,
-            emp.position,
-            float(payslip.gross_pay),
-            float(payslip.overtime_pay),
-            float(payslip.total_earnings),
-            float(payslip.sss),
-            float(payslip.philhealth),
-            float(payslip.pagibig),
-            float(payslip.tax),
-            float(payslip.loan_deductions),
-            float(payslip.other_deductions),
-            float(payslip.total_deductions),
-            float(payslip.net_pay),
-        ])
+    with metrics.phase('load_payslips'):
+        payslips = list(payroll_run.payslips.all().select_related('employee'))
+    
+    with metrics.phase('write_rows'):
+        for payslip in payslips:
+            with metrics.employee():
+                emp = payslip.employee
+                ws.append([
+                    emp.employee_no,
+                    f"{emp.last_name}, {emp.first_name}",
+                    emp.department,
+                    emp.position,
+                    float(payslip.gross_pay),
+                    float(payslip.overtime_pay),
+                    float(payslip.total_earnings),
+                    float(payslip.sss),
+                    float(payslip.philhealth),
+                    float(payslip.pagibig),
+                    float(payslip.tax),
+                    float(payslip.loan_deductions),
+                    float(payslip.other_deductions),
+                    float(payslip.total_deductions),
+                    float(payslip.net_pay),
+                ])
     
     # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    with metrics.phase('column_widths'):
+        for column in ws.columns:
+            max_length = 0
+            column_letter = column[0].column_letter
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            ws.column_dimensions[column_letter].width = adjusted_width
     
     # Save to buffer
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    with metrics.phase('save_workbook'):
+        buffer = BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
     
     return buffer
@@ -0,0 +1,194 @@
+"""
+Batch payroll engine
+Computes a whole payroll run from a handful of bulk queries
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from contributions.rates import get_rates
+from attendance.summaries import period_totals, EMPTY_TOTALS
+from attendance.workdays import work_calendar
+from employees.models import Employee
+from .models import Payslip, Loan, OtherDeduction
+from .services import PayrollCalculator
+from .fingerprints import input_fingerprints
+from .metrics import NULL_METRICS
+from .posting import pending_claims, unclaimed_loans, unclaimed_deductions
+from .ytd import year_to_date, EMPTY_YTD
+
+
+class PreloadedPayrollCalculator(PayrollCalculator):
+    """PayrollCalculator that reads from rows loaded up front by BatchPayrollCalculator"""
+
+    def __init__(self, employee, period_start, period_end, rates, attendance, loans, deductions, year_to_date=EMPTY_YTD,
+                 metrics=None, calendar=None):
+        super().__init__(employee, period_start, period_end, rates=rates, metrics=metrics, calendar=calendar)
+        self._attendance_totals = attendance
+        self._year_to_date = year_to_date
+        self.loans = loans
+        self.deductions = deductions
+
+    def get_active_loans(self):
+        return self.loans
+
+    def get_active_deductions(self):
+        return self.deductions
+
+
+class BatchPayrollCalculator:
+    """Compute payslips for many employees with a fixed number of queries"""
+
+    BULK_BATCH_SIZE = 500
+
+    def __init__(self, period_start, period_end, employees=None, metrics=None, payroll_run=None):
+        self.period_start = period_start
+        self.period_end = period_end
+        if employees is None:
+            employees = Employee.objects.filter(active=True)
+        self.employees = employees.select_related('salary_grade')
+        self.errors = []
+        self.metrics = metrics or NULL_METRICS
+        # The run being computed (create_payslips sets it if not given); see pending_claims
+        self.payroll_run = payroll_run
+        self._claims = None
+
+    def load(self):
+        """Load every input for the run in bulk, grouped by employee id"""
+        employee_ids = self.employees.values('pk')
+        metrics = self.metrics
+
+        with metrics.phase('load_calendar'):
+            self.calendar = work_calendar(self.period_start, self.period_end)
+
+        with metrics.phase('load_attendance'):
+            self.attendance = period_totals(employee_ids, self.period_start, self.period_end, self.calendar)
+
+        with metrics.phase('load_loans'):
+            self.loans = self.load_loans(employee_ids)
+
+        with metrics.phase('load_deductions'):
+            self.deductions = self.load_deductions(employee_ids)
+
+        with metrics.phase('load_ytd'):
+            self.year_to_date = year_to_date(employee_ids, self.period_end.year, before=self.period_start)
+
+        with metrics.phase('load_rates'):
+            self.rates = get_rates(as_of=self.period_end)
+
+    def pending_claims(self, employee_ids):
+        """What unposted payslips of other runs already charge (payroll.posting.pending_claims), loaded once"""
+        if self._claims is None:
+            self._claims = pending_claims(employee_ids, self.payroll_run)
+        return self._claims
+
+    def load_loans(self, employee_ids):
+        """Active loans with an outstanding balance not charged elsewhere yet, grouped by employee id"""
+        loans = defaultdict(list)
+        for loan in unclaimed_loans(Loan.objects.filter(
+            employee__in=employee_ids,
+            is_active=True,
+            remaining_balance__gt=0
+        ).order_by('pk'), self.pending_claims(employee_ids)[0]):
+            loans[loan.employee_id].append(loan)
+        return loans
+
+    def load_deductions(self, employee_ids):
+        """Active other deductions not charged elsewhere yet, grouped by employee id"""
+        deductions = defaultdict(list)
+        for deduction in unclaimed_deductions(OtherDeduction.objects.filter(
+            employee__in=employee_ids,
+            is_active=True
+        ).order_by('pk'), self.pending_claims(employee_ids)[1]):
+            deductions[deduction.employee_id].append(deduction)
+        return deductions
+
+    def calculator_for(self, employee):
+        return PreloadedPayrollCalculator(
+            employee,
+            self.period_start,
+            self.period_end,
+            rates=self.rates,
+            attendance=self.attendance.get(employee.pk, EMPTY_TOTALS),
+            loans=self.loans[employee.pk],
+            deductions=self.deductions[employee.pk],
+            year_to_date=self.year_to_date.get(employee.pk, EMPTY_YTD),
+            metrics=self.metrics,
+            calendar=self.calendar,
+        )
+
+    def compute(self):
+        """Yield (employee, payroll_data) for every employee that computes cleanly"""
+        self.load()
+        with self.metrics.phase('load_employees'):
+            employees = list(self.employees)
+
+        for employee in employees:
+            try:
+                with self.metrics.employee():
+                    calculator = self.calculator_for(employee)
+                    payroll_data = calculator.compute_payslip()
+            except Exception as e:
+                self.errors.append((employee, str(e)))
+                continue
+            yield employee, payroll_data
+
+    def fingerprints(self):
+        """Input fingerprint per employee id, stored on the payslips for incremental recalculation"""
+        return input_fingerprints(self.employees, self.period_start, self.period_end, self.payroll_run)
+
+    def create_payslips(self, payroll_run, replace=False, progress=None):
+        """
+        Compute the run, then write all payslips with bulk_create in one transaction.
+        Loans and deductions are left untouched until the run is posted.
+        replace deletes the run's existing payslips in that same transaction;
+        progress, if given, is called with the number of employees processed so far.
+        """
+        if self.payroll_run is None:
+            self.payroll_run = payroll_run
+        with self.metrics.phase('fingerprints'):
+            fingerprints = self.fingerprints()
+        payslips = []
+        for employee, payroll_data in self.compute():
+            payslips.append(Payslip(
+                payroll_run=payroll_run,
+                employee=employee,
+                input_fingerprint=fingerprints.get(employee.pk, ''),
+                **payroll_data
+            ))
+            if progress:
+                progress(len(payslips) + len(self.errors))
+
+        with self.metrics.phase('write'), transaction.atomic():
+            if replace:
+                payroll_run.payslips.all().delete()
+            Payslip.objects.bulk_create(payslips, batch_size=self.BULK_BATCH_SIZE)
+
+        return payslips
+
+
+def engine_class():
+    """The in-process engine: the NumPy one when PAYROLL_VECTORIZED is set"""
+    if getattr(settings, 'PAYROLL_VECTORIZED', False):
+        from .vectorized import VectorizedPayrollCalculator
+
+        return VectorizedPayrollCalculator
+    return BatchPayrollCalculator
+
+
+def payroll_engine(period_start, period_end, employees=None, metrics=None, payroll_run=None):
+    """
+    Pick the payroll engine for a run.
+    Uses the process pool when PAYROLL_WORKERS > 1 and the workforce is big
+    enough to be worth the worker start-up cost, else engine_class() (the
+    shards are computed with it too).
+    """
+    workers = getattr(settings, 'PAYROLL_WORKERS', 1)
+    if workers > 1:
+        from .parallel import ShardedPayrollCalculator
+
+        engine = ShardedPayrollCalculator(
+            period_start, period_end, employees, workers=workers, metrics=metrics, payroll_run=payroll_run
+        )
+        if engine.employees.count() >= getattr(settings, 'PAYROLL_PARALLEL_MIN_EMPLOYEES', 2000):
+            return engine
+    return engine_class()(period_start, period_end, employees, metrics=metrics, payroll_run=payroll_run)
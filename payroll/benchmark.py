@@ -0,0 +1,176 @@
+"""
+Payroll benchmark suite
+Builds a deterministic synthetic workforce and times the payroll stages
+(computation, run creation, bank file, Excel and PDF exports), counting
+queries for each. Used by manage.py benchmark_payroll against a scratch
+database.
+"""
+import random
+import time
+from datetime import time as clock, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from employees.models import Employee, SalaryGrade
+from attendance.models import AttendanceLog
+from attendance.summaries import refresh_summaries
+from .models import PayrollRun, Loan, OtherDeduction
+from .services import PayrollCalculator
+from .bank_export import BankFileExporter, export_to_excel
+from .pdf_generator import PayslipPDFGenerator
+from .jobs import claim_next_job, run_job
+
+
+BULK_BATCH_SIZE = 1000
+
+STAGES = ['generate', 'compute_payslip', 'run_create', 'bank_file', 'excel_export', 'payslip_pdf']
+
+DEPARTMENTS = ['HR', 'IT', 'Finance', 'Sales', 'Operations', 'Admin']
+BANKS = ['BDO', 'BPI', 'Metrobank', 'Landbank', '']
+BASE_PAYS = ['12345.67', '15000.00', '18500.00', '22000.11', '28000.00', '35000.00', '45000.00', '60000.00']
+
+
+def measure(items, func):
+    """Run func and return (result, {'items', 'seconds', 'queries', 'ms_per_item'})"""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    return result, {
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'queries': len(queries),
+        'ms_per_item': round(elapsed / items * 1000, 4) if items else 0,
+    }
+
+
+def create_workforce(size, period_start, period_end, seed=7):
+    """
+    Bulk-create size employees with attendance for every day of the period,
+    loans and deductions. The same size and seed always give the same rows.
+    """
+    from employees.management.commands.seed_complete_system import Command as SeedCommand
+
+    rng = random.Random(seed)
+    SeedCommand(stdout=StringIO()).create_contribution_tables()
+    grades = SalaryGrade.objects.bulk_create([
+        SalaryGrade(code=f'BENCH-{i}', base_pay=Decimal(pay)) for i, pay in enumerate(BASE_PAYS)
+    ])
+
+    for offset in range(0, size, BULK_BATCH_SIZE):
+        numbers = range(offset, min(offset + BULK_BATCH_SIZE, size))
+        users = User.objects.bulk_create([User(username=f'bench{i:06d}', password='!') for i in numbers])
+        employees = Employee.objects.bulk_create([
+            Employee(
+                user=user,
+                employee_no=f'BN{i:06d}',
+                first_name='Bench',
+                last_name=f'Employee{i}',
+                department=rng.choice(DEPARTMENTS),
+                position='Staff',
+                salary_grade=rng.choice(grades),
+                date_hired=period_start - timedelta(days=rng.randint(30, 3650)),
+                bank_name=rng.choice(BANKS),
+                bank_account=f'{rng.randint(0, 10**12 - 1):012d}',
+            )
+            for i, user in zip(numbers, users)
+        ])
+
+        logs = []
+        loans = []
+        deductions = []
+        for employee in employees:
+            day = period_start
+            while day <= period_end:
+                if rng.random() < 0.85:
+                    time_in = clock(rng.choice([7, 8, 8, 9]), rng.randint(0, 59))
+                    time_out = clock(rng.choice([16, 17, 17, 18, 20]), rng.randint(0, 59))
+                    logs.append(AttendanceLog(employee=employee, date=day, time_in=time_in, time_out=time_out))
+                day += timedelta(days=1)
+            if rng.random() < 0.3:
+                loans.append(Loan(
+                    employee=employee, loan_type=rng.choice(['SSS', 'PAGIBIG', 'SALARY']),
+                    principal_amount=Decimal('20000.00'), monthly_deduction=Decimal('2500.00'),
+                    remaining_balance=Decimal(rng.choice(['1200.50', '15000.00'])),
+                    start_date=period_start - timedelta(days=90),
+                ))
+            if rng.random() < 0.2:
+                deductions.append(OtherDeduction(
+                    employee=employee, description='Uniform', amount=Decimal('333.33'),
+                    is_recurring=rng.random() < 0.5,
+                ))
+
+        # bulk_create skips the post_save signal that keeps attendance summaries in sync
+        refresh_summaries(AttendanceLog.objects.bulk_create(logs, batch_size=BULK_BATCH_SIZE))
+        Loan.objects.bulk_create(loans)
+        OtherDeduction.objects.bulk_create(deductions)
+
+    return size
+
+
+def run_suite(size, period_start, period_end, seed=7, sample=1000, pdf_sample=100):
+    """
+    Build a workforce of size employees in the current (scratch) database and
+    time every stage. Per-employee stages (compute_payslip, payslip_pdf) run on
+    the first sample / pdf_sample employees. Returns {stage: measurement}.
+    """
+    results = {}
+    _, results['generate'] = measure(size, lambda: create_workforce(size, period_start, period_end, seed))
+
+    employees = list(Employee.objects.select_related('salary_grade').order_by('pk')[:sample])
+    _, results['compute_payslip'] = measure(len(employees), lambda: [
+        PayrollCalculator(employee, period_start, period_end).compute_payslip()
+        for employee in employees
+    ])
+
+    # run_create only queues the run; the background job computes and saves the payslips
+    admin = User.objects.create_superuser('bench-admin', password=None)
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(admin)
+
+    def create_run():
+        client.post(reverse('payroll_run_create'), {'period_start': period_start, 'period_end': period_end})
+        return run_job(claim_next_job(worker='benchmark'))
+
+    job, results['run_create'] = measure(size, create_run)
+    if job.status != 'DONE' or job.payslips_created != size:
+        raise RuntimeError(f"Payroll job ended {job.status}: {job.message}")
+    run = PayrollRun.objects.get(pk=job.payroll_run_id)
+
+    def bank_file():
+        exporter = BankFileExporter(run)
+        return exporter.generate_csv(), exporter.generate_summary()
+
+    _, results['bank_file'] = measure(size, bank_file)
+    _, results['excel_export'] = measure(size, lambda: export_to_excel(run))
+
+    payslips = run.payslips.order_by('pk')[:pdf_sample]
+    _, results['payslip_pdf'] = measure(min(size, pdf_sample), lambda: [
+        PayslipPDFGenerator(payslip).generate() for payslip in payslips
+    ])
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.05):
+    """
+    Compare benchmark results with a saved baseline (both as written by
+    benchmark_payroll). A stage regresses when it makes more queries, or when
+    it is slower by more than tolerance and by more than min_seconds.
+    Returns a list of (size, stage, reason) tuples.
+    """
+    regressions = []
+    for size, stages in results['sizes'].items():
+        for stage, current in stages.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(stage)
+            if previous is None or previous['items'] != current['items']:
+                continue
+            if current['queries'] > previous['queries']:
+                regressions.append((size, stage, f"queries {previous['queries']} -> {current['queries']}"))
+            slower = current['seconds'] - previous['seconds']
+            if slower > min_seconds and current['seconds'] > previous['seconds'] * (1 + tolerance):
+                regressions.append((size, stage, f"seconds {previous['seconds']:.3f} -> {current['seconds']:.3f}"))
+    return regressions
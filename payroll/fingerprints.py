@@ -0,0 +1,66 @@
+"""
+Payslip input fingerprints
+A hash of everything PayrollCalculator reads for an employee and period, so
+unchanged payslips can be recognised without recomputing them.
+"""
+import hashlib
+from contributions.rates import get_rates
+from attendance.models import AttendanceSummary
+from attendance.workdays import work_calendar
+from .models import Loan, OtherDeduction
+from .posting import pending_claims
+from .ytd import year_to_date
+
+
+def input_fingerprints(employees, period_start, period_end, payroll_run=None):
+    """
+    Map employee id -> SHA-256 of every input PayrollCalculator reads:
+    salary grade and hire date, attendance in the period, active loans,
+    active other deductions, what unposted payslips of runs other than
+    payroll_run already charge of them, the posted year-to-date totals before the period, the contribution and tax
+    rates in force, the holidays and working days of the period and the
+    period itself.
+    """
+    employee_ids = employees.values('pk')
+    repayments, claimed = pending_claims(employee_ids, payroll_run)
+    calendar = work_calendar(period_start, period_end).fingerprint(period_start, period_end)
+    header = f"{period_start}|{period_end}|rates:{get_rates(as_of=period_end).fingerprint}|calendar:{calendar}".encode()
+
+    hashers = {}
+    for employee_id, grade_id, base_pay, date_hired in employees.values_list(
+        'pk', 'salary_grade_id', 'salary_grade__base_pay', 'date_hired'
+    ):
+        hashers[employee_id] = hashlib.sha256(header)
+        hashers[employee_id].update(f"|grade:{grade_id}:{base_pay}|hired:{date_hired}".encode())
+
+    sources = [
+        ('att', AttendanceSummary.objects.filter(
+            employee__in=employee_ids,
+            date__gte=period_start,
+            date__lte=period_end
+        ).order_by('employee_id', 'date').values_list(
+            'employee_id', 'date', 'present', 'overtime_seconds', 'night_seconds', 'late_seconds'
+        )),
+        ('loan', (
+            (*row, repayments.get(row[1], 0)) for row in Loan.objects.filter(
+                employee__in=employee_ids,
+                is_active=True,
+                remaining_balance__gt=0
+            ).order_by('employee_id', 'pk').values_list('employee_id', 'pk', 'monthly_deduction', 'remaining_balance')
+        )),
+        ('ded', (
+            (*row, row[1] in claimed) for row in OtherDeduction.objects.filter(
+                employee__in=employee_ids,
+                is_active=True
+            ).order_by('employee_id', 'pk').values_list('employee_id', 'pk', 'amount', 'is_recurring')
+        )),
+        ('ytd', sorted(
+            (employee_id, totals.periods, totals.taxable, totals.tax_withheld)
+            for employee_id, totals in year_to_date(employee_ids, period_end.year, before=period_start).items()
+        )),
+    ]
+    for tag, rows in sources:
+        for employee_id, *values in rows:
+            hashers[employee_id].update(f"|{tag}:{values}".encode())
+
+    return {employee_id: hasher.hexdigest() for employee_id, hasher in hashers.items()}
@@ -0,0 +1,102 @@
+"""
+Incremental payslip recalculation
+Every payslip stores a fingerprint of the inputs it was computed from;
+recalculation recomputes only employees whose fingerprint changed.
+"""
+from collections import namedtuple
+from django.db import transaction
+from django.utils import timezone
+from employees.models import Employee
+from .models import Payslip
+from .batch import payroll_engine
+from .fingerprints import input_fingerprints
+from .metrics import NULL_METRICS
+
+
+# Above this many changed employees, recompute everyone rather than filter by id
+FULL_RECOMPUTE_THRESHOLD = 500
+
+PAYSLIP_FIELDS = [
+    'gross_pay', 'overtime_pay', 'holiday_pay', 'night_differential', 'absences', 'tardiness_hours', 'sss', 'philhealth', 'pagibig', 'tax',
+    'loan_deductions', 'other_deductions', 'net_pay', 'posting_effects', 'input_fingerprint',
+]
+
+
+RecalculationPlan = namedtuple('RecalculationPlan', 'fingerprints existing changed stale')
+
+
+def plan_recalculation(payroll_run, metrics=None):
+    """
+    Fingerprint the run's active employees and pick the engine for those
+    whose inputs changed. Returns (engine, RecalculationPlan).
+    """
+    metrics = metrics or NULL_METRICS
+    active = Employee.objects.filter(active=True)
+    with metrics.phase('fingerprints'):
+        fingerprints = input_fingerprints(active, payroll_run.period_start, payroll_run.period_end, payroll_run)
+        existing = {
+            slip.employee_id: slip
+            for slip in payroll_run.payslips.only('pk', 'employee_id', 'input_fingerprint')
+        }
+
+    changed = [pk for pk, fingerprint in fingerprints.items()
+               if pk not in existing or existing[pk].input_fingerprint != fingerprint]
+    stale = [slip.pk for employee_id, slip in existing.items() if employee_id not in fingerprints]
+
+    # Recompute the changed employees, or everyone past the threshold
+    if len(changed) > FULL_RECOMPUTE_THRESHOLD:
+        engine = payroll_engine(payroll_run.period_start, payroll_run.period_end, active, metrics=metrics,
+                                payroll_run=payroll_run)
+    else:
+        engine = payroll_engine(
+            payroll_run.period_start, payroll_run.period_end, active.filter(pk__in=changed), metrics=metrics,
+            payroll_run=payroll_run,
+        )
+    return engine, RecalculationPlan(fingerprints, existing, set(changed), stale)
+
+
+def recalculate_changed_payslips(payroll_run, progress=None, metrics=None):
+    """
+    Bring a run's payslips up to date, touching only what changed.
+    Returns a dict of created/updated/deleted/skipped counts and an errors list.
+    """
+    engine, plan = plan_recalculation(payroll_run, metrics=metrics)
+    return apply_recalculation(payroll_run, engine, plan, progress=progress, metrics=metrics)
+
+
+def apply_recalculation(payroll_run, engine, plan, progress=None, metrics=None):
+    """Compute the changed employees of a plan with its engine and write their payslips"""
+    metrics = metrics or NULL_METRICS
+    fingerprints, existing, changed, stale = plan
+
+    skipped = len(fingerprints) - len(changed)
+    now = timezone.now()
+    to_create, to_update = [], []
+    for employee, payroll_data in engine.compute():
+        if employee.pk not in changed:
+            continue
+        if progress:
+            progress(skipped + len(to_create) + len(to_update) + len(engine.errors))
+        payroll_data['input_fingerprint'] = fingerprints[employee.pk]
+        slip = existing.get(employee.pk)
+        if slip is None:
+            to_create.append(Payslip(payroll_run=payroll_run, employee=employee, **payroll_data))
+        else:
+            for field, value in payroll_data.items():
+                setattr(slip, field, value)
+            slip.updated_at = now
+            to_update.append(slip)
+
+    with metrics.phase('write'), transaction.atomic():
+        if stale:
+            Payslip.objects.filter(pk__in=stale).delete()
+        Payslip.objects.bulk_create(to_create, batch_size=engine.BULK_BATCH_SIZE)
+        Payslip.objects.bulk_update(to_update, PAYSLIP_FIELDS + ['updated_at'], batch_size=engine.BULK_BATCH_SIZE)
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(stale),
+        'skipped': skipped,
+        'errors': engine.errors,
+    }
@@ -0,0 +1,211 @@
+"""
+Database-backed job queue for payroll computation
+Views enqueue PayrollJob rows; manage.py payroll_worker claims and runs them.
+A running job's updated_at is refreshed by a heartbeat thread, so only jobs
+whose worker died look stale, and the worker writes the job only while it
+still holds it.
+The worker also rebuilds the attendance summaries queued by shift schedule
+changes, before each job and when idle.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from attendance.summaries import rebuild_queued_summaries
+from .models import PayrollJob
+from .batch import payroll_engine
+from .incremental import apply_recalculation, plan_recalculation
+from .thirteenth_month import ThirteenthMonthCalculator
+from .metrics import new_metrics
+
+
+# Write progress at most this often (seconds)
+PROGRESS_INTERVAL = 1.0
+# Refresh a running job's updated_at this often (seconds); keep payroll_worker --stale-after well above it
+HEARTBEAT_INTERVAL = 30.0
+
+
+class JobLost(Exception):
+    """The job was requeued, and maybe claimed by another worker, while this one ran it"""
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_payroll_job(payroll_run, kind, user=None, request_key=None):
+    """
+    Queue a computation for the run.
+    Returns (job, created); an already queued or running job for the run, or
+    the job an earlier submission with the same request_key queued, is
+    returned instead of queueing a second one.
+    """
+    existing = Q(payroll_run=payroll_run, status__in=['QUEUED', 'RUNNING'])
+    if request_key:
+        existing |= Q(request_key=request_key)
+    job = PayrollJob.objects.filter(existing).first()
+    if job:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = PayrollJob.objects.create(
+                payroll_run=payroll_run, kind=kind, requested_by=user, request_key=request_key or None,
+            )
+    except IntegrityError:
+        # A concurrent request queued it first (one active job per run, unique request keys)
+        return PayrollJob.objects.filter(existing).first(), False
+    return job, True
+
+
+def claim_next_job(worker=None):
+    """Claim the oldest queued job, or return None if the queue is empty"""
+    with transaction.atomic():
+        queued = PayrollJob.objects.filter(status='QUEUED').order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        job = queued.first()
+        if job is None:
+            return None
+
+        # The conditional UPDATE is the actual claim; it also guards databases without row locks
+        claimed = PayrollJob.objects.filter(pk=job.pk, status='QUEUED').update(
+            status='RUNNING',
+            started_at=timezone.now(),
+            worker=worker or worker_name(),
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(stale_after):
+    """Put RUNNING jobs whose worker stopped reporting progress back in the queue"""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return PayrollJob.objects.filter(status='RUNNING', updated_at__lt=cutoff).update(
+        status='QUEUED',
+        processed=0,
+        worker='',
+        message='Requeued after the previous worker stopped responding',
+        updated_at=timezone.now(),
+    )
+
+
+def held_job(job):
+    """The job's row as long as the worker that claimed it still holds it"""
+    return PayrollJob.objects.filter(pk=job.pk, status='RUNNING', worker=job.worker)
+
+
+class Heartbeat:
+    """Refresh a running job's updated_at from a thread, however long a phase of the computation takes"""
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = HEARTBEAT_INTERVAL if interval is None else interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'payroll-job-{job.pk}-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not held_job(self.job).update(updated_at=timezone.now()):
+                        self.lost = True
+                        return
+                except DatabaseError:
+                    # e.g. SQLite locked by the payslip write; the next beat tries again
+                    pass
+        finally:
+            # The thread's own connection
+            connection.close()
+
+
+def run_engine(payroll_run, metrics=None, employees=None):
+    """The engine that computes the run's payslips (of employees, by default every active one), by run type"""
+    if payroll_run.run_type == 'THIRTEENTH_MONTH':
+        return ThirteenthMonthCalculator(payroll_run.period_start, payroll_run.period_end, employees, metrics=metrics)
+    return payroll_engine(
+        payroll_run.period_start, payroll_run.period_end, employees, metrics=metrics, payroll_run=payroll_run
+    )
+
+
+def run_job(job):
+    """Compute the job's payroll run and record the outcome on the job"""
+    run = job.payroll_run
+    metrics = new_metrics()
+    # A 13th-month run has no input fingerprints; recalculating replaces all its payslips
+    incremental = job.kind == 'RECALCULATE' and run.run_type == 'REGULAR'
+    # The engine that actually computes the payslips, whose errors the job reports
+    engine = None
+    # The first call checks the job is still held straight away
+    last_write = [float('-inf')]
+
+    def progress(processed):
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL:
+            # Stop before writing payslips for a job another worker now holds
+            if heartbeat.lost or not held_job(job).update(processed=processed, updated_at=timezone.now()):
+                raise JobLost(f'Job {job.pk} is no longer held by {job.worker}')
+            last_write[0] = now
+
+    try:
+        with Heartbeat(job) as heartbeat, metrics.capture():
+            # Summaries still to be re-measured for a schedule change would be read stale
+            with metrics.phase('rebuild_summaries'):
+                rebuild_queued_summaries()
+            if incremental:
+                # Unchanged employees count as processed without being computed
+                engine, plan = plan_recalculation(run, metrics=metrics)
+                total = len(plan.fingerprints)
+            else:
+                engine = run_engine(run, metrics=metrics)
+                total = engine.employees.count()
+            if not held_job(job).update(total=total, updated_at=timezone.now()):
+                raise JobLost(f'Job {job.pk} is no longer held by {job.worker}')
+
+            if incremental:
+                result = apply_recalculation(run, engine, plan, progress=progress, metrics=metrics)
+            else:
+                payslips = engine.create_payslips(run, replace=job.kind == 'RECALCULATE', progress=progress)
+                result = {'created': len(payslips), 'updated': 0, 'deleted': 0, 'skipped': 0, 'errors': engine.errors}
+    except Exception as e:
+        held_job(job).update(
+            status='FAILED',
+            message=str(e),
+            errors=[f"{emp}: {error}" for emp, error in (engine.errors if engine else [])],
+            finished_at=timezone.now(),
+        )
+    else:
+        if job.kind == 'RECALCULATE':
+            message = (f"{result['created'] + result['updated']} payslips recalculated, "
+                       f"{result['skipped']} unchanged, {result['deleted']} removed.")
+        else:
+            message = f"{result['created']} payslips generated."
+        finished = held_job(job).update(
+            status='DONE',
+            processed=total,
+            payslips_created=result['created'],
+            payslips_updated=result['updated'],
+            payslips_skipped=result['skipped'],
+            errors=[f"{emp}: {error}" for emp, error in result['errors']],
+            message=message,
+            finished_at=timezone.now(),
+        )
+        if finished:
+            metrics.save(run, job.kind, employees=total)
+    job.refresh_from_db()
+    return job
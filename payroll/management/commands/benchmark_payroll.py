@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from datetime import date
+import json
+import os
+import platform
+import tempfile
+from payroll.benchmark import STAGES, run_suite, compare
+
+
+class Command(BaseCommand):
+    help = 'Times payroll stages on synthetic workforces in a scratch SQLite database and compares them with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='Comma-separated workforce sizes (default: 1000,10000; e.g. 1000,10000,100000)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for the synthetic workforce')
+        parser.add_argument('--period-start', type=date.fromisoformat, default=date(2025, 3, 1), help='Period start (YYYY-MM-DD)')
+        parser.add_argument('--period-end', type=date.fromisoformat, default=date(2025, 3, 15), help='Period end (YYYY-MM-DD)')
+        parser.add_argument('--sample', type=int, default=1000, help='Employees timed one by one with PayrollCalculator (default: 1000)')
+        parser.add_argument('--pdf-sample', type=int, default=100, help='Payslip PDFs generated per size (default: 100)')
+        parser.add_argument(
+            '--scratch',
+            default=os.path.join(tempfile.gettempdir(), 'payroll_benchmark.sqlite3'),
+            help='Scratch SQLite file; it is recreated for every size and deleted afterwards'
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before a stage counts as a regression (default: 0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_payroll needs a SQLite default database for its scratch copy')
+
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        results = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'seed': options['seed'],
+            'period_start': options['period_start'].isoformat(),
+            'period_end': options['period_end'].isoformat(),
+            'sizes': {},
+        }
+
+        # The scratch database replaces the default one for the duration of each size, like the test runner
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = options['scratch']
+        for size in sizes:
+            self.stdout.write(self.style.NOTICE(f'Building {size} employees in {options["scratch"]}...'))
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                stages = run_suite(
+                    size,
+                    options['period_start'],
+                    options['period_end'],
+                    seed=options['seed'],
+                    sample=options['sample'],
+                    pdf_sample=options['pdf_sample'],
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            results['sizes'][str(size)] = stages
+            self.print_size(size, stages, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, tolerance=options['tolerance'])
+            if regressions:
+                for size, stage, reason in regressions:
+                    self.stdout.write(self.style.ERROR(f'✗ {size} employees, {stage}: {reason}'))
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'✓ No regressions against {options["baseline"]}'))
+
+    def print_size(self, size, stages, baseline):
+        previous = (baseline or {}).get('sizes', {}).get(str(size), {})
+        self.stdout.write(f"{'Stage':<16} {'Items':>8} {'Seconds':>10} {'Queries':>9} {'ms/item':>10} {'vs baseline':>12}")
+        for stage in STAGES:
+            result = stages[stage]
+            change = ''
+            if stage in previous and previous[stage]['seconds']:
+                change = f"{(result['seconds'] / previous[stage]['seconds'] - 1) * 100:+.0f}%"
+            self.stdout.write(
+                f"{stage:<16} {result['items']:>8} {result['seconds']:>10.3f} {result['queries']:>9} "
+                f"{result['ms_per_item']:>10.3f} {change:>12}"
+            )
@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from datetime import date
+from decimal import Decimal
+import random
+import time
+from attendance.summaries import PeriodTotals
+from attendance.workdays import work_calendar
+from contributions.rates import get_rates
+from employees.models import Employee, SalaryGrade
+from payroll.batch import PreloadedPayrollCalculator
+from payroll.models import Loan, OtherDeduction
+from payroll.reference import reference_payslip
+from payroll.ytd import periods_per_year
+
+
+class Command(BaseCommand):
+    help = 'Times per-payslip payroll math: integer-centavo PayrollCalculator vs the Decimal reference (in memory, nothing is written)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=10000, help='Synthetic employees per run (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation; the fastest is reported')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for the synthetic workforce')
+
+    def handle(self, *args, **options):
+        period_start, period_end = date(2025, 3, 1), date(2025, 3, 15)
+        calendar = work_calendar(period_start, period_end)
+        paid_days = calendar.paid_days(period_start, period_end)
+        per_year = periods_per_year(period_start, period_end)
+        rates = get_rates(as_of=period_end)
+        rng = random.Random(options['seed'])
+
+        # Unsaved rows: the calculators only read attributes
+        workforce = []
+        for i in range(options['employees']):
+            grade = SalaryGrade(code=f'B{i}', base_pay=Decimal(rng.randint(1000000, 15000000)) / 100)
+            employee = Employee(pk=i + 1, employee_no=f'B{i:06d}', salary_grade=grade)
+            days = rng.choice([0, 9, 10, 11, 11, 11])
+            holidays = rng.choice([0, 0, 0, 1])
+            attendance = PeriodTotals(
+                days, days, days * 8 * 3600, rng.choice([0, 0, 1800, 7272, 14400]), 0,
+                days - holidays, holidays, 0, rng.choice([0, 0, 0, 3600, 28800]) if days else 0,
+            )
+            loans = [
+                Loan(pk=i * 2 + n, monthly_deduction=Decimal('2500.00'), remaining_balance=Decimal(rng.choice(['1200.50', '15000.00'])))
+                for n in range(rng.choice([0, 0, 1, 2]))
+            ]
+            deductions = [
+                OtherDeduction(pk=i * 2 + n, amount=Decimal('333.33'), is_recurring=bool(n))
+                for n in range(rng.choice([0, 1, 2]))
+            ]
+            workforce.append((employee, attendance, loans, deductions))
+
+        def run_integer():
+            return [
+                PreloadedPayrollCalculator(
+                    employee, period_start, period_end, rates=rates,
+                    attendance=attendance, loans=loans, deductions=deductions, calendar=calendar,
+                ).compute_payslip()
+                for employee, attendance, loans, deductions in workforce
+            ]
+
+        def run_reference():
+            return [
+                reference_payslip(
+                    employee.salary_grade.base_pay,
+                    attendance.days,
+                    paid_days,
+                    attendance.overtime_seconds,
+                    [(loan.monthly_deduction, loan.remaining_balance) for loan in loans],
+                    [deduction.amount for deduction in deductions],
+                    rates,
+                    per_year=per_year,
+                    regular_holidays_worked=attendance.regular_holidays_worked,
+                    special_holidays_worked=attendance.special_holidays_worked,
+                    night_seconds=attendance.night_seconds,
+                )
+                for employee, attendance, loans, deductions in workforce
+            ]
+
+        timings = {}
+        results = {}
+        for name, run in (('Decimal reference', run_reference), ('Integer centavos', run_integer)):
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results[name] = run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+
+        mismatches = sum(
+            1 for expected, actual in zip(results['Decimal reference'], results['Integer centavos'])
+            if any(actual[field] != value for field, value in expected.items())
+        )
+
+        count = len(workforce)
+        baseline = timings['Decimal reference']
+        self.stdout.write(self.style.NOTICE(f'{count} synthetic payslips, best of {options["repeat"]}'))
+        self.stdout.write(f"{'Implementation':<20} {'Seconds':>10} {'µs/payslip':>12} {'Speedup':>8}")
+        for name, elapsed in timings.items():
+            per_payslip = elapsed / count * 1e6 if count else 0
+            self.stdout.write(f'{name:<20} {elapsed:>10.3f} {per_payslip:>12.1f} {baseline / elapsed:>7.2f}x')
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'✗ {mismatches} payslips differ from the Decimal reference'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ All payslips match the Decimal reference'))
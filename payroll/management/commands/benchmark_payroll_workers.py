@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import date
+import os
+import time
+from payroll.batch import BatchPayrollCalculator
+from payroll.parallel import ShardedPayrollCalculator
+
+
+class Command(BaseCommand):
+    help = 'Times payroll computation for the active workforce across worker counts (no payslips are written)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period-start', type=date.fromisoformat, help='Period start (YYYY-MM-DD, default: first of this month)')
+        parser.add_argument('--period-end', type=date.fromisoformat, help='Period end (YYYY-MM-DD, default: today)')
+        parser.add_argument(
+            '--workers',
+            default=None,
+            help='Comma-separated worker counts to try (default: 1, 2, 4, ... up to the CPU count)'
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per worker count; the fastest is reported')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        period_start = options['period_start'] or today.replace(day=1)
+        period_end = options['period_end'] or today
+
+        if options['workers']:
+            worker_counts = [int(w) for w in options['workers'].split(',')]
+        else:
+            cpus = os.cpu_count() or 1
+            worker_counts = [1]
+            while worker_counts[-1] * 2 <= cpus:
+                worker_counts.append(worker_counts[-1] * 2)
+            if worker_counts[-1] != cpus:
+                worker_counts.append(cpus)
+
+        self.stdout.write(self.style.NOTICE(f'Payroll period {period_start} to {period_end}, {os.cpu_count()} CPUs'))
+        self.stdout.write(f"{'Workers':>8} {'Payslips':>10} {'Seconds':>10} {'Payslips/s':>12} {'Speedup':>8}")
+
+        baseline = None
+        for workers in worker_counts:
+            best = None
+            for _ in range(options['repeat']):
+                if workers == 1:
+                    engine = BatchPayrollCalculator(period_start, period_end)
+                else:
+                    engine = ShardedPayrollCalculator(period_start, period_end, workers=workers)
+                started = time.perf_counter()
+                computed = sum(1 for _ in engine.compute())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            baseline = baseline or best
+            rate = computed / best if best else 0
+            self.stdout.write(f'{workers:>8} {computed:>10} {best:>10.2f} {rate:>12.0f} {baseline / best:>7.2f}x')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+from attendance.summaries import rebuild_queued_summaries
+from payroll.jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = ('Processes queued payroll jobs (run creation and recalculation) from the database, and the attendance '
+            'summary rebuilds queued by shift schedule changes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process queued jobs until the queue is empty, then exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait between polls when idle (default: 2)')
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Requeue RUNNING jobs whose worker has not reported for this many seconds (default: 600, 0 disables)'
+        )
+
+    def handle(self, *args, **options):
+        name = worker_name()
+        self.stdout.write(self.style.SUCCESS(f'Payroll worker {name} started'))
+
+        try:
+            while True:
+                close_old_connections()
+                if options['stale_after']:
+                    requeued = requeue_stale_jobs(options['stale_after'])
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+
+                job = claim_next_job(name)
+                if job is None:
+                    rebuilt = rebuild_queued_summaries()
+                    if rebuilt:
+                        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} attendance summaries for shift changes'))
+                        continue
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f'Running job {job.pk}: {job}')
+                job = run_job(job)
+                if job.status == 'DONE':
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {job.message} ({len(job.errors)} errors)'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'  ✗ Failed: {job.message}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping payroll worker')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from payroll.ytd import rebuild_year_to_date
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the year-to-date payroll totals used for tax annualization from the payslips of paid runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only this year (default: every year)')
+
+    def handle(self, *args, **options):
+        count = rebuild_year_to_date(options['year'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} year-to-date totals'))
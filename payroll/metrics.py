@@ -0,0 +1,141 @@
+"""
+Payroll phase timing
+PhaseMetrics times the named phases of a payroll computation or export,
+counts the queries run inside each one and collects per-employee compute
+times for percentiles. The result is saved as a PayrollRunMetrics row.
+When PAYROLL_METRICS is off, NULL_METRICS stands in: every phase is a
+shared no-op context manager and nothing is recorded.
+"""
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from django.conf import settings
+from django.db import connection
+
+
+class _Phase:
+    """Context manager adding its elapsed time to one phase"""
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.metrics.stack.append(self.name)
+        self.started = perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = perf_counter() - self.started
+        self.metrics.stack.pop()
+        totals = self.metrics.phases.get(self.name)
+        if totals is None:
+            totals = self.metrics.phases[self.name] = [0.0, 0, 0]
+        totals[0] += elapsed
+        totals[1] += 1
+
+
+class _Employee:
+    """Context manager recording the time spent on one employee"""
+    __slots__ = ('metrics', 'started')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __enter__(self):
+        self.started = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.employee_seconds.append(perf_counter() - self.started)
+
+
+class PhaseMetrics:
+    """Phase timings and query counts for one payroll operation"""
+    enabled = True
+
+    def __init__(self):
+        # name -> [seconds, calls, queries], in the order phases first ran
+        self.phases = {}
+        self.stack = []
+        self.employee_seconds = []
+        self.queries = 0
+        self.started = perf_counter()
+        self.seconds = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def employee(self):
+        return _Employee(self)
+
+    @contextmanager
+    def capture(self):
+        """Count the queries run on the default connection, per innermost phase"""
+        def count_query(execute, sql, params, many, context):
+            self.queries += 1
+            if self.stack:
+                totals = self.phases.get(self.stack[-1])
+                if totals is None:
+                    totals = self.phases[self.stack[-1]] = [0.0, 0, 0]
+                totals[2] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            yield self
+        self.seconds = perf_counter() - self.started
+
+    def percentiles(self):
+        """p50/p90/p99/max of the per-employee compute times, in seconds"""
+        times = sorted(self.employee_seconds)
+        if not times:
+            return {}
+
+        def percentile(q):
+            return times[min(len(times) - 1, int(q * len(times)))]
+
+        return {'p50': percentile(0.50), 'p90': percentile(0.90), 'p99': percentile(0.99), 'max': times[-1]}
+
+    def save(self, payroll_run, operation, employees=None):
+        """Store the timings as a PayrollRunMetrics row (employees defaults to the number timed)"""
+        from .models import PayrollRunMetrics
+
+        seconds = self.seconds if self.seconds is not None else perf_counter() - self.started
+        return PayrollRunMetrics.objects.create(
+            payroll_run=payroll_run,
+            operation=operation,
+            employees=len(self.employee_seconds) if employees is None else employees,
+            total_seconds=seconds,
+            total_queries=self.queries,
+            phases=[
+                {'name': name, 'seconds': totals[0], 'calls': totals[1], 'queries': totals[2]}
+                for name, totals in self.phases.items()
+            ],
+            employee_percentiles=self.percentiles(),
+        )
+
+
+class NullMetrics:
+    """Stand-in for PhaseMetrics when instrumentation is off"""
+    enabled = False
+    _noop = nullcontext()
+
+    def phase(self, name):
+        return self._noop
+
+    def employee(self):
+        return self._noop
+
+    def capture(self):
+        return nullcontext(self)
+
+    def save(self, payroll_run, operation, employees=None):
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+def new_metrics():
+    """PhaseMetrics if PAYROLL_METRICS is on (the default), otherwise NULL_METRICS"""
+    if getattr(settings, 'PAYROLL_METRICS', True):
+        return PhaseMetrics()
+    return NULL_METRICS
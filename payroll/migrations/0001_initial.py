@@ -0,0 +1,101 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('REVIEW', 'Under Review'), ('APPROVED', 'Approved'), ('PAID', 'Paid'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('paid_date', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_runs_approved', to=settings.AUTH_USER_MODEL)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payroll_runs_created', to=settings.AUTH_USER_MODEL)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_runs_reviewed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OtherDeduction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('is_recurring', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='employees.employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_type', models.CharField(choices=[('SALARY', 'Salary Loan'), ('EMERGENCY', 'Emergency Loan'), ('HOUSING', 'Housing Loan'), ('OTHER', 'Other')], max_length=20)),
+                ('principal_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('monthly_deduction', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('remaining_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('start_date', models.DateField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='employees.employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Payslip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gross_pay', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('overtime_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('holiday_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('night_differential', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('allowances', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sss', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('philhealth', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pagibig', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('loan_deductions', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('other_deductions', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_pay', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('days_worked', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('tardiness_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('absences', models.IntegerField(default=0)),
+                ('bank_file_generated', models.BooleanField(default=False)),
+                ('bank_file_sent', models.BooleanField(default=False)),
+                ('salary_deposited', models.BooleanField(default=False)),
+                ('deposit_date', models.DateTimeField(blank=True, null=True)),
+                ('pdf_file', models.FileField(blank=True, null=True, upload_to='payslips/')),
+                ('pdf_sent', models.BooleanField(default=False)),
+                ('pdf_sent_date', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='employees.employee')),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payslips', to='payroll.payrollrun')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('payroll_run', 'employee')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0002_payrolljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrolljob',
+            name='payslips_skipped',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrolljob',
+            name='payslips_updated',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0003_payrolljob_payslips_skipped_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrun',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='posting_effects',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
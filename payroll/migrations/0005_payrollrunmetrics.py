@@ -0,0 +1,32 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0004_payrollrun_posted_at_payslip_posting_effects'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRunMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('CREATE', 'Create Payslips'), ('RECALCULATE', 'Recalculate Payslips'), ('BANK_FILE', 'Bank File'), ('EXCEL', 'Excel Export'), ('PDF', 'Payslip PDFs')], max_length=20)),
+                ('employees', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('total_queries', models.PositiveIntegerField(default=0)),
+                ('phases', models.JSONField(blank=True, default=list)),
+                ('employee_percentiles', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='payroll.payrollrun')),
+            ],
+            options={
+                'verbose_name_plural': 'payroll run metrics',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_payrollrunmetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanRepayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repayments', to='payroll.loan')),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='loan_repayments', to='payroll.payrollrun')),
+                ('payslip', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='loan_repayments', to='payroll.payslip')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('payslip', 'loan')},
+            },
+        ),
+    ]
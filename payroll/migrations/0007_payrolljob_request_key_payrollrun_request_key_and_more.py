@@ -0,0 +1,27 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0006_loanrepayment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrolljob',
+            name='request_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='payrollrun',
+            name='request_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='payrolljob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['QUEUED', 'RUNNING'])), fields=('payroll_run',), name='payroll_job_one_active_per_run'),
+        ),
+    ]
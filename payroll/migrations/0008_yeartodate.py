@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('payroll', '0007_payrolljob_request_key_payrollrun_request_key_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearToDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('periods', models.PositiveIntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('contributions', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('taxable', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_withheld', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_to_date', to='employees.employee')),
+            ],
+            options={
+                'verbose_name': 'year-to-date totals',
+                'verbose_name_plural': 'year-to-date totals',
+                'ordering': ['-year'],
+                'unique_together': {('employee', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0008_yeartodate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrun',
+            name='run_type',
+            field=models.CharField(choices=[('REGULAR', 'Regular'), ('THIRTEENTH_MONTH', '13th Month Pay')], default='REGULAR', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='thirteenth_month_pay',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
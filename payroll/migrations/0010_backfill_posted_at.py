@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_posted_at(apps, schema_editor):
+    """Runs paid before posting was recorded had their effects applied when they were paid"""
+    PayrollRun = apps.get_model('payroll', 'PayrollRun')
+    PayrollRun.objects.filter(status='PAID', posted_at__isnull=True).update(
+        posted_at=Coalesce(F('paid_date'), F('created_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0009_payrollrun_run_type_payslip_thirteenth_month_pay'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_posted_at, migrations.RunPython.noop),
+    ]
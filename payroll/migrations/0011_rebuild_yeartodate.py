@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def rebuild_year_to_date(apps, schema_editor):
+    """The withholding tax step reads YearToDate, which only counts runs posted since it was added"""
+    from payroll.ytd import AMOUNT_FIELDS, payslip_totals
+    from payroll.money import from_centavos
+
+    Payslip = apps.get_model('payroll', 'Payslip')
+    YearToDate = apps.get_model('payroll', 'YearToDate')
+    totals = payslip_totals(Payslip.objects.filter(payroll_run__posted_at__isnull=False))
+    YearToDate.objects.all().delete()
+    YearToDate.objects.bulk_create([
+        YearToDate(
+            employee_id=employee_id,
+            year=year,
+            periods=row[0],
+            **{field: from_centavos(value) for field, value in zip(AMOUNT_FIELDS, row[1:])},
+        )
+        for (employee_id, year), row in totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0010_backfill_posted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_year_to_date, migrations.RunPython.noop),
+    ]
@@ -11,7 +11,20 @@ class PayrollRun(models.Model):
         ('PAID', 'Paid'),
         ('CANCELLED', 'Cancelled'),
     )
+    # Allowed status moves (applied by payroll.workflow.transition_run)
+    TRANSITIONS = {
+        'DRAFT': ('REVIEW', 'CANCELLED'),
+        'REVIEW': ('DRAFT', 'APPROVED', 'CANCELLED'),
+        'APPROVED': ('PAID', 'CANCELLED'),
+        'PAID': (),
+        'CANCELLED': (),
+    }
+    RUN_TYPE_CHOICES = (
+        ('REGULAR', 'Regular'),
+        ('THIRTEENTH_MONTH', '13th Month Pay'),
+    )
     
+    run_type = models.CharField(max_length=20, choices=RUN_TYPE_CHOICES, default='REGULAR')
     period_start = models.DateField()
     period_end = models.DateField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
@@ -26,13 +39,20 @@ class PayrollRun(models.Model):
     approved_at = models.DateTimeField(null=True, blank=True)
     
     paid_date = models.DateTimeField(null=True, blank=True)
+    # Set once the payslips' loan repayments and used deductions are applied (see payroll.posting)
+    posted_at = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
+    # Idempotency key of the create form that made the run; a resubmitted form finds the same run
+    request_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return f"PayrollRun {self.period_start} to {self.period_end} ({self.status})"
+    
+    def can_transition(self, status):
+        return status in self.TRANSITIONS.get(self.status, ())
 
 class Loan(models.Model):
     """Employee loan management"""
@@ -47,6 +67,7 @@ class Loan(models.Model):
     loan_type = models.CharField(max_length=20, choices=LOAN_TYPES)
     principal_amount = models.DecimalField(max_digits=12, decimal_places=2)
     monthly_deduction = models.DecimalField(max_digits=12, decimal_places=2)
+    # Kept in step with the LoanRepayment ledger by payroll.posting
     remaining_balance = models.DecimalField(max_digits=12, decimal_places=2)
     start_date = models.DateField()
     is_active = models.BooleanField(default=True)
@@ -78,6 +99,8 @@ class Payslip(models.Model):
     holiday_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     night_differential = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     allowances = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Paid by 13th-month runs only (see payroll.thirteenth_month)
+    thirteenth_month_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
     # Government deductions
     sss = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -109,6 +132,11 @@ class Payslip(models.Model):
     pdf_sent = models.BooleanField(default=False)
     pdf_sent_date = models.DateTimeField(null=True, blank=True)
     
+    # Hash of the inputs the payslip was computed from (see payroll.incremental)
+    input_fingerprint = models.CharField(max_length=64, blank=True)
+    # Loan repayments and one-time deductions to apply when the run is posted
+    posting_effects = models.JSONField(default=list, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -121,8 +149,166 @@ class Payslip(models.Model):
     
     @property
     def total_earnings(self):
-        return self.gross_pay + self.overtime_pay + self.holiday_pay + self.night_differential + self.allowances
+        return (self.gross_pay + self.overtime_pay + self.holiday_pay + self.night_differential + self.allowances
+                + self.thirteenth_month_pay)
     
     @property
     def total_deductions(self):
         return self.sss + self.philhealth + self.pagibig + self.tax + self.loan_deductions + self.other_deductions
+
+class LoanRepayment(models.Model):
+    """
+    Ledger of loan repayments: one row per loan per payslip, written when the run is posted.
+    The ledger protects the payslips and runs it records, so a posted run, and an employee
+    with posted repayments, cannot be deleted (cancel the run, deactivate the employee).
+    """
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayments')
+    payslip = models.ForeignKey(Payslip, on_delete=models.PROTECT, related_name='loan_repayments')
+    payroll_run = models.ForeignKey(PayrollRun, on_delete=models.PROTECT, related_name='loan_repayments')
+    # Amount applied to the loan balance (never more than the balance at posting time)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Loan balance after this repayment
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['payslip', 'loan']
+
+    def __str__(self):
+        return f"{self.loan} repayment {self.amount} ({self.payroll_run})"
+
+class YearToDate(models.Model):
+    """Per-employee, per-year payroll totals, added to when runs are posted (see payroll.ytd)"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='year_to_date')
+    year = models.PositiveSmallIntegerField()
+    # Posted payslips counted in the totals
+    periods = models.PositiveIntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    contributions = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    taxable = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_withheld = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-year']
+        unique_together = ['employee', 'year']
+        verbose_name = 'year-to-date totals'
+        verbose_name_plural = 'year-to-date totals'
+
+    def __str__(self):
+        return f"{self.employee} {self.year} YTD"
+
+class PayrollJob(models.Model):
+    """Background payroll computation for a run, processed by manage.py payroll_worker"""
+    KIND_CHOICES = (
+        ('CREATE', 'Create Payslips'),
+        ('RECALCULATE', 'Recalculate Payslips'),
+    )
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+    
+    payroll_run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    
+    # Progress
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    payslips_created = models.PositiveIntegerField(default=0)
+    payslips_updated = models.PositiveIntegerField(default=0)
+    payslips_skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    
+    worker = models.CharField(max_length=100, blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    # Idempotency key of the form that queued the job
+    request_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        constraints = [
+            # At most one queued or running computation per run
+            models.UniqueConstraint(
+                fields=['payroll_run'],
+                condition=models.Q(status__in=['QUEUED', 'RUNNING']),
+                name='payroll_job_one_active_per_run',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.payroll_run} ({self.status})"
+    
+    @property
+    def is_active(self):
+        return self.status in ('QUEUED', 'RUNNING')
+    
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == 'DONE' else 0
+        return int(self.processed * 100 / self.total)
+    
+    @property
+    def eta_seconds(self):
+        """Estimated seconds left, from the average pace so far"""
+        if self.status != 'RUNNING' or not self.started_at or not self.processed:
+            return None
+        from django.utils import timezone
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        return int(elapsed / self.processed * (self.total - self.processed))
+
+
+class PayrollRunMetrics(models.Model):
+    """Phase timings and query counts of one payroll computation or export (see payroll.metrics)"""
+    OPERATION_CHOICES = (
+        ('CREATE', 'Create Payslips'),
+        ('RECALCULATE', 'Recalculate Payslips'),
+        ('BANK_FILE', 'Bank File'),
+        ('EXCEL', 'Excel Export'),
+        ('PDF', 'Payslip PDFs'),
+    )
+    
+    payroll_run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='metrics')
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    employees = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    total_queries = models.PositiveIntegerField(default=0)
+    # [{'name', 'seconds', 'calls', 'queries'}] in the order the phases first ran
+    phases = models.JSONField(default=list, blank=True)
+    # Per-employee compute time percentiles in seconds: {'p50', 'p90', 'p99', 'max'}
+    employee_percentiles = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'payroll run metrics'
+
+    def __str__(self):
+        return f"{self.get_operation_display()} for {self.payroll_run} ({self.total_seconds:.2f}s)"
+    
+    @property
+    def phase_rows(self):
+        """Phases with milliseconds and their share of the total time, for display"""
+        return [
+            {
+                **phase,
+                'ms': phase['seconds'] * 1000,
+                'percent': phase['seconds'] * 100 / self.total_seconds if self.total_seconds else 0,
+            }
+            for phase in self.phases
+        ]
+    
+    @property
+    def percentiles_ms(self):
+        return {name: seconds * 1000 for name, seconds in self.employee_percentiles.items()}
@@ -0,0 +1,126 @@
+"""
+Fixed-point money arithmetic
+Payroll math runs on integer centavos and integer seconds; rates are integer
+units of 1/10000. Every division rounds the exact quotient half-even (the same
+rule as Decimal.quantize), and amounts become Decimal only at model boundaries.
+"""
+import weakref
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_EVEN
+from contributions.rates import TAX_EXEMPT_CEILING
+
+
+RATE_SCALE = 10000  # Rates have 4 decimal places
+CENT = Decimal('0.01')
+
+
+def to_centavos(amount):
+    """Pesos as integer centavos, rounding anything past the centavo half-even"""
+    return int(Decimal(amount * 100).to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_rate_units(rate):
+    """A rate as integer units of 1/RATE_SCALE, rounded half-even like to_centavos"""
+    return int(Decimal(rate * RATE_SCALE).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_centavos(value):
+    return Decimal(int(value)) * CENT
+
+
+def div_round(numerator, denominator):
+    """Integer division rounded half-even (denominator > 0)"""
+    quotient, remainder = divmod(numerator, denominator)
+    twice = remainder * 2
+    if twice > denominator or (twice == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+class CentavoRates:
+    """ContributionRates as integer tables, for per-employee lookups in centavos"""
+
+    def __init__(self, rates):
+        self.sss_bounds = [to_centavos(b.min_salary) for b in rates.sss_brackets]
+        self.sss_rows = [
+            (to_centavos(b.max_salary), to_centavos(b.employee), to_centavos(b.employer))
+            for b in rates.sss_brackets
+        ]
+        top = rates.sss_top
+        self.sss_top = (to_centavos(top.employee), to_centavos(top.employer)) if top else (0, 0)
+
+        self.philhealth = None
+        if rates.philhealth:
+            cap = rates.philhealth.max_contribution
+            self.philhealth = (
+                to_rate_units(rates.philhealth.premium_rate),
+                to_centavos(cap) * RATE_SCALE if cap else None,
+            )
+
+        self.pagibig = None
+        if rates.pagibig:
+            pagibig = rates.pagibig
+            self.pagibig = (
+                to_rate_units(pagibig.employee_rate),
+                to_rate_units(pagibig.employer_rate),
+                to_centavos(pagibig.max_employee) * RATE_SCALE if pagibig.max_employee else None,
+                to_centavos(pagibig.max_employer) * RATE_SCALE if pagibig.max_employer else None,
+            )
+
+        schedule = rates.withholding_tax
+        self.tax_bounds = [to_centavos(b) for b in schedule.breakpoints]
+        self.tax_segments = [(to_centavos(base), to_rate_units(rate)) for base, rate in schedule.segments]
+        self.tax_exempt_ceiling = to_centavos(TAX_EXEMPT_CEILING)
+
+    def sss(self, salary):
+        """(employee, employer) SSS shares; salary above every bracket uses the highest one"""
+        i = bisect_right(self.sss_bounds, salary) - 1
+        if i >= 0 and salary <= self.sss_rows[i][0]:
+            return self.sss_rows[i][1], self.sss_rows[i][2]
+        return self.sss_top
+
+    def philhealth_contribution(self, salary):
+        """(employee, employer) PhilHealth shares, split 50-50"""
+        if not self.philhealth:
+            return 0, 0
+        rate, cap = self.philhealth
+        contribution = salary * rate
+        if cap is not None and contribution > cap:
+            contribution = cap
+        share = div_round(contribution, 2 * RATE_SCALE)
+        return share, share
+
+    def pagibig_contribution(self, salary):
+        """(employee, employer) Pag-IBIG shares"""
+        if not self.pagibig:
+            return 0, 0
+        employee_rate, employer_rate, employee_cap, employer_cap = self.pagibig
+        employee = salary * employee_rate
+        if employee_cap is not None and employee > employee_cap:
+            employee = employee_cap
+        employer = salary * employer_rate
+        if employer_cap is not None and employer > employer_cap:
+            employer = employer_cap
+        return div_round(employee, RATE_SCALE), div_round(employer, RATE_SCALE)
+
+    def withholding_tax(self, annual_taxable):
+        """Annual withholding tax"""
+        if annual_taxable <= self.tax_exempt_ceiling:
+            return 0
+        i = bisect_right(self.tax_bounds, annual_taxable) - 1
+        if i < 0:
+            return 0
+        base_tax, rate = self.tax_segments[i]
+        excess = annual_taxable - self.tax_bounds[i]
+        return div_round(base_tax * RATE_SCALE + excess * rate, RATE_SCALE)
+
+
+_centavo_rates = weakref.WeakKeyDictionary()
+
+
+def centavo_rates(rates):
+    """CentavoRates for compiled rates, built once per ContributionRates object"""
+    compiled = _centavo_rates.get(rates)
+    if compiled is None:
+        compiled = _centavo_rates[rates] = CentavoRates(rates)
+    return compiled
@@ -0,0 +1,59 @@
+"""
+Process-pool sharded payroll computation
+Splits the workforce into employee-id ranges and computes each shard in its
+own process (with its own database connection); the parent merges the
+results and writes every payslip in one transaction.
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from .batch import BatchPayrollCalculator
+from .shard_worker import init_worker, compute_shard
+
+
+class ShardedPayrollCalculator(BatchPayrollCalculator):
+    """BatchPayrollCalculator that spreads the computation over a process pool"""
+
+    # More shards than workers so a slow shard doesn't leave cores idle
+    SHARDS_PER_WORKER = 4
+
+    def __init__(self, period_start, period_end, employees=None, workers=None, metrics=None, payroll_run=None):
+        super().__init__(period_start, period_end, employees, metrics=metrics, payroll_run=payroll_run)
+        self.workers = workers or os.cpu_count() or 1
+
+    def shards(self, employee_ids):
+        """Split sorted employee ids into (first_pk, last_pk) ranges"""
+        size = math.ceil(len(employee_ids) / (self.workers * self.SHARDS_PER_WORKER))
+        return [
+            (employee_ids[i], employee_ids[min(i + size, len(employee_ids)) - 1])
+            for i in range(0, len(employee_ids), size)
+        ]
+
+    def compute(self):
+        """Yield (employee, payroll_data) as shards finish, in employee-id order"""
+        with self.metrics.phase('load_employees'):
+            employees = {employee.pk: employee for employee in self.employees.order_by('pk')}
+        if not employees:
+            return
+        shards = self.shards(list(employees))
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(shards)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(settings.DATABASES,),
+        ) as pool:
+            futures = [
+                pool.submit(compute_shard, self.period_start, self.period_end, self.employees.query, first_pk, last_pk,
+                            self.payroll_run)
+                for first_pk, last_pk in shards
+            ]
+            for future in futures:
+                # Workers are not instrumented; this is the time spent waiting for each shard
+                with self.metrics.phase('shards'):
+                    results, errors = future.result()
+                self.errors.extend((employees[pk], message) for pk, message in errors)
+                for pk, payroll_data in results:
+                    yield employees[pk], payroll_data
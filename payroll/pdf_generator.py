@@ -88,6 +88,8 @@ class PayslipPDFGenerator:
             earnings_data.append(['Night Differential', self._format_currency(self.payslip.night_differential)])
         if self.payslip.allowances > 0:
             earnings_data.append(['Allowances', self._format_currency(self.payslip.allowances)])
+        if self.payslip.thirteenth_month_pay > 0:
+            earnings_data.append(['13th Month Pay', self._format_currency(self.payslip.thirteenth_month_pay)])
         
         earnings_data.append(['TOTAL EARNINGS', self._format_currency(self.payslip.total_earnings)])
         
@@ -0,0 +1,200 @@
+"""
+Payroll posting
+Payroll computation only records the state changes a payslip implies
+(Payslip.posting_effects); posting applies them for one or more whole
+runs in one transaction when the runs are paid.
+
+Loan repayments go to the LoanRepayment ledger, one row per loan per
+payslip, and the loans' cached remaining_balance is set in the same
+transaction from the balances read under a row lock. The run's posted_at mark (checked
+under a row lock) and the ledger's unique (payslip, loan) pair make
+posting idempotent: a run is never applied to the balances twice.
+
+Until then the effects are claims: computing a run leaves out the one-time
+deductions and the part of loan balances that unposted payslips of other
+runs already charge (pending_claims), so two drafts never charge the same
+deduction twice or repay more than a loan's balance.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from .models import PayrollRun, Payslip, Loan, LoanRepayment, OtherDeduction
+from .ytd import add_to_year_to_date, payslip_totals
+
+
+BULK_BATCH_SIZE = 500
+
+
+def collect_posting_effects(run_ids):
+    """
+    Return (repayment per (run id, payslip id, loan id), one-time deduction
+    ids per run id) for the payslips of the given runs
+    """
+    repayments = defaultdict(Decimal)
+    deduction_ids = defaultdict(set)
+    payslips = Payslip.objects.filter(payroll_run_id__in=run_ids).values_list('payroll_run_id', 'pk', 'posting_effects')
+    for run_id, payslip_id, effects in payslips:
+        for effect in effects:
+            if effect['type'] == 'loan_repayment':
+                repayments[run_id, payslip_id, effect['loan_id']] += Decimal(effect['amount'])
+            elif effect['type'] == 'deactivate_deduction':
+                deduction_ids[run_id].add(effect['deduction_id'])
+    return repayments, deduction_ids
+
+
+def pending_claims(employee_ids, exclude_run=None):
+    """
+    Return ({loan id: repayment}, one-time deduction ids) charged by the
+    unposted payslips of the employees in runs that are not cancelled,
+    leaving out exclude_run (the run being computed)
+    """
+    payslips = Payslip.objects.filter(
+        employee__in=employee_ids,
+        payroll_run__posted_at__isnull=True,
+    ).exclude(payroll_run__status='CANCELLED')
+    if exclude_run is not None:
+        payslips = payslips.exclude(payroll_run=exclude_run)
+    repayments = defaultdict(Decimal)
+    deduction_ids = set()
+    for effects in payslips.order_by().values_list('posting_effects', flat=True):
+        for effect in effects:
+            if effect['type'] == 'loan_repayment':
+                repayments[effect['loan_id']] += Decimal(effect['amount'])
+            elif effect['type'] == 'deactivate_deduction':
+                deduction_ids.add(effect['deduction_id'])
+    return repayments, deduction_ids
+
+
+def unclaimed_loans(loans, repayments):
+    """The loans with what other unposted payslips leave of their balance (set on remaining_balance), if anything"""
+    available = []
+    for loan in loans:
+        if loan.pk in repayments:
+            loan.remaining_balance -= repayments[loan.pk]
+        if loan.remaining_balance > 0:
+            available.append(loan)
+    return available
+
+
+def unclaimed_deductions(deductions, deduction_ids):
+    """The deductions no other unposted payslip charges as one-time deductions"""
+    return [deduction for deduction in deductions if deduction.pk not in deduction_ids]
+
+
+def apply_repayments(balances):
+    """
+    Set each loan's balance to balances[loan id] in one UPDATE per batch,
+    deactivating paid-off loans. The balances are computed from rows locked
+    by the caller, so neither column depends on the other's new value.
+    """
+    loan_ids = sorted(balances)
+    for offset in range(0, len(loan_ids), BULK_BATCH_SIZE):
+        batch = loan_ids[offset:offset + BULK_BATCH_SIZE]
+        Loan.objects.filter(pk__in=batch).update(
+            remaining_balance=Case(
+                *[When(pk=pk, then=Value(balances[pk])) for pk in batch],
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            is_active=Case(
+                *[When(pk=pk, then=Value(False)) for pk in batch if balances[pk] <= 0],
+                default=F('is_active'),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
+def post_payroll_runs(payroll_runs):
+    """
+    Write the runs' loan repayments to the ledger, apply them to the loan
+    balances, mark their one-time deductions used, add the payslips to the
+    employees' year-to-date totals and mark later unposted payslips of the
+    same employees for recalculation, all in one transaction
+    and a fixed number of queries however many runs and payslips there are.
+    Runs are applied in id order and each is posted at most once. Returns
+    {run id: None if it was already posted, else a dict with the number of
+    loans and deductions it updated}.
+    """
+    with transaction.atomic():
+        runs = list(PayrollRun.objects.select_for_update().filter(
+            pk__in=[run.pk for run in payroll_runs]
+        ).order_by('pk'))
+        results = {run.pk: None for run in runs}
+        pending_runs = [run for run in runs if not run.posted_at]
+        pending = [run.pk for run in pending_runs]
+        if not pending:
+            return results
+
+        repayments, deduction_ids = collect_posting_effects(pending)
+
+        balances = dict(Loan.objects.select_for_update().filter(
+            pk__in={loan_id for _, _, loan_id in repayments},
+            is_active=True,
+            remaining_balance__gt=0
+        ).values_list('pk', 'remaining_balance'))
+
+        entries = []
+        repaid = set()
+        loans_per_run = defaultdict(set)
+        for (run_id, payslip_id, loan_id), amount in sorted(repayments.items()):
+            balance = balances.get(loan_id)
+            if not balance:
+                continue
+            # Never take a loan below zero, even if it was paid down since computation
+            amount = min(amount, balance)
+            balances[loan_id] = balance - amount
+            repaid.add(loan_id)
+            loans_per_run[run_id].add(loan_id)
+            entries.append(LoanRepayment(
+                loan_id=loan_id,
+                payslip_id=payslip_id,
+                payroll_run_id=run_id,
+                amount=amount,
+                balance_after=balances[loan_id],
+            ))
+        LoanRepayment.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        apply_repayments({loan_id: balances[loan_id] for loan_id in repaid})
+
+        all_deduction_ids = set().union(*deduction_ids.values())
+        active = set(OtherDeduction.objects.filter(
+            pk__in=all_deduction_ids, is_active=True
+        ).values_list('pk', flat=True))
+        OtherDeduction.objects.filter(pk__in=active).update(is_active=False)
+
+        # Earnings, contributions and tax withheld count towards the year to date
+        posted = Payslip.objects.filter(payroll_run_id__in=pending)
+        add_to_year_to_date(payslip_totals(posted))
+        # Unposted payslips of the same employees for later periods of those years (any period,
+        # for a 13th-month run) withheld tax on a year to date without these runs; clearing
+        # their fingerprints marks them for recalculation
+        later = Q(payroll_run__period_start__gt=min(run.period_end for run in pending_runs))
+        if any(run.run_type == 'THIRTEENTH_MONTH' for run in pending_runs):
+            later = Q()
+        Payslip.objects.filter(
+            later,
+            employee__in=posted.values('employee_id'),
+            payroll_run__posted_at__isnull=True,
+            payroll_run__period_end__year__in={run.period_end.year for run in pending_runs},
+        ).exclude(input_fingerprint='').update(input_fingerprint='')
+
+        posted_at = timezone.now()
+        PayrollRun.objects.filter(pk__in=pending).update(posted_at=posted_at)
+
+    for run_id in pending:
+        # A deduction listed by several runs counts for the first one
+        deactivated = deduction_ids[run_id] & active
+        active -= deactivated
+        results[run_id] = {'loans': len(loans_per_run[run_id]), 'deductions': len(deactivated)}
+    for run in payroll_runs:
+        if results.get(run.pk) is not None:
+            run.posted_at = posted_at
+    return results
+
+
+def post_payroll_run(payroll_run):
+    """
+    Post one run. Returns None if it already was posted, otherwise a dict
+    with the number of loans and deductions updated.
+    """
+    return post_payroll_runs([payroll_run]).get(payroll_run.pk)
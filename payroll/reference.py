@@ -0,0 +1,76 @@
+"""
+Decimal reference for the payroll rules
+A plain, slow statement of what PayrollCalculator computes in integer
+centavos, kept for the parity test and benchmark_payroll_math. Each amount
+is one exact Decimal expression quantized once, half-even.
+"""
+from decimal import Decimal
+
+
+CENT = Decimal('0.01')
+WORKING_DAYS_PER_MONTH = Decimal('22')
+STANDARD_HOURS_PER_DAY = Decimal('8')
+
+
+def reference_payslip(base_pay, days_worked, paid_days, overtime_seconds, loans, deductions, rates,
+                      per_year=12, ytd_periods=0, ytd_taxable=Decimal('0.00'), ytd_tax=Decimal('0.00'),
+                      regular_holidays_worked=0, special_holidays_worked=0, night_seconds=0):
+    """
+    Payslip amounts for one employee.
+    paid_days is the number of paid days in the period (working days and
+    holidays off rest days). loans are (monthly_deduction, remaining_balance)
+    pairs, deductions are amounts, rates is a ContributionRates. per_year is
+    the number of pay periods in a year; the ytd_ arguments are the posted
+    year-to-date totals.
+    """
+    # Pro-rate on the paid days in the period when there is no attendance
+    days = days_worked or paid_days
+    gross_pay = (base_pay * days / WORKING_DAYS_PER_MONTH).quantize(CENT)
+
+    # 1.25x the hourly rate for every second beyond 8 hours a day
+    overtime_pay = (
+        Decimal(overtime_seconds) * base_pay * Decimal('1.25') / (WORKING_DAYS_PER_MONTH * STANDARD_HOURS_PER_DAY * 3600)
+    ).quantize(CENT)
+
+    # 100% of the daily rate extra for a regular holiday worked, 30% for a special day
+    holiday_pay = (
+        base_pay * (regular_holidays_worked * Decimal('1.00') + special_holidays_worked * Decimal('0.30'))
+        / WORKING_DAYS_PER_MONTH
+    ).quantize(CENT)
+
+    # 10% of the hourly rate for every second worked between 22:00 and 06:00
+    night_differential = (
+        Decimal(night_seconds) * base_pay * Decimal('0.10') / (WORKING_DAYS_PER_MONTH * STANDARD_HOURS_PER_DAY * 3600)
+    ).quantize(CENT)
+
+    total_earnings = gross_pay + overtime_pay + holiday_pay + night_differential
+    sss = rates.sss(total_earnings)['employee']
+    philhealth = rates.philhealth_contribution(total_earnings)['employee']
+    pagibig = rates.pagibig_contribution(total_earnings)['employee']
+
+    # Cumulative annualization: the year so far plus this period for the rest of
+    # the year; the tax due so far in proportion, less what was already withheld
+    taxable = max(total_earnings - sss - philhealth - pagibig, Decimal('0.00'))
+    taxable_to_date = ytd_taxable + taxable
+    projected = taxable_to_date + taxable * max(per_year - ytd_periods - 1, 0)
+    tax = Decimal('0.00')
+    if projected > 0:
+        due = (rates.withholding_tax(projected) * taxable_to_date / projected).quantize(CENT)
+        tax = max(due - ytd_tax, Decimal('0.00'))
+
+    loan_deductions = sum((min(monthly, remaining) for monthly, remaining in loans), Decimal('0.00'))
+    other_deductions = sum(deductions, Decimal('0.00'))
+
+    return {
+        'gross_pay': gross_pay,
+        'overtime_pay': overtime_pay,
+        'holiday_pay': holiday_pay,
+        'night_differential': night_differential,
+        'sss': sss,
+        'philhealth': philhealth,
+        'pagibig': pagibig,
+        'tax': tax,
+        'loan_deductions': loan_deductions,
+        'other_deductions': other_deductions,
+        'net_pay': total_earnings - sss - philhealth - pagibig - tax - loan_deductions - other_deductions,
+    }
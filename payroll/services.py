@@ -1,13 +1,18 @@
 """
 Payroll calculation services
 Handles automated computation of salaries, deductions, and taxes
+Amounts are computed in integer centavos (see payroll.money)
 """
 from decimal import Decimal
-from datetime import datetime, timedelta
 from django.db.models import Sum, Q
-from contributions.models import SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable
-from attendance.models import AttendanceLog
+from contributions.rates import get_rates
+from attendance.summaries import period_totals, EMPTY_TOTALS
+from attendance.workdays import work_calendar
 from .models import Loan, OtherDeduction
+from .money import to_centavos, from_centavos, div_round, centavo_rates
+from .metrics import NULL_METRICS
+from .posting import pending_claims, unclaimed_loans, unclaimed_deductions
+from .ytd import year_to_date, periods_per_year, cumulative_tax, EMPTY_YTD
 
 
 class PayrollCalculator:
@@ -16,171 +21,239 @@ class PayrollCalculator:
     # Standard work hours per day
     STANDARD_HOURS_PER_DAY = Decimal('8.00')
     WORKING_DAYS_PER_MONTH = Decimal('22')  # Average
+    # Integer forms for the centavo math: daily rate = base pay / WORKING_DAYS,
+    # per-second rate = base pay / SECONDS_PER_MONTH
+    WORKING_DAYS = int(WORKING_DAYS_PER_MONTH)
+    SECONDS_PER_MONTH = int(WORKING_DAYS_PER_MONTH * STANDARD_HOURS_PER_DAY) * 3600
+    # Premium on top of the daily rate for a day worked on a holiday (percent)
+    REGULAR_HOLIDAY_PREMIUM = 100
+    SPECIAL_HOLIDAY_PREMIUM = 30
+    # Premium on the hourly rate for work between 22:00 and 06:00 (percent)
+    NIGHT_DIFFERENTIAL_PREMIUM = 10
     
-    def __init__(self, employee, period_start, period_end):
+    def __init__(self, employee, period_start, period_end, rates=None, metrics=None, calendar=None, payroll_run=None):
         self.employee = employee
         self.period_start = period_start
         self.period_end = period_end
+        # The run being computed, whose own payslips do not count as claims on loans and deductions
+        self.payroll_run = payroll_run
+        self._claims = None
         self.base_salary = employee.salary_grade.base_pay
-        self.daily_rate = self.base_salary / self.WORKING_DAYS_PER_MONTH
-        self.hourly_rate = self.daily_rate / self.STANDARD_HOURS_PER_DAY
+        self.base_centavos = to_centavos(self.base_salary)
+        # Compiled contribution/tax tables in force at the period end; shared per process unless given
+        self._rates = rates
+        # Working-day calendar for the period (attendance.workdays); loaded on first use unless given
+        self._calendar = calendar
+        self._attendance_totals = None
+        self._year_to_date = None
+        # State changes the payslip implies, applied later by payroll.posting
+        self.posting_effects = []
+        # Phase timings (see payroll.metrics); a no-op unless the caller passes PhaseMetrics
+        self.metrics = metrics or NULL_METRICS
     
-    def calculate_gross_pay(self):
-        """Calculate gross pay based on attendance"""
-        # Get attendance records for the period
-        attendance_records = AttendanceLog.objects.filter(
+    @property
+    def rates(self):
+        if self._rates is None:
+            self._rates = get_rates(as_of=self.period_end)
+        return self._rates
+    
+    @property
+    def calendar(self):
+        if self._calendar is None:
+            self._calendar = work_calendar(self.period_start, self.period_end)
+        return self._calendar
+    
+    # Data access hooks (overridden by the batch engine with preloaded rows)
+    
+    def get_attendance_totals(self):
+        """Attendance days and seconds for the period, from the attendance summary table"""
+        if self._attendance_totals is None:
+            self._attendance_totals = period_totals(
+                [self.employee.pk], self.period_start, self.period_end, self.calendar
+            ).get(self.employee.pk, EMPTY_TOTALS)
+        return self._attendance_totals
+    
+    def get_year_to_date(self):
+        """The employee's posted totals for the year before this period (centavos)"""
+        if self._year_to_date is None:
+            self._year_to_date = year_to_date(
+                [self.employee.pk], self.period_end.year, before=self.period_start
+            ).get(self.employee.pk, EMPTY_YTD)
+        return self._year_to_date
+    
+    def get_pending_claims(self):
+        """What the employee's unposted payslips in other runs already charge (see payroll.posting)"""
+        if self._claims is None:
+            self._claims = pending_claims([self.employee.pk], self.payroll_run)
+        return self._claims
+    
+    def get_active_loans(self):
+        """Active loans with an outstanding balance not yet charged by another unposted payslip"""
+        return unclaimed_loans(Loan.objects.filter(
             employee=self.employee,
-            date__gte=self.period_start,
-            date__lte=self.period_end
-        )
-        
-        total_days_worked = attendance_records.count()
-        
-        # Debug logging
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Employee: {self.employee.employee_no}")
-        logger.info(f"Period: {self.period_start} to {self.period_end}")
-        logger.info(f"Base Salary: {self.base_salary}")
-        logger.info(f"Daily Rate: {self.daily_rate}")
-        logger.info(f"Attendance records found: {total_days_worked}")
+            is_active=True,
+            remaining_balance__gt=0
+        ).order_by('pk'), self.get_pending_claims()[0])
+    
+    def get_active_deductions(self):
+        """Active other deductions, without one-time deductions another unposted payslip charges"""
+        return unclaimed_deductions(OtherDeduction.objects.filter(
+            employee=self.employee,
+            is_active=True
+        ).order_by('pk'), self.get_pending_claims()[1])
+    
+    def calculate_gross_pay(self):
+        """Calculate gross pay based on attendance (centavos)"""
+        # Get attendance totals for the period
+        total_days_worked = self.get_attendance_totals().days
         
-        # If no attendance records, pro-rate based on period length
+        # If no attendance records, pro-rate on the paid days in the period
+        # (working days and holidays, without rest days)
         if total_days_worked == 0:
-            days_in_period = (self.period_end - self.period_start).days + 1
-            logger.info(f"Days in period: {days_in_period}")
-            
-            # Calculate how many working days in the period (assume 5-day work week)
-            # For simplicity, we'll assume all days are working days unless you want to exclude weekends
-            working_days = Decimal(str(days_in_period))
-            
-            # Pro-rate the salary based on working days
-            gross_pay = self.daily_rate * working_days
-            logger.info(f"Calculated gross pay (no attendance): {self.daily_rate} x {working_days} = {gross_pay}")
+            working_days = self.calendar.paid_days(self.period_start, self.period_end)
         else:
             # Calculate based on actual attendance
-            gross_pay = self.daily_rate * Decimal(str(total_days_worked))
-            logger.info(f"Calculated gross pay (with attendance): {self.daily_rate} x {total_days_worked} = {gross_pay}")
+            working_days = total_days_worked
         
-        return gross_pay.quantize(Decimal('0.01'))
+        # Daily rate x days, divided last so the rounding is exact
+        return div_round(self.base_centavos * working_days, self.WORKING_DAYS)
     
     def calculate_overtime_pay(self):
-        """Calculate overtime pay based on attendance records"""
-        # This is a simplified version
-        # In real implementation, you'd track actual overtime hours
-        attendance_records = AttendanceLog.objects.filter(
-            employee=self.employee,
-            date__gte=self.period_start,
-            date__lte=self.period_end
-        )
+        """Calculate overtime pay based on attendance records (centavos)"""
+        # OT is any time beyond 8 hours a day, summed per day in the attendance summaries
+        overtime_seconds = self.get_attendance_totals().overtime_seconds
         
-        total_overtime_hours = Decimal('0.00')
-        
-        for record in attendance_records:
-            if record.time_in and record.time_out:
-                # Calculate hours worked
-                time_in = datetime.combine(record.date, record.time_in)
-                time_out = datetime.combine(record.date, record.time_out)
-                
-                # Handle overnight shift
-                if time_out < time_in:
-                    time_out += timedelta(days=1)
-                
-                hours_worked = (time_out - time_in).seconds / 3600
-                hours_worked_decimal = Decimal(str(hours_worked))
-                
-                # OT is any hour beyond 8 hours
-                if hours_worked_decimal > self.STANDARD_HOURS_PER_DAY:
-                    overtime = hours_worked_decimal - self.STANDARD_HOURS_PER_DAY
-                    total_overtime_hours += overtime
-        
-        # OT rate is 1.25x for regular OT
-        overtime_pay = total_overtime_hours * self.hourly_rate * Decimal('1.25')
-        
-        return overtime_pay.quantize(Decimal('0.01'))
+        # OT rate is 1.25x for regular OT: seconds x hourly rate x 125 / 100
+        return div_round(overtime_seconds * self.base_centavos * 125, self.SECONDS_PER_MONTH * 100)
+    
+    def calculate_holiday_pay(self):
+        """Premium for the days worked on holidays (centavos)"""
+        totals = self.get_attendance_totals()
+        premium_days = (totals.regular_holidays_worked * self.REGULAR_HOLIDAY_PREMIUM
+                        + totals.special_holidays_worked * self.SPECIAL_HOLIDAY_PREMIUM)
+        # Daily rate x premium percent x days
+        return div_round(self.base_centavos * premium_days, self.WORKING_DAYS * 100)
+    
+    def calculate_night_differential(self):
+        """Premium for the hours worked in the night window (centavos)"""
+        night_seconds = self.get_attendance_totals().night_seconds
+        # Seconds x hourly rate x premium percent
+        return div_round(night_seconds * self.base_centavos * self.NIGHT_DIFFERENTIAL_PREMIUM, self.SECONDS_PER_MONTH * 100)
+    
+    def tardiness_hours(self):
+        """Hours arrived after the scheduled start (after any grace period), to the hundredth"""
+        return Decimal(div_round(self.get_attendance_totals().late_seconds * 100, 3600)).scaleb(-2)
+    
+    def count_absences(self):
+        """Working days since the later of the period start and the hire date not attended"""
+        totals = self.get_attendance_totals()
+        if totals.days == 0:
+            # Attendance is not recorded for this employee
+            return 0
+        start = self.period_start
+        if self.employee.date_hired and self.employee.date_hired > start:
+            start = self.employee.date_hired
+        return max(self.calendar.working_days(start, self.period_end) - totals.workdays_present, 0)
     
     def calculate_government_contributions(self, gross_pay):
-        """Calculate SSS, PhilHealth, and Pag-IBIG contributions"""
-        sss = SSSContributionTable.get_contribution(gross_pay)
-        philhealth = PhilHealthContributionTable.get_contribution(gross_pay)
-        pagibig = PagibigContributionTable.get_contribution(gross_pay)
+        """Calculate SSS, PhilHealth, and Pag-IBIG contributions (centavos)"""
+        rates = centavo_rates(self.rates)
+        sss, _ = rates.sss(gross_pay)
+        philhealth, _ = rates.philhealth_contribution(gross_pay)
+        pagibig, _ = rates.pagibig_contribution(gross_pay)
         
         return {
-            'sss': sss['employee'],
-            'philhealth': philhealth['employee'],
-            'pagibig': pagibig['employee'],
-            'total': sss['employee'] + philhealth['employee'] + pagibig['employee']
+            'sss': sss,
+            'philhealth': philhealth,
+            'pagibig': pagibig,
+            'total': sss + philhealth + pagibig
         }
     
     def calculate_loan_deductions(self):
-        """Calculate total loan deductions for the period"""
-        active_loans = Loan.objects.filter(
-            employee=self.employee,
-            is_active=True,
-            remaining_balance__gt=0
-        )
+        """Calculate total loan deductions for the period (centavos)"""
+        active_loans = self.get_active_loans()
         
-        total_deduction = Decimal('0.00')
+        total_deduction = 0
         
         for loan in active_loans:
             # Deduct monthly payment, but not more than remaining balance
-            deduction = min(loan.monthly_deduction, loan.remaining_balance)
+            deduction = min(to_centavos(loan.monthly_deduction), to_centavos(loan.remaining_balance))
             total_deduction += deduction
+            self.posting_effects.append({
+                'type': 'loan_repayment',
+                'loan_id': loan.pk,
+                'amount': str(from_centavos(deduction)),
+            })
         
-        return total_deduction.quantize(Decimal('0.01'))
+        return total_deduction
     
     def calculate_other_deductions(self):
-        """Calculate other deductions (uniform, tools, etc.)"""
-        deductions = OtherDeduction.objects.filter(
-            employee=self.employee,
-            is_active=True
-        )
+        """Calculate other deductions (uniform, tools, etc.) (centavos)"""
+        deductions = self.get_active_deductions()
         
-        total = Decimal('0.00')
+        total = 0
         
         for deduction in deductions:
             if deduction.is_recurring:
                 # Recurring deductions are applied every payroll
-                total += deduction.amount
+                total += to_centavos(deduction.amount)
             else:
                 # One-time deductions
-                total += deduction.amount
-                # Mark as inactive after deduction
-                deduction.is_active = False
-                deduction.save()
+                total += to_centavos(deduction.amount)
+                # Marked inactive when the run is posted
+                self.posting_effects.append({
+                    'type': 'deactivate_deduction',
+                    'deduction_id': deduction.pk,
+                })
         
-        return total.quantize(Decimal('0.01'))
+        return total
     
     def calculate_withholding_tax(self, gross_pay, total_deductions):
-        """Calculate withholding tax"""
-        # Compute annual taxable income
-        # Simplified: multiply monthly by 12
-        monthly_taxable = gross_pay - total_deductions
-        annual_taxable = monthly_taxable * 12
-        
-        # Get annual tax
-        annual_tax = TaxTable.get_withholding_tax(annual_taxable)
+        """Calculate withholding tax (centavos)"""
+        taxable = max(gross_pay - total_deductions, 0)
         
-        # Return monthly tax
-        monthly_tax = annual_tax / 12
-        
-        return monthly_tax.quantize(Decimal('0.01'))
+        # Annualize over the year so far plus this period projected to year end
+        return cumulative_tax(
+            centavo_rates(self.rates).withholding_tax,
+            taxable,
+            self.get_year_to_date(),
+            periods_per_year(self.period_start, self.period_end),
+        )
     
     def compute_payslip(self):
-        """Complete payroll computation"""
+        """
+        Complete payroll computation
+        Runs in integer centavos and returns Decimal amounts. Reads only; loan
+        repayments and used one-time deductions are returned in posting_effects
+        and applied when the run is posted.
+        """
+        self.posting_effects = []
+        metrics = self.metrics
+        
         # Calculate earnings
-        gross_pay = self.calculate_gross_pay()
-        overtime_pay = self.calculate_overtime_pay()
-        total_earnings = gross_pay + overtime_pay
+        with metrics.phase('attendance'):
+            self.get_attendance_totals()
+        with metrics.phase('earnings'):
+            gross_pay = self.calculate_gross_pay()
+            overtime_pay = self.calculate_overtime_pay()
+            holiday_pay = self.calculate_holiday_pay()
+            night_differential = self.calculate_night_differential()
+            absences = self.count_absences()
+            tardiness_hours = self.tardiness_hours()
+        total_earnings = gross_pay + overtime_pay + holiday_pay + night_differential
         
         # Calculate deductions
-        gov_contributions = self.calculate_government_contributions(total_earnings)
-        loan_deductions = self.calculate_loan_deductions()
-        other_deductions = self.calculate_other_deductions()
+        with metrics.phase('contributions'):
+            gov_contributions = self.calculate_government_contributions(total_earnings)
+        with metrics.phase('loans'):
+            loan_deductions = self.calculate_loan_deductions()
+        with metrics.phase('other_deductions'):
+            other_deductions = self.calculate_other_deductions()
         
         # Calculate tax (after mandatory contributions)
         total_mandatory_deductions = gov_contributions['total']
-        tax = self.calculate_withholding_tax(total_earnings, total_mandatory_deductions)
+        with metrics.phase('tax'):
+            tax = self.calculate_withholding_tax(total_earnings, total_mandatory_deductions)
         
         # Calculate net pay
         total_deductions = (
@@ -195,43 +268,18 @@ class PayrollCalculator:
         net_pay = total_earnings - total_deductions
         
         return {
-            'gross_pay': gross_pay,
-            'overtime_pay': overtime_pay,
-            'sss': gov_contributions['sss'],
-            'philhealth': gov_contributions['philhealth'],
-            'pagibig': gov_contributions['pagibig'],
-            'tax': tax,
-            'loan_deductions': loan_deductions,
-            'other_deductions': other_deductions,
-            'net_pay': net_pay
+            'gross_pay': from_centavos(gross_pay),
+            'overtime_pay': from_centavos(overtime_pay),
+            'holiday_pay': from_centavos(holiday_pay),
+            'night_differential': from_centavos(night_differential),
+            'absences': absences,
+            'tardiness_hours': tardiness_hours,
+            'sss': from_centavos(gov_contributions['sss']),
+            'philhealth': from_centavos(gov_contributions['philhealth']),
+            'pagibig': from_centavos(gov_contributions['pagibig']),
+            'tax': from_centavos(tax),
+            'loan_deductions': from_centavos(loan_deductions),
+            'other_deductions': from_centavos(other_deductions),
+            'net_pay': from_centavos(net_pay),
+            'posting_effects': self.posting_effects,
         }
-
-
-def update_loan_balances(payslip):
-    """Update loan balances after payroll processing"""
-    employee = payslip.employee
-    amount_deducted = payslip.loan_deductions
-    
-    if amount_deducted <= 0:
-        return
-    
-    active_loans = Loan.objects.filter(
-        employee=employee,
-        is_active=True,
-        remaining_balance__gt=0
-    ).order_by('start_date')
-    
-    remaining_to_deduct = amount_deducted
-    
-    for loan in active_loans:
-        if remaining_to_deduct <= 0:
-            break
-        
-        deduction = min(loan.monthly_deduction, loan.remaining_balance, remaining_to_deduct)
-        loan.remaining_balance -= deduction
-        
-        if loan.remaining_balance <= 0:
-            loan.is_active = False
-        
-        loan.save()
-        remaining_to_deduct -= deduction
@@ -0,0 +1,38 @@
+"""
+Entry points for payroll worker processes
+Kept free of module-level model imports: spawned workers import this
+module before Django is set up.
+"""
+import os
+
+
+def init_worker(databases=None):
+    """
+    Set up Django in a freshly spawned worker process, connecting to the
+    parent's databases (under the test runner, the test database)
+    """
+    import django
+    from django.conf import settings
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pms.settings')
+    if databases:
+        settings.DATABASES = databases
+    django.setup()
+
+
+def compute_shard(period_start, period_end, query, first_pk, last_pk, payroll_run=None):
+    """Compute one shard of employees with the in-process engine (batch.engine_class)"""
+    from employees.models import Employee
+    from .batch import engine_class
+
+    employees = Employee.objects.all()
+    employees.query = query
+    engine = engine_class()(
+        period_start,
+        period_end,
+        employees.filter(pk__gte=first_pk, pk__lte=last_pk),
+        payroll_run=payroll_run,
+    )
+    results = [(employee.pk, payroll_data) for employee, payroll_data in engine.compute()]
+    errors = [(employee.pk, message) for employee, message in engine.errors]
+    return results, errors
@@ -0,0 +1,133 @@
+"""
+What-if simulation of contribution and tax table changes
+Re-costs the earnings of past payroll runs under the tables in force for each
+run and under a candidate set of tables, in memory and in bulk, and reports
+the cost difference per department and per run. Nothing is written.
+"""
+from collections import namedtuple
+import numpy as np
+from contributions.rates import get_rates, ContributionRates
+from .models import Payslip
+from .money import to_centavos, from_centavos
+from .vectorized import RateArrays
+from .ytd import periods_per_year, year_to_date, EMPTY_YTD
+
+
+EMPLOYEE_SHARES = ('sss', 'philhealth', 'pagibig', 'tax')
+EMPLOYER_SHARES = ('sss_employer', 'philhealth_employer', 'pagibig_employer')
+
+
+class SimulationLine(namedtuple('SimulationLine', 'label payslips current_employee candidate_employee current_employer candidate_employer')):
+    """Current vs candidate totals for one department, run or the whole selection"""
+    __slots__ = ()
+
+    @property
+    def employee_delta(self):
+        return self.candidate_employee - self.current_employee
+
+    @property
+    def employer_delta(self):
+        return self.candidate_employer - self.current_employer
+
+    @property
+    def total_delta(self):
+        return self.employee_delta + self.employer_delta
+
+
+def candidate_rates(base=None, sss_brackets=None, philhealth=None, pagibig=None, tax_brackets=None):
+    """
+    Build ContributionRates from candidate tables; any table left as None is
+    taken from base (default: the active tables).
+    tax_brackets are (min_compensation, base_tax, tax_rate) tuples.
+    """
+    base = base or get_rates()
+    if tax_brackets is None:
+        schedule = base.withholding_tax
+        tax_brackets = [(bound, *segment) for bound, segment in zip(schedule.breakpoints, schedule.segments)]
+    return ContributionRates(
+        base.sss_brackets if sss_brackets is None else sss_brackets,
+        base.philhealth if philhealth is None else philhealth,
+        base.pagibig if pagibig is None else pagibig,
+        tax_brackets,
+    )
+
+
+def _shares(rates, earnings, per_year, ytd):
+    """Employee (contributions + tax) and employer totals per payslip, in centavos"""
+    columns = RateArrays(rates).statutory_deductions(earnings, per_year, ytd)
+    employee = sum(columns[field] for field in EMPLOYEE_SHARES)
+    employer = sum(columns[field] for field in EMPLOYER_SHARES)
+    return employee, employer
+
+
+def _group(labels, group_index, columns):
+    """Sum each centavo column per group and return SimulationLines"""
+    sums = []
+    for column in columns:
+        total = np.zeros(len(labels), dtype=np.int64)
+        np.add.at(total, group_index, column)
+        sums.append(total.tolist())
+    counts = np.bincount(group_index, minlength=len(labels)).tolist()
+    return [
+        SimulationLine(label, counts[i], *(from_centavos(column[i]) for column in sums))
+        for i, label in enumerate(labels)
+    ]
+
+
+def simulate_rates(candidate, payroll_runs, current=None):
+    """
+    Compare statutory costs of the runs' payslips under their own and the candidate tables.
+    Each run is costed with the tables in force at its period end unless current
+    is given. Both sides are recomputed from the stored earnings (gross, overtime
+    holiday pay and night differential), so the difference is due to the tables
+    alone. Tax is annualized cumulatively as the run computed it, over the posted
+    year to date before the run's period (one grouped query per run), so the
+    current side reproduces the stored deductions; the candidate side keeps the
+    tax already withheld. Returns a dict with 'departments' and 'runs' lists of
+    SimulationLine and a 'total' line.
+    """
+    rows = list(Payslip.objects.filter(payroll_run__in=payroll_runs).values_list(
+        'payroll_run_id', 'employee__department', 'employee_id',
+        'gross_pay', 'overtime_pay', 'holiday_pay', 'night_differential',
+    ))
+
+    departments = sorted({row[1] for row in rows})
+    department_index = {department: i for i, department in enumerate(departments)}
+    runs = sorted(payroll_runs, key=lambda run: (run.period_start, run.pk))
+    run_index = {run.pk: i for i, run in enumerate(runs)}
+    row_runs = np.array([run_index[row[0]] for row in rows], dtype=np.int64)
+
+    employee_ids = np.array([row[2] for row in rows], dtype=np.int64)
+    earnings = np.array([
+        sum(to_centavos(amount) for amount in amounts) for _, _, _, *amounts in rows
+    ], dtype=np.int64)
+    current_employee = np.zeros(len(rows), dtype=np.int64)
+    current_employer = np.zeros(len(rows), dtype=np.int64)
+    candidate_employee = np.zeros(len(rows), dtype=np.int64)
+    candidate_employer = np.zeros(len(rows), dtype=np.int64)
+    for i, run in enumerate(runs):
+        in_run = row_runs == i
+        per_year = periods_per_year(run.period_start, run.period_end)
+        run_employees = employee_ids[in_run].tolist()
+        totals = year_to_date(run_employees, run.period_end.year, before=run.period_start)
+        ytd = {
+            field: np.array([getattr(totals.get(pk, EMPTY_YTD), field) for pk in run_employees], dtype=np.int64)
+            for field in ('periods', 'taxable', 'tax_withheld')
+        }
+        employee, employer = _shares(current or get_rates(as_of=run.period_end), earnings[in_run], per_year, ytd)
+        current_employee[in_run] = employee
+        current_employer[in_run] = employer
+        employee, employer = _shares(candidate, earnings[in_run], per_year, ytd)
+        candidate_employee[in_run] = employee
+        candidate_employer[in_run] = employer
+    columns = (current_employee, candidate_employee, current_employer, candidate_employer)
+
+    return {
+        'departments': _group(
+            departments,
+            np.array([department_index[row[1]] for row in rows], dtype=np.int64),
+            columns,
+        ),
+        'runs': _group([f"{run.period_start} to {run.period_end}" for run in runs], row_runs, columns),
+        'total': _group(['All departments'], np.zeros(len(rows), dtype=np.int64), columns)[0],
+    }
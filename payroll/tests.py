@@ -0,0 +1,1444 @@
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from employees.models import Employee, SalaryGrade
+from attendance.models import AttendanceLog
+from attendance.summaries import rebuild_summaries
+from contributions.models import SSSContributionTable, PhilHealthContributionTable, PagibigContributionTable, TaxTable
+from .batch import BatchPayrollCalculator
+from .models import Loan, OtherDeduction, Payslip
+from .money import to_centavos, from_centavos
+from .services import PayrollCalculator
+
+
+def create_contribution_tables():
+    """Same tables as seed_complete_system"""
+    sss_brackets = [
+        (0, 4249.99, 180, 540, 10, 730),
+        (4250, 4749.99, 202.50, 607.50, 10, 820),
+        (4750, 5249.99, 225, 675, 10, 910),
+        (5250, 5749.99, 247.50, 742.50, 10, 1000),
+        (10000, 10749.99, 450, 1350, 10, 1810),
+        (15000, 15749.99, 675, 2025, 10, 2710),
+        (20000, 20749.99, 900, 2700, 10, 3610),
+        (25000, 26249.99, 1125, 3375, 10, 4510),
+        (30000, 34999.99, 1350, 4050, 10, 5410),
+        (35000, 39999.99, 1575, 4725, 10, 6310),
+        (40000, 50000, 1800, 5400, 10, 7210),
+    ]
+    for min_sal, max_sal, ee, er, ec, total in sss_brackets:
+        SSSContributionTable.objects.create(
+            min_salary=Decimal(str(min_sal)), max_salary=Decimal(str(max_sal)),
+            employee_share=Decimal(str(ee)), employer_share=Decimal(str(er)),
+            ec_share=Decimal(str(ec)), total=Decimal(str(total)),
+            effective_date=date(2024, 1, 1),
+        )
+    PhilHealthContributionTable.objects.create(
+        min_salary=Decimal('0'), premium_rate=Decimal('0.05'),
+        max_contribution=Decimal('5000.00'), effective_date=date(2024, 1, 1),
+    )
+    PagibigContributionTable.objects.create(
+        min_salary=Decimal('0'), employee_rate=Decimal('0.02'), employer_rate=Decimal('0.02'),
+        max_employee_contribution=Decimal('100.00'), max_employer_contribution=Decimal('100.00'),
+        effective_date=date(2024, 1, 1),
+    )
+    tax_brackets = [
+        (0, 250000, 0, 0),
+        (250000, 400000, 0, 0.15),
+        (400000, 800000, 22500, 0.20),
+        (800000, 2000000, 102500, 0.25),
+        (2000000, 8000000, 402500, 0.30),
+        (8000000, 999999999, 2202500, 0.35),
+    ]
+    for min_comp, max_comp, base, rate in tax_brackets:
+        TaxTable.objects.create(
+            min_compensation=Decimal(str(min_comp)), max_compensation=Decimal(str(max_comp)),
+            base_tax=Decimal(str(base)), tax_rate=Decimal(str(rate)),
+            effective_date=date(2024, 1, 1),
+        )
+
+
+def create_workforce(size, period_start, period_end, seed=7):
+    """Deterministic employees with attendance, overtime, overnight shifts, loans and deductions"""
+    rng = random.Random(seed)
+    grades = [
+        SalaryGrade.objects.create(code=f'T{i}', base_pay=pay)
+        for i, pay in enumerate([Decimal('12345.67'), Decimal('15000'), Decimal('22000.11'),
+                                 Decimal('35000'), Decimal('60000'), Decimal('250000'), Decimal('999.99')])
+    ]
+    employees = []
+    for i in range(size):
+        user = User.objects.create(username=f'parity{i}')
+        employees.append(Employee.objects.create(
+            user=user, employee_no=f'P{i:05d}', first_name='Test', last_name=f'Employee{i}',
+            department=rng.choice(['HR', 'IT', 'Sales']), position='Staff',
+            salary_grade=rng.choice(grades), date_hired=date(2020, 1, 1),
+        ))
+
+    logs = []
+    for emp in employees[1:]:  # first employee has no attendance (pro-rated)
+        day = period_start
+        while day <= period_end:
+            if rng.random() < 0.85:
+                t_in = time(rng.choice([6, 7, 8, 9, 22]), rng.randint(0, 59), rng.choice([0, 0, 30]))
+                t_out = time(rng.choice([15, 17, 18, 19, 21, 6]), rng.randint(0, 59), rng.choice([0, 15]))
+                if rng.random() < 0.05:
+                    t_out = None
+                logs.append(AttendanceLog(employee=emp, date=day, time_in=t_in, time_out=t_out))
+            day += timedelta(days=1)
+    AttendanceLog.objects.bulk_create(logs)
+    rebuild_summaries()
+
+    for emp in employees[::3]:
+        Loan.objects.create(
+            employee=emp, loan_type='SALARY', principal_amount=Decimal('20000'),
+            monthly_deduction=Decimal('2500'), remaining_balance=Decimal(rng.choice(['1200.50', '15000'])),
+            start_date=date(2024, 1, 1),
+        )
+    for emp in employees[::4]:
+        OtherDeduction.objects.create(employee=emp, description='Parking', amount=Decimal('500'), is_recurring=True)
+        OtherDeduction.objects.create(employee=emp, description='Uniform', amount=Decimal('333.33'))
+    return employees
+
+
+def create_calendar():
+    """March 2025 holidays on a weekday and a Saturday, a special day and a Saturday working day"""
+    from attendance.models import CalendarDay
+
+    CalendarDay.objects.bulk_create([
+        CalendarDay(date=date(2025, 3, 3), name='Regular', kind='REGULAR_HOLIDAY'),
+        CalendarDay(date=date(2025, 3, 12), name='Special', kind='SPECIAL_HOLIDAY'),
+        CalendarDay(date=date(2025, 3, 8), name='Make-up day', kind='WORKDAY'),
+        CalendarDay(date=date(2025, 3, 22), name='Weekend holiday', kind='REGULAR_HOLIDAY'),
+    ])
+
+
+class BatchEngineTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        create_workforce(30, cls.period_start, cls.period_end, seed=11)
+
+    def test_matches_scalar_calculator(self):
+        from .batch import BatchPayrollCalculator
+
+        batch = {emp.pk: data for emp, data in BatchPayrollCalculator(self.period_start, self.period_end).compute()}
+        self.assertEqual(len(batch), 30)
+        for emp in Employee.objects.select_related('salary_grade'):
+            expected = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+            self.assertEqual(batch[emp.pk], expected, emp.employee_no)
+
+    def test_queries_do_not_grow_with_employees(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .batch import BatchPayrollCalculator
+
+        def queries(employees):
+            engine = BatchPayrollCalculator(self.period_start, self.period_end, employees)
+            with CaptureQueriesContext(connection) as captured:
+                computed = list(engine.compute())
+            self.assertEqual(len(computed), employees.count())
+            return len(captured)
+
+        everyone = Employee.objects.all()
+        # Once the rate tables are loaded, three employees cost as many queries as thirty
+        queries(everyone)
+        few = Employee.objects.filter(pk__in=list(everyone.values_list('pk', flat=True)[:3]))
+        self.assertEqual(queries(few), queries(everyone))
+
+
+class VectorizedParityTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        create_calendar()
+        create_workforce(60, cls.period_start, cls.period_end)
+
+    def test_matches_scalar_calculator(self):
+        from .vectorized import VectorizedPayrollCalculator
+
+        engine = VectorizedPayrollCalculator(self.period_start, self.period_end)
+        vectorized = {emp.pk: data for emp, data in engine.compute()}
+
+        for emp in Employee.objects.select_related('salary_grade'):
+            expected = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+            self.assertEqual(vectorized[emp.pk], expected, emp.employee_no)
+
+    def test_overtime_tie_rounds_centavos_half_even(self):
+        from .vectorized import VectorizedPayrollCalculator
+
+        # 22,000.00 base, 8h01m12s shift: overtime pay is exactly 3.125
+        grade = SalaryGrade.objects.create(code='TIE', base_pay=Decimal('22000.00'))
+        user = User.objects.create(username='tie')
+        emp = Employee.objects.create(
+            user=user, employee_no='TIE', first_name='Tie', last_name='Break',
+            department='HR', position='Staff', salary_grade=grade,
+        )
+        AttendanceLog.objects.create(employee=emp, date=self.period_start, time_in=time(8, 0), time_out=time(16, 1, 12))
+
+        engine = VectorizedPayrollCalculator(self.period_start, self.period_end, Employee.objects.filter(pk=emp.pk))
+        data = dict(engine.compute())[emp]
+        self.assertEqual(data['overtime_pay'], Decimal('3.12'))
+        self.assertEqual(data, PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip())
+
+    def test_high_earner_matches_without_overflow(self):
+        from .vectorized import MAX_INT64_PROJECTED, VectorizedPayrollCalculator
+
+        # 5,000,000 a month projects to 120M a year, well past where int64 products overflow
+        grade = SalaryGrade.objects.create(code='EXEC', base_pay=Decimal('5000000.00'))
+        user = User.objects.create(username='exec')
+        emp = Employee.objects.create(
+            user=user, employee_no='EXEC', first_name='High', last_name='Earner',
+            department='HR', position='CEO', salary_grade=grade,
+        )
+        for day in range(10):
+            AttendanceLog.objects.create(employee=emp, date=self.period_start + timedelta(days=day),
+                                         time_in=time(8), time_out=time(19, 30))
+        rebuild_summaries()
+
+        employees = Employee.objects.filter(pk__in=[emp.pk, Employee.objects.exclude(pk=emp.pk).first().pk])
+        vectorized = {e.pk: data for e, data in VectorizedPayrollCalculator(self.period_start, self.period_end, employees).compute()}
+        self.assertGreater(to_centavos(vectorized[emp.pk]['gross_pay']) * 24, MAX_INT64_PROJECTED)
+        for e in employees.select_related('salary_grade'):
+            self.assertEqual(vectorized[e.pk], PayrollCalculator(e, self.period_start, self.period_end).compute_payslip())
+
+
+    @override_settings(PAYROLL_VECTORIZED=True)
+    def test_selected_for_runs_by_setting(self):
+        from .batch import payroll_engine
+        from .jobs import claim_next_job, enqueue_payroll_job, run_job
+        from .models import PayrollRun
+        from .vectorized import VectorizedPayrollCalculator
+
+        self.assertIsInstance(payroll_engine(self.period_start, self.period_end), VectorizedPayrollCalculator)
+        expected = {emp.pk: data for emp, data in BatchPayrollCalculator(self.period_start, self.period_end).compute()}
+
+        user = User.objects.create(username='vectorized')
+        run = PayrollRun.objects.create(period_start=self.period_start, period_end=self.period_end, created_by=user)
+        enqueue_payroll_job(run, 'CREATE', user)
+        job = run_job(claim_next_job(worker='test'))
+        self.assertEqual(job.status, 'DONE', job.message)
+        self.assertEqual(job.payslips_created, len(expected))
+        for payslip in run.payslips.all():
+            data = expected[payslip.employee_id]
+            self.assertEqual((payslip.tax, payslip.net_pay, payslip.posting_effects),
+                             (data['tax'], data['net_pay'], data['posting_effects']))
+
+
+class ShardedParityTest(TransactionTestCase):
+    """Worker processes read committed data through their own connections, hence TransactionTestCase"""
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    def setUp(self):
+        create_contribution_tables()
+        create_calendar()
+        create_workforce(30, self.period_start, self.period_end)
+
+    @override_settings(PAYROLL_WORKERS=2, PAYROLL_PARALLEL_MIN_EMPLOYEES=10)
+    def test_matches_batch_calculator(self):
+        from .batch import payroll_engine
+        from .parallel import ShardedPayrollCalculator
+
+        engine = payroll_engine(self.period_start, self.period_end)
+        self.assertIsInstance(engine, ShardedPayrollCalculator)
+        employee_ids = list(Employee.objects.order_by('pk').values_list('pk', flat=True))
+        shards = engine.shards(employee_ids)
+        # Contiguous id ranges covering every employee once
+        self.assertEqual(len(shards), 8)
+        self.assertEqual((shards[0][0], shards[-1][1]), (employee_ids[0], employee_ids[-1]))
+
+        sharded = [(emp.pk, data) for emp, data in engine.compute()]
+        batch = [(emp.pk, data) for emp, data in BatchPayrollCalculator(self.period_start, self.period_end).compute()]
+        self.assertEqual(len(sharded), 30)
+        self.assertEqual(sharded, batch)
+        self.assertEqual(engine.errors, [])
+
+
+class CentavoParityTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        create_calendar()
+        create_workforce(80, cls.period_start, cls.period_end, seed=11)
+
+    def test_matches_decimal_reference(self):
+        from attendance.summaries import period_totals, EMPTY_TOTALS
+        from attendance.workdays import work_calendar
+        from contributions.rates import get_rates
+        from .reference import reference_payslip
+
+        rates = get_rates(as_of=self.period_end)
+        totals = period_totals(Employee.objects.all(), self.period_start, self.period_end)
+        paid_days = work_calendar(self.period_start, self.period_end).paid_days(self.period_start, self.period_end)
+
+        for emp in Employee.objects.select_related('salary_grade'):
+            attendance = totals.get(emp.pk, EMPTY_TOTALS)
+            expected = reference_payslip(
+                emp.salary_grade.base_pay,
+                attendance.days,
+                paid_days,
+                attendance.overtime_seconds,
+                [(l.monthly_deduction, l.remaining_balance)
+                 for l in Loan.objects.filter(employee=emp, is_active=True, remaining_balance__gt=0)],
+                [d.amount for d in OtherDeduction.objects.filter(employee=emp, is_active=True)],
+                rates,
+                regular_holidays_worked=attendance.regular_holidays_worked,
+                special_holidays_worked=attendance.special_holidays_worked,
+                night_seconds=attendance.night_seconds,
+            )
+            actual = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+            actual.pop('posting_effects')
+            actual.pop('absences')
+            actual.pop('tardiness_hours')
+            self.assertEqual(actual, expected, emp.employee_no)
+            # Same representation as the DecimalFields they are saved to
+            self.assertTrue(all(value.as_tuple().exponent == -2 for value in actual.values()), emp.employee_no)
+
+    def test_half_centavo_rounds_to_even(self):
+        # 12,345.67 over 11 days is 6,172.835 exactly
+        grade = SalaryGrade.objects.create(code='HALF', base_pay=Decimal('12345.67'))
+        emp = Employee.objects.create(
+            user=User.objects.create(username='half'), employee_no='HALF', first_name='Half', last_name='Cent',
+            department='HR', position='Staff', salary_grade=grade,
+        )
+        start = date(2025, 4, 1)
+        for day in range(11):
+            AttendanceLog.objects.create(employee=emp, date=start + timedelta(days=day), time_in=time(8), time_out=time(16))
+
+        payslip = PayrollCalculator(emp, start, date(2025, 4, 15)).compute_payslip()
+        self.assertEqual(payslip['gross_pay'], Decimal('6172.84'))
+
+    def test_amounts_past_the_centavo_round_half_even(self):
+        # Decimal amounts not yet quantized to the centavo
+        self.assertEqual([to_centavos(Decimal(amount)) for amount in ['1.005', '1.015', '1.237', '-1.237', '12']],
+                         [100, 102, 124, -124, 1200])
+        self.assertEqual(to_centavos(Decimal('1.234')), int((Decimal('1.234') * 100).quantize(Decimal('1'))))
+
+
+class WorkCalendarTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        create_calendar()
+
+    def test_range_counts_match_day_by_day(self):
+        from attendance.models import CalendarDay
+        from attendance.workdays import work_calendar
+
+        CalendarDay.objects.create(date=date(2026, 1, 1), name="New Year's Day", kind='REGULAR_HOLIDAY')
+        calendar = work_calendar(date(2025, 1, 1), date(2026, 12, 31))
+        kinds = dict(CalendarDay.objects.values_list('date', 'kind'))
+
+        def brute(start, end):
+            counts = {'working': 0, 'paid': 0, 'holidays': 0}
+            day = start
+            while day <= end:
+                kind = kinds.get(day)
+                resting = day.weekday() >= 5 and kind != 'WORKDAY'
+                holiday = kind in ('REGULAR_HOLIDAY', 'SPECIAL_HOLIDAY')
+                counts['working'] += not holiday and not resting
+                counts['paid'] += not resting
+                counts['holidays'] += holiday
+                day += timedelta(days=1)
+            return counts
+
+        rng = random.Random(3)
+        for _ in range(200):
+            start = date(2025, 1, 1) + timedelta(days=rng.randint(0, 700))
+            end = start + timedelta(days=rng.randint(0, 60))
+            end = min(end, date(2026, 12, 31))
+            expected = brute(start, end)
+            self.assertEqual(calendar.working_days(start, end), expected['working'], (start, end))
+            self.assertEqual(calendar.paid_days(start, end), expected['paid'], (start, end))
+            self.assertEqual(calendar.holidays(start, end), expected['holidays'], (start, end))
+        # March 2025: 21 weekdays, one a holiday and one a special day, plus a Saturday working day
+        self.assertEqual(calendar.working_days(date(2025, 3, 1), date(2025, 3, 31)), 20)
+        self.assertEqual(calendar.paid_days(date(2025, 3, 1), date(2025, 3, 31)), 22)
+
+    def test_holiday_pay_and_absences(self):
+        from .vectorized import VectorizedPayrollCalculator
+
+        grade = SalaryGrade.objects.create(code='CAL', base_pay=Decimal('22000.00'))
+        emp = Employee.objects.create(
+            user=User.objects.create(username='calendar'), employee_no='CAL', first_name='Cal', last_name='Endar',
+            department='HR', position='Staff', salary_grade=grade, date_hired=date(2025, 3, 3),
+        )
+        # Worked the regular holiday, the special day and the Saturday working day, nothing else
+        for day in (3, 8, 12):
+            AttendanceLog.objects.create(employee=emp, date=date(2025, 3, day), time_in=time(8), time_out=time(16))
+        start, end = date(2025, 3, 1), date(2025, 3, 15)
+        payslip = PayrollCalculator(emp, start, end).compute_payslip()
+        # 1,000.00 a day: 100% extra for the regular holiday, 30% for the special day
+        self.assertEqual(payslip['holiday_pay'], Decimal('1300.00'))
+        self.assertEqual(payslip['gross_pay'], Decimal('3000.00'))
+        # Hired Mar 3: working days Mar 4-7, 8, 10, 11, 13, 14 less the Saturday attended
+        self.assertEqual(payslip['absences'], 8)
+
+        batch = dict(BatchPayrollCalculator(start, end, Employee.objects.filter(pk=emp.pk)).compute())
+        vectorized = dict(VectorizedPayrollCalculator(start, end, Employee.objects.filter(pk=emp.pk)).compute())
+        self.assertEqual(batch[emp], payslip)
+        self.assertEqual(vectorized[emp], payslip)
+
+        # Without attendance, pay is pro-rated on the 11 paid days (weekdays and the Saturday working day)
+        AttendanceLog.objects.filter(employee=emp).delete()
+        payslip = PayrollCalculator(emp, start, end).compute_payslip()
+        self.assertEqual(payslip['gross_pay'], Decimal('11000.00'))
+        self.assertEqual(payslip['absences'], 0)
+
+
+class ShiftScheduleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        grade = SalaryGrade.objects.create(code='SHIFT', base_pay=Decimal('22000.00'))
+        cls.employees = [
+            Employee.objects.create(
+                user=User.objects.create(username=f'shift{i}'), employee_no=f'S{i}', first_name='Shift',
+                last_name=f'Worker{i}', department=department, position='Staff', salary_grade=grade,
+            )
+            for i, department in enumerate(['IT', 'IT', 'HR'])
+        ]
+
+    def test_night_window_intersection(self):
+        from attendance.shifts import night_seconds
+
+        hour = 3600
+        self.assertEqual(night_seconds(8 * hour, 17 * hour), 0)
+        self.assertEqual(night_seconds(18 * hour, 23 * hour), hour)
+        # 22:00 to 06:00 the next day, and an early start before 06:00
+        self.assertEqual(night_seconds(22 * hour, 30 * hour), 8 * hour)
+        self.assertEqual(night_seconds(4 * hour, 12 * hour), 2 * hour)
+        # A long shift through this morning's and tonight's windows
+        self.assertEqual(night_seconds(5 * hour, 29 * hour), hour + 7 * hour)
+
+    def test_lateness_follows_the_schedule(self):
+        from attendance.models import AttendanceSummary, ShiftSchedule, SummaryRebuild
+        from attendance.summaries import rebuild_queued_summaries
+
+        it_worker, own_schedule, hr_worker = self.employees
+        ShiftSchedule.objects.create(name='IT day', department='IT', start_time=time(8), end_time=time(17),
+                                     grace_minutes=10)
+        ShiftSchedule.objects.create(name='Graveyard', employee=own_schedule, start_time=time(22), end_time=time(6))
+        day = date(2025, 3, 3)
+        AttendanceLog.objects.create(employee=it_worker, date=day, time_in=time(8, 9), time_out=time(17))
+        AttendanceLog.objects.create(employee=own_schedule, date=day, time_in=time(22, 30), time_out=time(6, 30))
+        AttendanceLog.objects.create(employee=hr_worker, date=day, time_in=time(9, 15), time_out=time(18))
+        AttendanceLog.objects.create(employee=it_worker, date=day + timedelta(days=1), time_in=time(8, 30), time_out=time(17))
+
+        late = dict(AttendanceSummary.objects.values_list('log__employee__employee_no', 'late_seconds').order_by('date'))
+        night = dict(AttendanceSummary.objects.values_list('employee__employee_no', 'night_seconds'))
+        # Within the IT grace period the first day, 30 minutes late the second
+        self.assertEqual(late, {'S0': 30 * 60, 'S1': 30 * 60, 'S2': 15 * 60})
+        self.assertEqual(night, {'S0': 0, 'S1': 7.5 * 3600, 'S2': 0})
+
+        # Changing a schedule queues a rebuild of the logs it covers instead of re-measuring them on save
+        ShiftSchedule.objects.create(name='Office', start_time=time(9, 30), end_time=time(18, 30))
+        ShiftSchedule.objects.filter(department='IT').get().delete()
+        self.assertEqual(AttendanceSummary.objects.get(employee=hr_worker).late_seconds, 15 * 60)
+        # One for each schedule created or deleted in this test
+        self.assertEqual(SummaryRebuild.objects.count(), 4)
+        # The company default covers every log
+        self.assertEqual(rebuild_queued_summaries(), 4)
+        self.assertFalse(SummaryRebuild.objects.exists())
+        self.assertEqual(AttendanceSummary.objects.get(employee=hr_worker).late_seconds, 0)
+        self.assertEqual(
+            sorted(AttendanceSummary.objects.filter(employee=it_worker).values_list('late_seconds', flat=True)), [0, 0]
+        )
+
+        # Moving an employee's schedule re-measures the logs of both scopes, and only those
+        schedule = ShiftSchedule.objects.get(employee=own_schedule)
+        schedule.employee = it_worker
+        schedule.save()
+        with self.assertNumQueries(7):
+            self.assertEqual(rebuild_queued_summaries(), 3)
+        self.assertEqual(AttendanceSummary.objects.get(employee=own_schedule).night_seconds, 7.5 * 3600)
+        self.assertEqual(
+            sorted(AttendanceSummary.objects.filter(employee=it_worker).values_list('late_seconds', flat=True)),
+            [10 * 3600 + 9 * 60, 10 * 3600 + 30 * 60],
+        )
+
+    def test_night_differential_and_tardiness_in_payroll(self):
+        from attendance.models import ShiftSchedule
+        from .vectorized import VectorizedPayrollCalculator
+
+        emp = self.employees[1]
+        ShiftSchedule.objects.create(name='Graveyard', employee=emp, start_time=time(22), end_time=time(6))
+        start, end = date(2025, 3, 1), date(2025, 3, 15)
+        for day in range(3, 8):
+            AttendanceLog.objects.create(employee=emp, date=date(2025, 3, day), time_in=time(22, 15), time_out=time(6))
+        payslip = PayrollCalculator(emp, start, end).compute_payslip()
+        # 125.00 an hour: 10% on 5 x 7.75 night hours
+        self.assertEqual(payslip['night_differential'], Decimal('484.38'))
+        self.assertEqual(payslip['tardiness_hours'], Decimal('1.25'))
+
+        employees = Employee.objects.filter(pk=emp.pk)
+        self.assertEqual(dict(BatchPayrollCalculator(start, end, employees).compute())[emp], payslip)
+        self.assertEqual(dict(VectorizedPayrollCalculator(start, end, employees).compute())[emp], payslip)
+
+    def test_payroll_job_rebuilds_queued_summaries_first(self):
+        from attendance.models import ShiftSchedule, SummaryRebuild
+        from .jobs import claim_next_job, enqueue_payroll_job, run_job
+        from .models import PayrollRun
+
+        emp = self.employees[2]
+        AttendanceLog.objects.create(employee=emp, date=date(2025, 3, 3), time_in=time(9, 30), time_out=time(18))
+        # A 10:00 start makes the 9:30 arrival on time once the summary is rebuilt
+        ShiftSchedule.objects.create(name='HR late', department='HR', start_time=time(10), end_time=time(19))
+        run = PayrollRun.objects.create(period_start=date(2025, 3, 1), period_end=date(2025, 3, 15),
+                                        created_by=User.objects.create(username='shift-job'))
+        enqueue_payroll_job(run, 'CREATE')
+        job = run_job(claim_next_job(worker='test'))
+        self.assertEqual(job.status, 'DONE', job.message)
+        self.assertFalse(SummaryRebuild.objects.exists())
+        self.assertEqual(run.payslips.get(employee=emp).tardiness_hours, Decimal('0.00'))
+
+
+class CompiledRatesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+
+    def boundaries(self, rows):
+        """Every (low, high) bound of the rows, just inside and just past each end"""
+        cent = Decimal('0.01')
+        points = set()
+        for low, high in rows:
+            points.update([low, low - cent, low + cent])
+            if high is not None:
+                points.update([high, high - cent, high + cent])
+        return sorted(point for point in points if point >= 0)
+
+    def test_index_matches_table_queries_at_every_boundary(self):
+        from contributions.rates import get_rates
+
+        rates = get_rates()
+        for salary in self.boundaries(SSSContributionTable.objects.values_list('min_salary', 'max_salary')):
+            self.assertEqual(rates.sss(salary), SSSContributionTable.get_contribution(salary), salary)
+
+        # PhilHealth and Pag-IBIG are single rows; their boundaries are where the caps start to apply
+        philhealth = PhilHealthContributionTable.objects.get()
+        pagibig = PagibigContributionTable.objects.get()
+        caps = [
+            (philhealth.min_salary, philhealth.max_contribution / philhealth.premium_rate),
+            (pagibig.min_salary, pagibig.max_employee_contribution / pagibig.employee_rate),
+            (pagibig.min_salary, pagibig.max_employer_contribution / pagibig.employer_rate),
+        ]
+        for salary in self.boundaries(caps):
+            self.assertEqual(rates.philhealth_contribution(salary), PhilHealthContributionTable.get_contribution(salary), salary)
+            self.assertEqual(rates.pagibig_contribution(salary), PagibigContributionTable.get_contribution(salary), salary)
+
+        for income in self.boundaries(TaxTable.objects.values_list('min_compensation', 'max_compensation')):
+            self.assertEqual(rates.withholding_tax(income), TaxTable.get_withholding_tax(income), income)
+
+
+class EffectiveDatedRatesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        # PhilHealth rises to 6% from June 2025; a new tax schedule starts in 2026
+        PhilHealthContributionTable.objects.create(
+            min_salary=Decimal('0'), premium_rate=Decimal('0.06'),
+            max_contribution=Decimal('6000.00'), effective_date=date(2025, 6, 1),
+        )
+        TaxTable.objects.create(
+            min_compensation=Decimal('0'), max_compensation=None,
+            base_tax=Decimal('0'), tax_rate=Decimal('0.10'), effective_date=date(2026, 1, 1),
+        )
+        create_workforce(10, date(2025, 3, 1), date(2025, 7, 15))
+
+    def test_rates_resolved_from_period_end(self):
+        from contributions.rates import get_rates
+
+        self.assertEqual(get_rates(as_of=date(2025, 5, 31)).philhealth.premium_rate, Decimal('0.05'))
+        self.assertEqual(get_rates(as_of=date(2025, 6, 1)).philhealth.premium_rate, Decimal('0.06'))
+        # Tax brackets switch as a whole schedule, not row by row
+        self.assertEqual(len(get_rates(as_of=date(2025, 12, 31)).withholding_tax.breakpoints), 6)
+        self.assertEqual(len(get_rates(as_of=date(2026, 1, 1)).withholding_tax.breakpoints), 1)
+        # Periods before the first version use the earliest tables
+        self.assertEqual(get_rates(as_of=date(2020, 1, 1)).philhealth.premium_rate, Decimal('0.05'))
+
+    def test_historical_run_uses_its_own_rates(self):
+        from .batch import BatchPayrollCalculator
+
+        emp = Employee.objects.select_related('salary_grade').exclude(salary_grade__code='T6').first()
+        march = PayrollCalculator(emp, date(2025, 3, 1), date(2025, 3, 15)).compute_payslip()
+        july = PayrollCalculator(emp, date(2025, 7, 1), date(2025, 7, 15)).compute_payslip()
+        earnings = march['gross_pay'] + march['overtime_pay']
+        self.assertEqual(march['philhealth'], (min(earnings * Decimal('0.05'), Decimal('5000')) / 2).quantize(Decimal('0.01')))
+        earnings = july['gross_pay'] + july['overtime_pay']
+        self.assertEqual(july['philhealth'], (min(earnings * Decimal('0.06'), Decimal('6000')) / 2).quantize(Decimal('0.01')))
+
+        # Compiled rates are reused: calendar, attendance, pending claims, loans, deductions, year to date and
+        # periods posted after this one, version stamp, employees
+        with self.assertNumQueries(9):
+            batch = dict(BatchPayrollCalculator(date(2025, 3, 1), date(2025, 3, 15)).compute())
+        self.assertEqual(batch[emp]['philhealth'], march['philhealth'])
+
+
+class RateSimulationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from .models import PayrollRun
+        from .workflow import transition_runs
+
+        create_contribution_tables()
+        create_workforce(12, date(2025, 2, 1), date(2025, 3, 15), seed=3)
+        user = User.objects.create(username='simulation')
+        # A posted February run gives March a year to date to annualize over
+        february = PayrollRun.objects.create(period_start=date(2025, 2, 1), period_end=date(2025, 2, 15),
+                                             status='APPROVED', created_by=user)
+        BatchPayrollCalculator(february.period_start, february.period_end).create_payslips(february)
+        transition_runs([february], 'PAID', user)
+        cls.march = PayrollRun.objects.create(period_start=date(2025, 3, 1), period_end=date(2025, 3, 15), created_by=user)
+        BatchPayrollCalculator(cls.march.period_start, cls.march.period_end).create_payslips(cls.march)
+
+    def test_current_tables_reproduce_stored_deductions(self):
+        from django.db.models import F, Sum
+        from .simulation import candidate_rates, simulate_rates
+
+        result = simulate_rates(candidate_rates(), [self.march])
+        stored = self.march.payslips.aggregate(total=Sum(F('sss') + F('philhealth') + F('pagibig') + F('tax')))['total']
+        self.assertGreater(self.march.payslips.filter(tax__gt=0).count(), 0)
+        self.assertEqual(result['total'].current_employee, stored)
+        self.assertEqual(result['total'].total_delta, 0)
+        by_department = self.march.payslips.values('employee__department').annotate(
+            total=Sum(F('sss') + F('philhealth') + F('pagibig') + F('tax'))
+        )
+        self.assertEqual(
+            {line.label: line.current_employee for line in result['departments']},
+            {row['employee__department']: row['total'] for row in by_department},
+        )
+
+    def test_changed_bracket_shows_in_delta(self):
+        from contributions.rates import PhilHealthRate, get_rates
+        from .simulation import candidate_rates, simulate_rates
+
+        current = get_rates(as_of=self.march.period_end)
+        candidate = candidate_rates(philhealth=PhilHealthRate(Decimal('0.06'), Decimal('6000.00')))
+        result = simulate_rates(candidate, [self.march])
+
+        # The employer side is PhilHealth alone; the employee side also moves tax
+        expected = sum(
+            candidate.philhealth_contribution(slip.total_earnings)['employer']
+            - current.philhealth_contribution(slip.total_earnings)['employer']
+            for slip in self.march.payslips.all()
+        )
+        self.assertGreater(expected, 0)
+        self.assertEqual(result['total'].employer_delta, expected)
+        self.assertGreater(result['total'].employee_delta, 0)
+        self.assertEqual(result['runs'][0].total_delta, result['total'].total_delta)
+
+
+class RunMetricsTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        create_workforce(12, cls.period_start, cls.period_end)
+        cls.user = User.objects.create(username='metrics')
+
+    def run_create_job(self):
+        from .jobs import claim_next_job, enqueue_payroll_job, run_job
+        from .models import PayrollRun
+
+        run = PayrollRun.objects.create(period_start=self.period_start, period_end=self.period_end, created_by=self.user)
+        enqueue_payroll_job(run, 'CREATE', self.user)
+        run_job(claim_next_job(worker='test'))
+        return run
+
+    def test_job_records_phases(self):
+        run = self.run_create_job()
+
+        metrics = run.metrics.get()
+        self.assertEqual(metrics.operation, 'CREATE')
+        self.assertEqual(metrics.employees, 12)
+        phases = {phase['name']: phase for phase in metrics.phases}
+        for name in ('fingerprints', 'load_attendance', 'load_loans', 'earnings', 'contributions', 'tax', 'write'):
+            self.assertIn(name, phases)
+        self.assertEqual(phases['contributions']['calls'], 12)
+        self.assertEqual(phases['load_attendance']['queries'], 1)
+        # Everything is preloaded: no queries while computing payslips
+        self.assertEqual(phases['contributions']['queries'] + phases['loans']['queries'], 0)
+        self.assertEqual(set(metrics.employee_percentiles), {'p50', 'p90', 'p99', 'max'})
+        self.assertGreaterEqual(metrics.total_queries, sum(phase['queries'] for phase in metrics.phases))
+
+    def test_disabled(self):
+        with self.settings(PAYROLL_METRICS=False):
+            run = self.run_create_job()
+        self.assertEqual(run.payslips.count(), 12)
+        self.assertFalse(run.metrics.exists())
+
+
+class IncrementalRecalculationTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        cls.employees = create_workforce(8, cls.period_start, cls.period_end)
+        cls.user = User.objects.create(username='incremental')
+
+    def setUp(self):
+        from .models import PayrollRun
+
+        self.payroll_run = PayrollRun.objects.create(period_start=self.period_start, period_end=self.period_end,
+                                                     created_by=self.user)
+        BatchPayrollCalculator(self.period_start, self.period_end).create_payslips(self.payroll_run)
+
+    def fingerprints(self):
+        from .fingerprints import input_fingerprints
+
+        return input_fingerprints(Employee.objects.filter(active=True), self.period_start, self.period_end)
+
+    def test_unchanged_employees_are_skipped(self):
+        from .incremental import recalculate_changed_payslips
+
+        result = recalculate_changed_payslips(self.payroll_run)
+        self.assertEqual((result['created'], result['updated'], result['skipped']), (0, 0, 8))
+
+        employee = self.employees[2]
+        AttendanceLog.objects.filter(employee=employee).first().delete()
+        result = recalculate_changed_payslips(self.payroll_run)
+        self.assertEqual((result['updated'], result['skipped']), (1, 7))
+        expected = PayrollCalculator(employee, self.period_start, self.period_end).compute_payslip()
+        self.assertEqual(self.payroll_run.payslips.get(employee=employee).net_pay, expected['net_pay'])
+
+    def test_each_input_changes_the_fingerprint(self):
+        from attendance.models import CalendarDay
+
+        employee = self.employees[1]
+
+        def edit_attendance():
+            AttendanceLog.objects.filter(employee=employee).update(time_out=time(23))
+            rebuild_summaries()
+
+        edits = {
+            'attendance': edit_attendance,
+            'loan': lambda: Loan.objects.create(
+                employee=employee, loan_type='SALARY', principal_amount=Decimal('1000'),
+                monthly_deduction=Decimal('100'), remaining_balance=Decimal('1000'), start_date=date(2025, 1, 1),
+            ),
+            'rate table version': lambda: PhilHealthContributionTable.objects.create(
+                min_salary=Decimal('0'), premium_rate=Decimal('0.06'),
+                max_contribution=Decimal('6000.00'), effective_date=date(2025, 3, 1),
+            ),
+            'calendar': lambda: CalendarDay.objects.create(date=date(2025, 3, 4), name='Declared', kind='SPECIAL_HOLIDAY'),
+        }
+        for name, edit in edits.items():
+            before = self.fingerprints()
+            edit()
+            self.assertNotEqual(self.fingerprints()[employee.pk], before[employee.pk], name)
+        # Attendance and loans are per employee; others keep their fingerprint
+        before = self.fingerprints()
+        Loan.objects.filter(employee=employee).update(remaining_balance=Decimal('900'))
+        after = self.fingerprints()
+        self.assertEqual([pk for pk in before if before[pk] != after[pk]], [employee.pk])
+
+    def test_falls_back_to_full_recompute_past_threshold(self):
+        from unittest import mock
+        from .incremental import plan_recalculation, recalculate_changed_payslips
+
+        for employee in self.employees[1:3]:
+            AttendanceLog.objects.filter(employee=employee).delete()
+        rebuild_summaries()
+
+        engine, plan = plan_recalculation(self.payroll_run)
+        self.assertEqual(engine.employees.count(), 2)
+        with mock.patch('payroll.incremental.FULL_RECOMPUTE_THRESHOLD', 1):
+            engine, plan = plan_recalculation(self.payroll_run)
+            self.assertEqual(engine.employees.count(), 8)
+            result = recalculate_changed_payslips(self.payroll_run)
+        # Everyone is computed, but only the changed payslips are written
+        self.assertEqual((result['updated'], result['skipped']), (2, 6))
+
+    def test_failed_job_reports_the_recalculation_errors(self):
+        from unittest import mock
+        from .jobs import claim_next_job, enqueue_payroll_job, run_job
+
+        def fail(payroll_run, engine, plan, **kwargs):
+            engine.errors.append((self.employees[0], 'No salary grade'))
+            raise RuntimeError('Recalculation failed')
+
+        enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user)
+        with mock.patch('payroll.jobs.apply_recalculation', fail):
+            job = run_job(claim_next_job(worker='test'))
+        self.assertEqual((job.status, job.message), ('FAILED', 'Recalculation failed'))
+        self.assertEqual(job.errors, [f'{self.employees[0]}: No salary grade'])
+
+
+class LoanLedgerPostingTest(TestCase):
+
+    def setUp(self):
+        from .models import PayrollRun, Payslip
+
+        user = User.objects.create(username='posting')
+        grade = SalaryGrade.objects.create(code='POST', base_pay=Decimal('20000'))
+        employee = Employee.objects.create(
+            user=user, employee_no='POST1', first_name='Post', last_name='Ing',
+            department='IT', position='Staff', salary_grade=grade, date_hired=date(2020, 1, 1),
+        )
+        self.loan = Loan.objects.create(
+            employee=employee, loan_type='SALARY', principal_amount=Decimal('10000'),
+            monthly_deduction=Decimal('500'), remaining_balance=Decimal('9500'), start_date=date(2024, 1, 1),
+        )
+        self.last_payment = Loan.objects.create(
+            employee=employee, loan_type='EMERGENCY', principal_amount=Decimal('3000'),
+            monthly_deduction=Decimal('1000'), remaining_balance=Decimal('250.50'), start_date=date(2024, 1, 1),
+        )
+        self.payroll_run = PayrollRun.objects.create(period_start=date(2025, 3, 1), period_end=date(2025, 3, 15), created_by=user)
+        self.payslip = Payslip.objects.create(
+            payroll_run=self.payroll_run, employee=employee, gross_pay=Decimal('10000'), net_pay=Decimal('9000'),
+            posting_effects=[
+                {'type': 'loan_repayment', 'loan_id': self.loan.pk, 'amount': '500.00'},
+                {'type': 'loan_repayment', 'loan_id': self.last_payment.pk, 'amount': '250.50'},
+            ],
+        )
+
+    def test_posts_ledger_and_balances_once(self):
+        from .models import LoanRepayment
+        from .posting import post_payroll_run
+
+        self.assertEqual(post_payroll_run(self.payroll_run), {'loans': 2, 'deductions': 0})
+        self.assertIsNone(post_payroll_run(self.payroll_run))
+
+        self.loan.refresh_from_db()
+        self.last_payment.refresh_from_db()
+        self.assertEqual(self.loan.remaining_balance, Decimal('9000.00'))
+        self.assertTrue(self.loan.is_active)
+        self.assertEqual(self.last_payment.remaining_balance, Decimal('0.00'))
+        self.assertFalse(self.last_payment.is_active)
+
+        entries = {entry.loan_id: entry for entry in LoanRepayment.objects.filter(payslip=self.payslip)}
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[self.loan.pk].amount, Decimal('500.00'))
+        self.assertEqual(entries[self.loan.pk].balance_after, Decimal('9000.00'))
+        self.assertEqual(entries[self.last_payment.pk].balance_after, Decimal('0.00'))
+
+    def test_never_repays_more_than_the_balance(self):
+        from .posting import post_payroll_run
+
+        # Paid down elsewhere after the payslip was computed
+        Loan.objects.filter(pk=self.loan.pk).update(remaining_balance=Decimal('120.25'))
+        post_payroll_run(self.payroll_run)
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.remaining_balance, Decimal('0.00'))
+        self.assertFalse(self.loan.is_active)
+        self.assertEqual(self.loan.repayments.get().amount, Decimal('120.25'))
+
+    def test_loan_paid_off_exactly_across_runs(self):
+        from .models import PayrollRun, Payslip
+        from .posting import post_payroll_runs
+
+        # The next run's 500 takes the loan's last 500 after this run's 500
+        Loan.objects.filter(pk=self.loan.pk).update(remaining_balance=Decimal('1000.00'))
+        later = PayrollRun.objects.create(period_start=date(2025, 3, 16), period_end=date(2025, 3, 31),
+                                          created_by=self.payroll_run.created_by)
+        Payslip.objects.create(
+            payroll_run=later, employee=self.payslip.employee, gross_pay=Decimal('10000'), net_pay=Decimal('9500'),
+            posting_effects=[{'type': 'loan_repayment', 'loan_id': self.loan.pk, 'amount': '500.00'}],
+        )
+        post_payroll_runs([later, self.payroll_run])
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.remaining_balance, Decimal('0.00'))
+        self.assertFalse(self.loan.is_active)
+        self.assertEqual(
+            list(self.loan.repayments.order_by('payroll_run_id').values_list('amount', 'balance_after')),
+            [(Decimal('500.00'), Decimal('500.00')), (Decimal('500.00'), Decimal('0.00'))],
+        )
+
+    def test_ledger_keeps_posted_records(self):
+        from django.contrib.admin.sites import site
+        from django.contrib.auth.models import Group
+        from django.urls import reverse
+        from .posting import post_payroll_run
+
+        post_payroll_run(self.payroll_run)
+        user = self.payroll_run.created_by
+        user.is_staff = user.is_superuser = True
+        user.save()
+        user.groups.add(Group.objects.get(name='Staff'))
+        self.client.force_login(user)
+
+        # The balance moves only with the ledger once the loan exists
+        self.assertIn('remaining_balance', site._registry[Loan].get_readonly_fields(None, self.loan))
+        self.assertNotIn('remaining_balance', site._registry[Loan].get_readonly_fields(None))
+
+        # Deleting a posted run or its employee is refused, not a server error
+        response = self.client.post(reverse('admin:payroll_payrollrun_delete', args=[self.payroll_run.pk]), {'post': 'yes'})
+        self.assertContains(response, 'Cannot delete payroll run')
+        employee = self.payslip.employee
+        response = self.client.post(reverse('employee_delete', args=[employee.pk]))
+        self.assertRedirects(response, reverse('employee_update', args=[employee.pk]), fetch_redirect_response=False)
+        self.assertTrue(self.payroll_run.loan_repayments.exists())
+        self.assertTrue(Employee.objects.filter(pk=employee.pk).exists())
+
+
+class PendingClaimsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        cls.employees = create_workforce(4, date(2025, 3, 1), date(2025, 3, 31), seed=3)
+        cls.employee = Employee.objects.select_related('salary_grade').get(pk=cls.employees[1].pk)
+        cls.loan = Loan.objects.create(
+            employee=cls.employee, loan_type='SALARY', principal_amount=Decimal('5000'),
+            monthly_deduction=Decimal('500'), remaining_balance=Decimal('700'), start_date=date(2024, 1, 1),
+        )
+        cls.boots = OtherDeduction.objects.create(employee=cls.employee, description='Boots', amount=Decimal('250'))
+        cls.user = User.objects.create(username='claims')
+
+    def effects(self, payroll_run):
+        return payroll_run.payslips.get(employee=self.employee).posting_effects
+
+    def test_two_unposted_runs_charge_a_one_time_deduction_once(self):
+        from .incremental import recalculate_changed_payslips
+        from .models import PayrollRun
+        from .vectorized import VectorizedPayrollCalculator
+        from .workflow import transition_runs
+
+        first, second = [
+            PayrollRun.objects.create(period_start=start, period_end=end, status='APPROVED', created_by=self.user)
+            for start, end in [(date(2025, 3, 1), date(2025, 3, 15)), (date(2025, 3, 16), date(2025, 3, 31))]
+        ]
+        for run in (first, second):
+            BatchPayrollCalculator(run.period_start, run.period_end).create_payslips(run)
+
+        self.assertEqual(self.effects(first), [
+            {'type': 'loan_repayment', 'loan_id': self.loan.pk, 'amount': '500.00'},
+            {'type': 'deactivate_deduction', 'deduction_id': self.boots.pk},
+        ])
+        # The second run gets what the first leaves: 200 of the loan and no boots
+        self.assertEqual(self.effects(second), [
+            {'type': 'loan_repayment', 'loan_id': self.loan.pk, 'amount': '200.00'},
+        ])
+        for run in (first, second):
+            payslip = run.payslips.get(employee=self.employee)
+            expected = PayrollCalculator(self.employee, run.period_start, run.period_end, payroll_run=run).compute_payslip()
+            vectorized = dict(VectorizedPayrollCalculator(
+                run.period_start, run.period_end, Employee.objects.filter(pk=self.employee.pk), payroll_run=run
+            ).compute())
+            self.assertEqual(expected['posting_effects'], payslip.posting_effects)
+            self.assertEqual(vectorized[self.employee]['posting_effects'], payslip.posting_effects)
+            self.assertEqual(expected['other_deductions'], payslip.other_deductions)
+
+        # Recalculating a run does not count its own payslips as claims
+        before = {run.pk: list(run.payslips.order_by('employee_id').values_list('net_pay', 'posting_effects'))
+                  for run in (first, second)}
+        for run in (first, second):
+            self.assertEqual(recalculate_changed_payslips(run)['errors'], [])
+            self.assertEqual(list(run.payslips.order_by('employee_id').values_list('net_pay', 'posting_effects')),
+                             before[run.pk])
+
+        self.assertEqual(transition_runs([first, second], 'PAID', self.user), {first.pk: None, second.pk: None})
+        self.loan.refresh_from_db()
+        self.boots.refresh_from_db()
+        self.assertEqual(self.loan.remaining_balance, Decimal('0.00'))
+        self.assertFalse(self.boots.is_active)
+        self.assertEqual(sorted(self.loan.repayments.values_list('amount', flat=True)),
+                         [Decimal('200.00'), Decimal('500.00')])
+
+
+class RunWorkflowTest(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        from .models import PayrollRun
+
+        self.user = User.objects.create_user('workflow')
+        self.user.groups.add(Group.objects.get(name='Staff'))
+        self.payroll_run = PayrollRun.objects.create(period_start=date(2025, 3, 1), period_end=date(2025, 3, 15), created_by=self.user)
+
+    def test_transitions(self):
+        from .workflow import TransitionError, transition_run
+
+        with self.assertRaises(TransitionError):
+            transition_run(self.payroll_run, 'APPROVED', self.user)
+        transition_run(self.payroll_run, 'REVIEW', self.user)
+        self.payroll_run.refresh_from_db()
+        self.assertEqual(self.payroll_run.status, 'REVIEW')
+        self.assertEqual(self.payroll_run.reviewed_by, self.user)
+        # A resubmitted form does not move or stamp the run again
+        with self.assertRaises(TransitionError):
+            transition_run(self.payroll_run, 'REVIEW', self.user)
+
+        transition_run(self.payroll_run, 'APPROVED', self.user)
+        transition_run(self.payroll_run, 'PAID', self.user)
+        self.payroll_run.refresh_from_db()
+        self.assertIsNotNone(self.payroll_run.posted_at)
+        with self.assertRaises(TransitionError):
+            transition_run(self.payroll_run, 'CANCELLED', self.user)
+
+    def test_no_transition_while_calculating(self):
+        from .jobs import enqueue_payroll_job
+        from .workflow import TransitionError, transition_run
+
+        enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user)
+        with self.assertRaises(TransitionError):
+            transition_run(self.payroll_run, 'REVIEW', self.user)
+
+    def test_no_date_edit_while_calculating(self):
+        from django.urls import reverse
+        from .jobs import enqueue_payroll_job
+
+        self.client.force_login(self.user)
+        url = reverse('edit_payroll_run', args=[self.payroll_run.pk])
+        data = {'period_start': '2025-03-02', 'period_end': '2025-03-16'}
+        job, _ = enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user)
+        self.client.post(url, data)
+        self.payroll_run.refresh_from_db()
+        self.assertEqual(self.payroll_run.period_start, date(2025, 3, 1))
+
+        job.status = 'DONE'
+        job.save()
+        self.client.post(url, data)
+        self.payroll_run.refresh_from_db()
+        self.assertEqual(self.payroll_run.period_start, date(2025, 3, 2))
+
+    def test_one_active_job_per_run(self):
+        from django.db import IntegrityError, transaction
+        from .jobs import enqueue_payroll_job
+        from .models import PayrollJob
+
+        job, created = enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user, request_key='k1')
+        self.assertTrue(created)
+        self.assertEqual(enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user, request_key='k2'), (job, False))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PayrollJob.objects.create(payroll_run=self.payroll_run, kind='RECALCULATE')
+
+        # The same form submitted again after the job finished does not queue another
+        PayrollJob.objects.filter(pk=job.pk).update(status='DONE')
+        self.assertEqual(enqueue_payroll_job(self.payroll_run, 'RECALCULATE', self.user, request_key='k1'), (job, False))
+
+    def test_create_form_is_idempotent(self):
+        from django.urls import reverse
+        from .models import PayrollRun
+
+        self.client.force_login(self.user)
+        data = {'period_start': '2025-04-01', 'period_end': '2025-04-15', 'request_key': 'double-click'}
+        first = self.client.post(reverse('payroll_run_create'), data)
+        second = self.client.post(reverse('payroll_run_create'), data)
+        run = PayrollRun.objects.get(request_key='double-click')
+        self.assertRedirects(first, reverse('payroll_run_payslips', args=[run.pk]), fetch_redirect_response=False)
+        self.assertRedirects(second, reverse('payroll_run_payslips', args=[run.pk]), fetch_redirect_response=False)
+        self.assertEqual(run.jobs.count(), 1)
+
+    @override_settings(PAYROLL_PREVIEW_LIMIT=3)
+    def test_preview_computes_a_sample(self):
+        from django.urls import reverse
+        from .models import PayrollRun
+
+        create_contribution_tables()
+        employees = create_workforce(5, date(2025, 4, 1), date(2025, 4, 15))
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('payroll_run_create'), {
+            'period_start': '2025-04-01', 'period_end': '2025-04-15', 'preview': '1',
+        })
+        preview = response.context['preview']
+        self.assertEqual([row['employee'] for row in preview['rows']], employees[:3])
+        self.assertEqual((preview['sample_size'], preview['employee_count']), (3, 5))
+        self.assertContains(response, 'Showing the first 3 of 5 active employees')
+        self.assertFalse(PayrollRun.objects.filter(period_start=date(2025, 4, 1)).exists())
+
+
+class JobWorkerTest(TransactionTestCase):
+    """The heartbeat writes through its own thread's connection, which only sees committed rows"""
+
+    def setUp(self):
+        from .models import PayrollRun
+
+        create_contribution_tables()
+        create_workforce(4, date(2025, 3, 1), date(2025, 3, 15), seed=13)
+        self.user = User.objects.create(username='jobs')
+        self.run = PayrollRun.objects.create(period_start=date(2025, 3, 1), period_end=date(2025, 3, 15), created_by=self.user)
+
+    def test_heartbeat_keeps_a_long_phase_from_looking_stale(self):
+        import time as clock
+        from django.utils import timezone
+        from .jobs import Heartbeat, claim_next_job, enqueue_payroll_job, requeue_stale_jobs
+        from .models import PayrollJob
+
+        enqueue_payroll_job(self.run, 'CREATE', self.user)
+        job = claim_next_job(worker='first')
+        PayrollJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=30))
+        with Heartbeat(job, interval=0.05) as heartbeat:
+            clock.sleep(0.3)
+        self.assertFalse(heartbeat.lost)
+        self.assertEqual(requeue_stale_jobs(60), 0)
+
+        # Once another worker holds the job the heartbeat stops refreshing it
+        PayrollJob.objects.filter(pk=job.pk).update(worker='second')
+        with Heartbeat(job, interval=0.05) as heartbeat:
+            clock.sleep(0.3)
+        self.assertTrue(heartbeat.lost)
+
+    def test_requeued_job_is_left_to_its_new_worker(self):
+        from unittest import mock
+        from . import jobs
+        from .jobs import claim_next_job, enqueue_payroll_job, requeue_stale_jobs, run_job
+        from .models import PayrollJob
+
+        enqueue_payroll_job(self.run, 'CREATE', self.user)
+        job = claim_next_job(worker='first')
+        run_engine = jobs.run_engine
+
+        def requeued_meanwhile(payroll_run, metrics=None):
+            # The first worker looked dead long enough for its job to be requeued and claimed again
+            PayrollJob.objects.filter(pk=job.pk).update(updated_at=job.updated_at - timedelta(hours=1))
+            requeue_stale_jobs(60)
+            self.assertEqual(claim_next_job(worker='second').pk, job.pk)
+            return run_engine(payroll_run, metrics=metrics)
+
+        with mock.patch('payroll.jobs.run_engine', requeued_meanwhile):
+            job = run_job(job)
+        self.assertEqual((job.status, job.worker, job.total), ('RUNNING', 'second', 0))
+        self.assertFalse(self.run.payslips.exists())
+        self.assertFalse(self.run.metrics.exists())
+
+        job = run_job(job)
+        self.assertEqual((job.status, job.payslips_created), ('DONE', 4))
+
+
+class BulkTransitionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='bulk')
+        grade = SalaryGrade.objects.create(code='BULK', base_pay=Decimal('20000'))
+        cls.employees = []
+        for i in range(6):
+            employee = Employee.objects.create(
+                user=User.objects.create(username=f'bulk{i}'), employee_no=f'BULK{i}', first_name='Bulk', last_name=str(i),
+                department='IT', position='Staff', salary_grade=grade, date_hired=date(2020, 1, 1),
+            )
+            employee.loan = Loan.objects.create(
+                employee=employee, loan_type='SALARY', principal_amount=Decimal('10000'),
+                monthly_deduction=Decimal('500'), remaining_balance=Decimal('10000'), start_date=date(2024, 1, 1),
+            )
+            cls.employees.append(employee)
+
+    def create_runs(self, count, payslips, status='APPROVED'):
+        from .models import PayrollRun, Payslip
+
+        runs = []
+        for i in range(count):
+            run = PayrollRun.objects.create(
+                period_start=date(2024, 1 + i, 1), period_end=date(2024, 1 + i, 15), status=status, created_by=self.user,
+            )
+            Payslip.objects.bulk_create([
+                Payslip(
+                    payroll_run=run, employee=employee, gross_pay=Decimal('10000'), net_pay=Decimal('9500'),
+                    loan_deductions=Decimal('500'),
+                    posting_effects=[{'type': 'loan_repayment', 'loan_id': employee.loan.pk, 'amount': '500.00'}],
+                )
+                for employee in self.employees[:payslips]
+            ])
+            runs.append(run)
+        return runs
+
+    def test_pays_many_runs_at_once(self):
+        from .models import LoanRepayment, Payslip
+        from .workflow import transition_runs
+
+        runs = self.create_runs(3, 4)
+        draft = self.create_runs(1, 1, status='DRAFT')[0]
+        outcomes = transition_runs(runs + [draft], 'PAID', self.user)
+
+        self.assertEqual([outcomes[run.pk] for run in runs], [None, None, None])
+        self.assertIn('Cannot move payroll run from Draft', outcomes[draft.pk])
+        self.assertEqual(Payslip.objects.filter(payroll_run__in=runs, salary_deposited=False).count(), 0)
+        self.assertTrue(all(run.status == 'PAID' and run.posted_at for run in runs))
+        self.assertEqual(LoanRepayment.objects.count(), 12)
+        loan = Loan.objects.get(pk=self.employees[0].loan.pk)
+        self.assertEqual(loan.remaining_balance, Decimal('8500.00'))
+        self.assertEqual(
+            list(loan.repayments.order_by('payroll_run_id').values_list('balance_after', flat=True)),
+            [Decimal('9500.00'), Decimal('9000.00'), Decimal('8500.00')],
+        )
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, 'DRAFT')
+
+    def test_queries_do_not_grow_with_runs_or_payslips(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .workflow import transition_runs
+
+        small = self.create_runs(2, 2)
+        large = self.create_runs(5, 6)
+        counts = []
+        for runs in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                transition_runs(runs, 'PAID', self.user)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class YearToDateTest(TestCase):
+    period_start = date(2025, 3, 1)
+    period_end = date(2025, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        cls.employees = create_workforce(8, date(2025, 2, 1), date(2025, 3, 31), seed=5)
+        cls.user = User.objects.create(username='ytd')
+
+    def post_history(self, payslips):
+        """Post one-day runs from 1 January, the nth holding the nth (employee, taxable, tax) of each list"""
+        from django.utils import timezone
+        from .models import PayrollRun
+        from .ytd import add_to_year_to_date, payslip_totals
+
+        for day, rows in enumerate(payslips):
+            run = PayrollRun.objects.create(
+                period_start=date(2025, 1, 1) + timedelta(days=day), period_end=date(2025, 1, 1) + timedelta(days=day),
+                status='PAID', posted_at=timezone.now(), created_by=self.user,
+            )
+            Payslip.objects.bulk_create([
+                Payslip(payroll_run=run, employee=emp, gross_pay=taxable, tax=tax, net_pay=taxable - tax)
+                for emp, taxable, tax in rows
+            ])
+            add_to_year_to_date(payslip_totals(run.payslips.all()))
+
+    def taxable(self, payslip):
+        earnings = payslip['gross_pay'] + payslip['overtime_pay'] + payslip['holiday_pay'] + payslip['night_differential']
+        return to_centavos(earnings - payslip['sss'] - payslip['philhealth'] - payslip['pagibig'])
+
+    def test_cumulative_annualization(self):
+        from contributions.rates import get_rates
+        from .money import centavo_rates, div_round
+
+        emp = Employee.objects.select_related('salary_grade').filter(
+            pk__in=[e.pk for e in self.employees]
+        ).order_by('-salary_grade__base_pay').first()
+        payslip = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+        taxable = self.taxable(payslip)
+        annual_tax = centavo_rates(get_rates(as_of=self.period_end)).withholding_tax(taxable * 24)
+        self.assertGreater(annual_tax, 100000)
+        # Semi-monthly with nothing posted yet: a 24th of the annual tax
+        self.assertEqual(to_centavos(payslip['tax']), div_round(annual_tax, 24))
+
+        # Last period of the year: whatever of the annual tax is still unpaid
+        self.post_history([[(emp, from_centavos(taxable), Decimal('1000.00') if day == 0 else Decimal('0'))]
+                           for day in range(23)])
+        payslip = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+        self.assertEqual(to_centavos(payslip['tax']), annual_tax - 100000)
+
+    def test_batch_and_vectorized_read_year_to_date(self):
+        from .batch import BatchPayrollCalculator
+        from .vectorized import VectorizedPayrollCalculator
+
+        # Employee i has i posted periods of 15,000 taxable with 700 withheld
+        self.post_history([[(emp, Decimal('15000'), Decimal('700')) for emp in self.employees[day + 1:]]
+                           for day in range(len(self.employees) - 1)])
+        batch = {emp.pk: data for emp, data in BatchPayrollCalculator(self.period_start, self.period_end).compute()}
+        vectorized = {emp.pk: data for emp, data in VectorizedPayrollCalculator(self.period_start, self.period_end).compute()}
+        for emp in Employee.objects.select_related('salary_grade').filter(pk__in=[e.pk for e in self.employees]):
+            expected = PayrollCalculator(emp, self.period_start, self.period_end).compute_payslip()
+            self.assertEqual(batch[emp.pk], expected, emp.employee_no)
+            self.assertEqual(vectorized[emp.pk], expected, emp.employee_no)
+
+    def test_later_posted_periods_do_not_count(self):
+        from .incremental import recalculate_changed_payslips
+        from .models import PayrollRun
+        from .workflow import transition_runs
+
+        def create_run(start, end, status):
+            run = PayrollRun.objects.create(period_start=start, period_end=end, status=status, created_by=self.user)
+            BatchPayrollCalculator(start, end).create_payslips(run)
+            return run
+
+        def taxes(run):
+            return dict(run.payslips.values_list('employee_id', 'tax'))
+
+        february = create_run(date(2025, 2, 1), date(2025, 2, 15), 'DRAFT')
+        february_before = taxes(february)
+        april = create_run(date(2025, 4, 1), date(2025, 4, 15), 'DRAFT')
+        april_before = taxes(april)
+        march = create_run(date(2025, 3, 1), date(2025, 3, 15), 'APPROVED')
+        transition_runs([march], 'PAID', self.user)
+
+        # Recalculating February after March is posted withholds the same tax (posting did move loan balances)
+        recalculate_changed_payslips(february)
+        self.assertEqual(taxes(february), february_before)
+        for emp in self.employees:
+            expected = PayrollCalculator(emp, date(2025, 2, 1), date(2025, 2, 15)).compute_payslip()
+            self.assertEqual(taxes(february)[emp.pk], expected['tax'], emp.employee_no)
+
+        # April was computed before March was posted: posting marked it, and recalculation counts March
+        self.assertFalse(april.payslips.exclude(input_fingerprint='').exists())
+        self.assertEqual(recalculate_changed_payslips(april)['updated'], 8)
+        for emp in self.employees:
+            expected = PayrollCalculator(emp, date(2025, 4, 1), date(2025, 4, 15)).compute_payslip()
+            self.assertEqual(taxes(april)[emp.pk], expected['tax'], emp.employee_no)
+        self.assertNotEqual(taxes(april), april_before)
+
+    def test_posting_accumulates(self):
+        from .models import PayrollRun, YearToDate
+        from .workflow import transition_runs
+        from .ytd import rebuild_year_to_date, sum_payslips
+
+        runs = []
+        for start, end in ((date(2025, 3, 1), date(2025, 3, 15)), (date(2025, 3, 16), date(2025, 3, 31))):
+            run = PayrollRun.objects.create(period_start=start, period_end=end, status='APPROVED', created_by=self.user)
+            BatchPayrollCalculator(start, end).create_payslips(run)
+            runs.append(run)
+        transition_runs(runs[:1], 'PAID', self.user)
+        transition_runs(runs[1:], 'PAID', self.user)
+
+        ytd = {row.employee_id: row for row in YearToDate.objects.filter(year=2025)}
+        self.assertEqual(len(ytd), 8)
+        for emp in self.employees:
+            payslips = list(Payslip.objects.filter(employee=emp))
+            self.assertEqual(ytd[emp.pk].periods, 2)
+            self.assertEqual(ytd[emp.pk].gross, sum(p.total_earnings for p in payslips))
+            self.assertEqual(ytd[emp.pk].tax_withheld, sum(p.tax for p in payslips))
+
+        # Rebuilding from the posted runs gives the same totals, as does summing them in the database
+        expected = sorted(YearToDate.objects.values_list('employee_id', 'periods', 'gross', 'contributions', 'taxable', 'tax_withheld'))
+        self.assertEqual(rebuild_year_to_date(2025), 8)
+        self.assertEqual(sorted(YearToDate.objects.values_list('employee_id', 'periods', 'gross', 'contributions', 'taxable', 'tax_withheld')), expected)
+        summed = sum_payslips(Payslip.objects.filter(payroll_run__in=runs))
+        self.assertEqual(sorted((employee_id, *totals) for employee_id, totals in summed.items()),
+                         [(employee_id, periods, *(to_centavos(amount) for amount in amounts))
+                          for employee_id, periods, *amounts in expected])
+
+
+class ThirteenthMonthTest(TestCase):
+    period_start = date(2025, 1, 1)
+    period_end = date(2025, 12, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        from .models import PayrollRun
+
+        create_contribution_tables()
+        cls.user = User.objects.create(username='thirteenth')
+        cls.grade = SalaryGrade.objects.create(code='13M', base_pay=Decimal('36500.00'))
+        cls.veteran, cls.new_hire, cls.future_hire = [
+            Employee.objects.create(
+                user=User.objects.create(username=f'thirteenth-{name}'), employee_no=f'13M-{name}',
+                first_name='Test', last_name=name, department='HR', position='Staff',
+                salary_grade=cls.grade, date_hired=hired,
+            )
+            for name, hired in (('veteran', date(2019, 5, 1)), ('new', date(2025, 10, 1)), ('future', date(2026, 1, 5)))
+        ]
+        # January to June already paid
+        paid = PayrollRun.objects.create(period_start=date(2025, 1, 1), period_end=date(2025, 6, 30), status='PAID', created_by=cls.user)
+        Payslip.objects.create(payroll_run=paid, employee=cls.veteran, gross_pay=Decimal('219000.00'), net_pay=Decimal('200000.00'))
+
+    def test_aggregated_and_pro_rated(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .thirteenth_month import ThirteenthMonthCalculator
+
+        def compute(employees=None):
+            return dict(ThirteenthMonthCalculator(self.period_start, self.period_end, employees).compute())
+
+        # One aggregate for the basic pay, whatever the number of employees (after the rate tables are cached)
+        compute()
+        with CaptureQueriesContext(connection) as queries:
+            results = compute()
+        with CaptureQueriesContext(connection) as single:
+            compute(Employee.objects.filter(pk=self.veteran.pk))
+        self.assertEqual(len(queries), len(single))
+        self.assertNotIn(self.future_hire, results)
+
+        # Paid basic plus base pay for Jul 1 - Dec 31 (184 days), over 12
+        veteran = results[self.veteran]
+        self.assertEqual(veteran['thirteenth_month_pay'], from_centavos((21900000 + 3650000 * 12 * 184 // 365) // 12))
+        self.assertEqual(veteran['tax'], Decimal('0.00'))
+        self.assertEqual(veteran['net_pay'], veteran['thirteenth_month_pay'])
+        # Hired Oct 1 with nothing paid yet: 92 days of base pay
+        self.assertEqual(results[self.new_hire]['thirteenth_month_pay'], from_centavos(3650000 * 12 * 92 // 365 // 12))
+
+    def test_run_through_job_and_posting(self):
+        from .jobs import claim_next_job, enqueue_payroll_job, run_job
+        from .models import PayrollRun, YearToDate
+        from .workflow import transition_run
+
+        run = PayrollRun.objects.create(
+            period_start=self.period_start, period_end=self.period_end, run_type='THIRTEENTH_MONTH',
+            status='APPROVED', created_by=self.user,
+        )
+        enqueue_payroll_job(run, 'CREATE', self.user)
+        job = run_job(claim_next_job(worker='test'))
+        self.assertEqual(job.status, 'DONE', job.message)
+        self.assertEqual(job.payslips_created, 2)
+        self.assertEqual(run.payslips.get(employee=self.veteran).total_earnings, run.payslips.get(employee=self.veteran).thirteenth_month_pay)
+
+        # Recalculating replaces the payslips rather than diffing fingerprints
+        enqueue_payroll_job(run, 'RECALCULATE', self.user)
+        self.assertEqual(run_job(claim_next_job(worker='test')).payslips_created, 2)
+        self.assertEqual(run.payslips.count(), 2)
+
+        transition_run(run, 'PAID', self.user)
+        ytd = YearToDate.objects.get(employee=self.new_hire, year=2025)
+        # Not a pay period, and tax-exempt below the ceiling
+        self.assertEqual(ytd.periods, 0)
+        self.assertEqual(ytd.gross, run.payslips.get(employee=self.new_hire).thirteenth_month_pay)
+        self.assertEqual(ytd.taxable, Decimal('0.00'))
+
+    def test_tax_over_the_projected_year(self):
+        from contributions.rates import get_rates
+        from .batch import BatchPayrollCalculator
+        from .models import PayrollRun, YearToDate
+        from .money import centavo_rates
+        from .thirteenth_month import ThirteenthMonthCalculator
+        from .workflow import transition_runs
+
+        # Eleven months of taxable income fall in the 25% bracket, the whole year crosses into 30%
+        employee = Employee.objects.create(
+            user=User.objects.create(username='thirteenth-earner'), employee_no='13M-earner',
+            first_name='Test', last_name='earner', department='HR', position='Staff',
+            salary_grade=SalaryGrade.objects.create(code='13M-HIGH', base_pay=Decimal('172000.00')),
+            date_hired=date(2019, 5, 1),
+        )
+        employees = Employee.objects.filter(pk=employee.pk)
+
+        def post(period_start, period_end, calculator, run_type='REGULAR'):
+            run = PayrollRun.objects.create(period_start=period_start, period_end=period_end, run_type=run_type,
+                                            status='APPROVED', created_by=self.user)
+            calculator(period_start, period_end, employees).create_payslips(run)
+            transition_runs([run], 'PAID', self.user)
+            return run.payslips.get()
+
+        payslips = [
+            post(date(2025, month, 1), date(2025, month + 1, 1) - timedelta(days=1), BatchPayrollCalculator)
+            for month in range(1, 12)
+        ]
+        withholding_tax = centavo_rates(get_rates(as_of=self.period_end)).withholding_tax
+        taxable_so_far = YearToDate.objects.get(employee=employee, year=2025).taxable
+        thirteenth = post(self.period_start, self.period_end, ThirteenthMonthCalculator, 'THIRTEENTH_MONTH')
+        excess = to_centavos(thirteenth.thirteenth_month_pay) - 9000000
+        self.assertGreater(excess, 0)
+        payslips.append(post(date(2025, 12, 1), self.period_end, BatchPayrollCalculator))
+
+        # The year's withholding adds up to the tax on the year's taxable income
+        ytd = YearToDate.objects.get(employee=employee, year=2025)
+        withheld = sum(to_centavos(payslip.tax) for payslip in payslips) + to_centavos(thirteenth.tax)
+        self.assertEqual(withheld, withholding_tax(to_centavos(ytd.taxable)))
+        # and the 13th month carried its marginal tax at the year-end rate, not at the rate so far,
+        # so December is not left to catch up on it
+        regular = to_centavos(ytd.taxable) - excess
+        exact = withholding_tax(regular + excess) - withholding_tax(regular)
+        marginal_so_far = withholding_tax(to_centavos(taxable_so_far) + excess) - withholding_tax(to_centavos(taxable_so_far))
+        tax = to_centavos(thirteenth.tax)
+        self.assertLess(abs(tax - exact), exact // 50)
+        self.assertLess(abs(tax - exact), exact - marginal_so_far)
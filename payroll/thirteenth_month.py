@@ -0,0 +1,122 @@
+"""
+13th-month pay
+A 13th-month run pays each employee a twelfth of their basic pay for the
+run's period (normally the calendar year). The basic pay already paid
+comes from one grouped aggregate over the payslips of paid regular runs.
+The rest of the period, from the later of the last paid period and the
+hire date, is projected at the employee's base pay, so new hires are
+pro-rated. Pay above THIRTEENTH_MONTH_EXEMPTION is taxed at the marginal
+rate on top of the employee's taxable income for the whole year: the
+posted taxable income so far, and the rest of the year projected at the
+same daily rate (or at base pay when nothing is posted yet), as the
+regular runs' cumulative annualization projects it. The payslips are
+bulk-created like a regular run's and go through the same workflow,
+exports and PDFs.
+"""
+from datetime import timedelta
+from django.db.models import Max, Q, Sum
+from contributions.rates import get_rates
+from employees.models import Employee
+from .batch import BatchPayrollCalculator
+from .models import Payslip
+from .money import to_centavos, from_centavos, div_round, centavo_rates
+from .ytd import year_to_date, THIRTEENTH_MONTH_EXEMPTION, EMPTY_YTD
+
+
+class ThirteenthMonthCalculator(BatchPayrollCalculator):
+    """Compute 13th-month payslips for many employees with a fixed number of queries"""
+
+    def __init__(self, period_start, period_end, employees=None, metrics=None):
+        if employees is None:
+            employees = Employee.objects.filter(active=True)
+        # Nobody hired after the period is owed anything for it
+        employees = employees.filter(Q(date_hired__isnull=True) | Q(date_hired__lte=period_end))
+        super().__init__(period_start, period_end, employees, metrics=metrics)
+
+    def load(self):
+        """Load the basic pay already paid, year-to-date totals and tax table in bulk"""
+        employee_ids = self.employees.values('pk')
+        metrics = self.metrics
+
+        with metrics.phase('load_basic_pay'):
+            # {employee id: (basic pay paid in the period in centavos, last paid period end)}
+            self.basic_pay = {
+                row['employee_id']: (to_centavos(row['basic']), row['paid_through'])
+                for row in Payslip.objects.filter(
+                    employee__in=employee_ids,
+                    payroll_run__status='PAID',
+                    payroll_run__run_type='REGULAR',
+                    payroll_run__period_end__gte=self.period_start,
+                    payroll_run__period_end__lte=self.period_end,
+                ).values('employee_id').annotate(basic=Sum('gross_pay'), paid_through=Max('payroll_run__period_end'))
+            }
+
+        with metrics.phase('load_ytd'):
+            self.year_to_date = year_to_date(employee_ids, self.period_end.year)
+
+        with metrics.phase('load_rates'):
+            self.rates = get_rates(as_of=self.period_end)
+
+    def projected_basic_pay(self, employee, paid_through):
+        """Base pay for the days of the period after paid_through and on or after the hire date (centavos)"""
+        start = self.period_start
+        if paid_through is not None:
+            start = max(start, paid_through + timedelta(days=1))
+        if employee.date_hired is not None:
+            start = max(start, employee.date_hired)
+        days = (self.period_end - start).days + 1
+        if days <= 0:
+            return 0
+        period_days = (self.period_end - self.period_start).days + 1
+        # A year's base pay spread over the days of the year (or of a longer period)
+        return div_round(to_centavos(employee.salary_grade.base_pay) * 12 * days, max(period_days, 365))
+
+    def projected_taxable(self, employee, ytd, paid_through):
+        """Regular taxable income for the whole period: posted so far plus the rest projected (centavos)"""
+        if not ytd.periods or paid_through is None:
+            # Nothing posted to project from
+            return ytd.taxable + self.projected_basic_pay(employee, paid_through)
+        start = self.period_start
+        if employee.date_hired is not None:
+            start = max(start, employee.date_hired)
+        paid_days = (paid_through - start).days + 1
+        remaining_days = (self.period_end - paid_through).days
+        if paid_days <= 0 or remaining_days <= 0:
+            return ytd.taxable
+        return ytd.taxable + div_round(ytd.taxable * remaining_days, paid_days)
+
+    def compute_payslip(self, employee):
+        paid, paid_through = self.basic_pay.get(employee.pk, (0, None))
+        amount = div_round(paid + self.projected_basic_pay(employee, paid_through), 12)
+
+        annual_taxable = self.projected_taxable(employee, self.year_to_date.get(employee.pk, EMPTY_YTD), paid_through)
+        excess = max(amount - THIRTEENTH_MONTH_EXEMPTION, 0)
+        withholding_tax = centavo_rates(self.rates).withholding_tax
+        tax = withholding_tax(annual_taxable + excess) - withholding_tax(annual_taxable)
+
+        return {
+            'gross_pay': from_centavos(0),
+            'thirteenth_month_pay': from_centavos(amount),
+            'tax': from_centavos(tax),
+            'net_pay': from_centavos(amount - tax),
+        }
+
+    def compute(self):
+        """Yield (employee, payroll_data) for every employee owed 13th-month pay"""
+        self.load()
+        with self.metrics.phase('load_employees'):
+            employees = list(self.employees)
+
+        for employee in employees:
+            try:
+                with self.metrics.employee():
+                    payroll_data = self.compute_payslip(employee)
+            except Exception as e:
+                self.errors.append((employee, str(e)))
+                continue
+            if payroll_data['thirteenth_month_pay'] > 0:
+                yield employee, payroll_data
+
+    def fingerprints(self):
+        # Recalculating a 13th-month run always recomputes every payslip
+        return {}
@@ -5,7 +5,9 @@ urlpatterns = [
     # Staff/HR views
     path('runs/', views.run_list, name='payroll_run_list'),
     path('runs/create/', views.run_create, name='payroll_run_create'),
+    path('runs/status/', views.bulk_update_payroll_status, name='bulk_update_payroll_status'),
     path('runs/<int:run_id>/payslips/', views.run_payslips, name='payroll_run_payslips'),
+    path('runs/<int:run_id>/progress/', views.run_job_progress, name='payroll_run_progress'),
     path('runs/<int:run_id>/edit/', views.edit_payroll_run, name='edit_payroll_run'),
     path('runs/<int:run_id>/recalculate/', views.recalculate_payslips, name='recalculate_payslips'),
     path('runs/<int:run_id>/status/', views.update_payroll_status, name='update_payroll_status'),
@@ -13,6 +15,7 @@ urlpatterns = [
     path('runs/<int:run_id>/export-excel/', views.export_payroll_excel, name='export_payroll_excel'),
     path('runs/<int:run_id>/generate-bank-file/', views.generate_bank_transfer_file, name='generate_bank_file'),
     path('runs/<int:run_id>/mark-deposited/', views.mark_salaries_deposited, name='mark_salaries_deposited'),
+    path('simulate-rates/', views.rate_simulation, name='payroll_rate_simulation'),
     
     # Employee self-service
     path('my/payslips/', views.my_payslips, name='my_payslips'),
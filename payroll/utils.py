@@ -3,6 +3,7 @@ import csv
 import io
 from datetime import datetime
 from django.http import HttpResponse
+from .money import RATE_SCALE, to_centavos, to_rate_units, from_centavos, div_round
 
 
 SSS_RATE = Decimal('0.045')  # placeholder employee share
@@ -13,18 +14,19 @@ TAX_RATE = Decimal('0.10')  # placeholder withholding
 
 def compute_contributions(gross: Decimal) -> dict:
     """Compute government contributions and taxes"""
-    sss = (gross * SSS_RATE).quantize(Decimal('0.01'))
-    philhealth = (gross * (PHILHEALTH_RATE / 2)).quantize(Decimal('0.01'))
-    pagibig = (gross * PAGIBIG_RATE).quantize(Decimal('0.01'))
+    gross = to_centavos(gross)
+    sss = div_round(gross * to_rate_units(SSS_RATE), RATE_SCALE)
+    philhealth = div_round(gross * to_rate_units(PHILHEALTH_RATE), 2 * RATE_SCALE)
+    pagibig = div_round(gross * to_rate_units(PAGIBIG_RATE), RATE_SCALE)
 
     taxable = gross - sss - philhealth - pagibig
-    tax = (taxable * TAX_RATE).quantize(Decimal('0.01')) if taxable > 0 else Decimal('0.00')
+    tax = div_round(taxable * to_rate_units(TAX_RATE), RATE_SCALE) if taxable > 0 else 0
     
     return {
-        'sss': sss,
-        'philhealth': philhealth,
-        'pagibig': pagibig,
-        'tax': tax,
+        'sss': from_centavos(sss),
+        'philhealth': from_centavos(philhealth),
+        'pagibig': from_centavos(pagibig),
+        'tax': from_centavos(tax),
     }
 
 def compute_employee_deductions(employee):
@@ -0,0 +1,315 @@
+"""
+NumPy-vectorized payroll computation
+Columnar version of PayrollCalculator for large runs and simulations;
+payroll_engine computes runs with it when PAYROLL_VECTORIZED is set.
+
+All money is carried as int64 centavos and rounded with the same rules as
+payroll.money, so results match PayrollCalculator.compute_payslip to the
+centavo.
+"""
+from decimal import Decimal
+import numpy as np
+from contributions.rates import get_rates, TAX_EXEMPT_CEILING
+from attendance.summaries import period_totals
+from attendance.workdays import work_calendar
+from .batch import BatchPayrollCalculator
+from .services import PayrollCalculator
+from . import money
+from .money import RATE_SCALE, to_centavos, to_rate_units, from_centavos
+from .ytd import year_to_date, periods_per_year
+
+
+# Annual tax and taxable income to date never exceed the projected annual income, so their
+# product fits in int64 while that is at most this many centavos (about 30 million pesos)
+MAX_INT64_PROJECTED = 3_000_000_000
+
+
+def div_round(numerator, denominator):
+    """Integer division rounded half-even, element-wise (array form of money.div_round)"""
+    quotient, remainder = np.divmod(numerator, denominator)
+    twice = remainder * 2
+    round_up = (twice > denominator) | ((twice == denominator) & (quotient % 2 == 1))
+    return quotient + round_up
+
+
+class RateArrays:
+    """ContributionRates flattened into integer arrays for vectorized lookups"""
+
+    def __init__(self, rates):
+        brackets = rates.sss_brackets
+        self.sss_min = np.array([to_centavos(b.min_salary) for b in brackets], dtype=np.int64)
+        self.sss_max = np.array([to_centavos(b.max_salary) for b in brackets], dtype=np.int64)
+        self.sss_employee = np.array([to_centavos(b.employee) for b in brackets], dtype=np.int64)
+        self.sss_employer = np.array([to_centavos(b.employer) for b in brackets], dtype=np.int64)
+        self.sss_top = brackets.index(rates.sss_top) if brackets else None
+
+        self.philhealth = rates.philhealth
+        if self.philhealth:
+            self.philhealth_rate = to_rate_units(self.philhealth.premium_rate)
+            self.philhealth_cap = to_centavos(self.philhealth.max_contribution) if self.philhealth.max_contribution else None
+
+        self.pagibig = rates.pagibig
+        if self.pagibig:
+            self.pagibig_employee_rate = to_rate_units(self.pagibig.employee_rate)
+            self.pagibig_employer_rate = to_rate_units(self.pagibig.employer_rate)
+            self.pagibig_employee_cap = to_centavos(self.pagibig.max_employee) if self.pagibig.max_employee else None
+            self.pagibig_employer_cap = to_centavos(self.pagibig.max_employer) if self.pagibig.max_employer else None
+
+        schedule = rates.withholding_tax
+        self.tax_min = np.array([to_centavos(b) for b in schedule.breakpoints], dtype=np.int64)
+        self.tax_base = np.array([to_centavos(s[0]) for s in schedule.segments], dtype=np.int64)
+        self.tax_rate = np.array([to_rate_units(s[1]) for s in schedule.segments], dtype=np.int64)
+
+    def sss(self, salary):
+        """Employee and employer SSS shares for an array of salaries"""
+        if not len(self.sss_min):
+            zeros = np.zeros_like(salary)
+            return zeros, zeros
+        i = np.searchsorted(self.sss_min, salary, side='right') - 1
+        inside = i >= 0
+        i = np.where(inside, i, 0)
+        inside &= salary <= self.sss_max[i]
+        i = np.where(inside, i, self.sss_top)
+        return self.sss_employee[i], self.sss_employer[i]
+
+    def philhealth_contribution(self, salary):
+        """Employee and employer PhilHealth shares (split 50-50)"""
+        if not self.philhealth:
+            zeros = np.zeros_like(salary)
+            return zeros, zeros
+        contribution = salary * self.philhealth_rate
+        if self.philhealth_cap is not None:
+            contribution = np.minimum(contribution, self.philhealth_cap * RATE_SCALE)
+        share = div_round(contribution, 2 * RATE_SCALE)
+        return share, share
+
+    def pagibig_contribution(self, salary):
+        """Employee and employer Pag-IBIG shares"""
+        if not self.pagibig:
+            zeros = np.zeros_like(salary)
+            return zeros, zeros
+        employee = salary * self.pagibig_employee_rate
+        if self.pagibig_employee_cap is not None:
+            employee = np.minimum(employee, self.pagibig_employee_cap * RATE_SCALE)
+        employer = salary * self.pagibig_employer_rate
+        if self.pagibig_employer_cap is not None:
+            employer = np.minimum(employer, self.pagibig_employer_cap * RATE_SCALE)
+        return div_round(employee, RATE_SCALE), div_round(employer, RATE_SCALE)
+
+    def withholding_tax(self, annual_taxable):
+        """Annual withholding tax for an array of annual taxable incomes"""
+        tax = np.zeros_like(annual_taxable)
+        if not len(self.tax_min):
+            return tax
+        i = np.searchsorted(self.tax_min, annual_taxable, side='right') - 1
+        taxable = (annual_taxable > to_centavos(TAX_EXEMPT_CEILING)) & (i >= 0)
+        i = np.where(taxable, i, 0)
+        excess = (annual_taxable - self.tax_min[i]) * self.tax_rate[i]
+        annual_tax = div_round(self.tax_base[i] * RATE_SCALE + excess, RATE_SCALE)
+        return np.where(taxable, annual_tax, tax)
+
+    def cumulative_tax(self, taxable, per_year, ytd_periods=0, ytd_taxable=0, ytd_tax=0):
+        """Array form of ytd.cumulative_tax; the year-to-date totals are arrays or 0"""
+        taxable_to_date = ytd_taxable + taxable
+        remaining = np.maximum(per_year - ytd_periods - 1, 0)
+        projected = taxable_to_date + taxable * remaining
+        annual_tax = self.withholding_tax(projected)
+        if (projected > MAX_INT64_PROJECTED).any():
+            # Multiply as Python ints rather than overflow; the quotient fits in int64 again
+            due = np.array([
+                money.div_round(int(tax) * int(to_date), max(int(annual), 1))
+                for tax, to_date, annual in np.broadcast(annual_tax, taxable_to_date, projected)
+            ], dtype=np.int64).reshape(projected.shape)
+        else:
+            due = div_round(annual_tax * taxable_to_date, np.maximum(projected, 1))
+        return np.where(projected > 0, np.maximum(due - ytd_tax, 0), 0)
+
+    def statutory_deductions(self, total_earnings, per_year=12, ytd=None):
+        """
+        Contributions (both shares) and withholding tax for an array of earnings.
+        per_year is the number of pay periods in a year; ytd, if given, is a
+        dict of 'periods', 'taxable' and 'tax_withheld' arrays for cumulative
+        annualization.
+        """
+        sss, sss_employer = self.sss(total_earnings)
+        philhealth, philhealth_employer = self.philhealth_contribution(total_earnings)
+        pagibig, pagibig_employer = self.pagibig_contribution(total_earnings)
+        contributions = sss + philhealth + pagibig
+
+        # Tax after mandatory contributions, annualized over the year to date
+        ytd = ytd or {}
+        tax = self.cumulative_tax(
+            np.maximum(total_earnings - contributions, 0),
+            per_year,
+            ytd.get('periods', 0),
+            ytd.get('taxable', 0),
+            ytd.get('tax_withheld', 0),
+        )
+
+        return {
+            'sss': sss,
+            'philhealth': philhealth,
+            'pagibig': pagibig,
+            'tax': tax,
+            'sss_employer': sss_employer,
+            'philhealth_employer': philhealth_employer,
+            'pagibig_employer': pagibig_employer,
+        }
+
+
+class VectorizedPayrollCalculator(BatchPayrollCalculator):
+    """Compute a whole workforce's payslips as NumPy column operations"""
+
+    def load(self):
+        """Load run inputs into flat arrays indexed by employee position"""
+        self.employee_list = list(self.employees)
+        index = {emp.pk: i for i, emp in enumerate(self.employee_list)}
+        n = len(self.employee_list)
+        employee_ids = self.employees.values('pk')
+
+        self.base_pay = np.array([to_centavos(emp.salary_grade.base_pay) for emp in self.employee_list], dtype=np.int64)
+
+        # Attendance: days logged, overtime, night and late seconds and days present by kind of day per employee
+        self.calendar = work_calendar(self.period_start, self.period_end)
+        self.days_worked = np.zeros(n, dtype=np.int64)
+        self.overtime_seconds = np.zeros(n, dtype=np.int64)
+        self.night_seconds = np.zeros(n, dtype=np.int64)
+        self.late_seconds = np.zeros(n, dtype=np.int64)
+        self.workdays_present = np.zeros(n, dtype=np.int64)
+        self.regular_holidays_worked = np.zeros(n, dtype=np.int64)
+        self.special_holidays_worked = np.zeros(n, dtype=np.int64)
+        for employee_id, totals in period_totals(employee_ids, self.period_start, self.period_end, self.calendar).items():
+            i = index[employee_id]
+            self.days_worked[i] = totals.days
+            self.overtime_seconds[i] = totals.overtime_seconds
+            self.night_seconds[i] = totals.night_seconds
+            self.late_seconds[i] = totals.late_seconds
+            self.workdays_present[i] = totals.workdays_present
+            self.regular_holidays_worked[i] = totals.regular_holidays_worked
+            self.special_holidays_worked[i] = totals.special_holidays_worked
+
+        # Working days from the later of the period start and the hire date (one lookup per distinct start)
+        starts = [
+            emp.date_hired if emp.date_hired and emp.date_hired > self.period_start else self.period_start
+            for emp in self.employee_list
+        ]
+        scheduled = {start: self.calendar.working_days(start, self.period_end) for start in set(starts)}
+        self.scheduled_days = np.array([scheduled[start] for start in starts], dtype=np.int64)
+
+        # Loans: deduct monthly payment, but not more than remaining balance
+        self.loan_deductions = np.zeros(n, dtype=np.int64)
+        self.posting_effects = [[] for _ in range(n)]
+        loans = [loan for employee_loans in self.load_loans(employee_ids).values() for loan in employee_loans]
+        loans.sort(key=lambda loan: loan.pk)
+        if loans:
+            repayments = np.minimum(
+                np.array([to_centavos(loan.monthly_deduction) for loan in loans], dtype=np.int64),
+                np.array([to_centavos(loan.remaining_balance) for loan in loans], dtype=np.int64),
+            )
+            np.add.at(
+                self.loan_deductions,
+                np.array([index[loan.employee_id] for loan in loans], dtype=np.int64),
+                repayments,
+            )
+            for loan, amount in zip(loans, repayments.tolist()):
+                self.posting_effects[index[loan.employee_id]].append({
+                    'type': 'loan_repayment',
+                    'loan_id': loan.pk,
+                    'amount': str(from_centavos(amount)),
+                })
+
+        self.other_deductions = np.zeros(n, dtype=np.int64)
+        deductions = [deduction for employee_deductions in self.load_deductions(employee_ids).values()
+                      for deduction in employee_deductions]
+        deductions.sort(key=lambda deduction: deduction.pk)
+        if deductions:
+            np.add.at(
+                self.other_deductions,
+                np.array([index[deduction.employee_id] for deduction in deductions], dtype=np.int64),
+                np.array([to_centavos(deduction.amount) for deduction in deductions], dtype=np.int64),
+            )
+        # One-time deductions are marked inactive when the run is posted
+        for deduction in deductions:
+            if not deduction.is_recurring:
+                self.posting_effects[index[deduction.employee_id]].append({
+                    'type': 'deactivate_deduction',
+                    'deduction_id': deduction.pk,
+                })
+
+        # Posted totals for the year before this period, for cumulative tax annualization
+        self.ytd = {field: np.zeros(n, dtype=np.int64) for field in ('periods', 'taxable', 'tax_withheld')}
+        for employee_id, totals in year_to_date(employee_ids, self.period_end.year, before=self.period_start).items():
+            self.ytd['periods'][index[employee_id]] = totals.periods
+            self.ytd['taxable'][index[employee_id]] = totals.taxable
+            self.ytd['tax_withheld'][index[employee_id]] = totals.tax_withheld
+
+        self.rates = get_rates(as_of=self.period_end)
+        self.rate_arrays = RateArrays(self.rates)
+
+    def compute_columns(self):
+        """Compute every payslip field as an int64 centavo array"""
+        working_days = int(PayrollCalculator.WORKING_DAYS_PER_MONTH)
+        standard = int(PayrollCalculator.STANDARD_HOURS_PER_DAY)
+        rates = self.rate_arrays
+
+        # If no attendance records, pro-rate on the paid days in the period
+        paid_days = self.calendar.paid_days(self.period_start, self.period_end)
+        days = np.where(self.days_worked == 0, paid_days, self.days_worked)
+        gross_pay = div_round(self.base_pay * days, working_days)
+
+        # OT rate is 1.25x for regular OT
+        overtime_pay = div_round(self.overtime_seconds * self.base_pay * 125, 100 * working_days * standard * 3600)
+
+        # Holiday premiums on the daily rate
+        premium_days = (self.regular_holidays_worked * PayrollCalculator.REGULAR_HOLIDAY_PREMIUM
+                        + self.special_holidays_worked * PayrollCalculator.SPECIAL_HOLIDAY_PREMIUM)
+        holiday_pay = div_round(self.base_pay * premium_days, working_days * 100)
+        # Night differential on the hourly rate
+        night_differential = div_round(
+            self.night_seconds * self.base_pay * PayrollCalculator.NIGHT_DIFFERENTIAL_PREMIUM,
+            100 * working_days * standard * 3600,
+        )
+        # Hundredths of an hour late
+        tardiness = div_round(self.late_seconds * 100, 3600)
+        absences = np.where(self.days_worked == 0, 0, np.maximum(self.scheduled_days - self.workdays_present, 0))
+
+        total_earnings = gross_pay + overtime_pay + holiday_pay + night_differential
+        statutory = rates.statutory_deductions(
+            total_earnings, periods_per_year(self.period_start, self.period_end), self.ytd
+        )
+
+        total_deductions = (
+            statutory['sss'] + statutory['philhealth'] + statutory['pagibig'] + statutory['tax'] +
+            self.loan_deductions + self.other_deductions
+        )
+
+        return {
+            'gross_pay': gross_pay,
+            'overtime_pay': overtime_pay,
+            'holiday_pay': holiday_pay,
+            'night_differential': night_differential,
+            'absences': absences,
+            'tardiness': tardiness,
+            'loan_deductions': self.loan_deductions,
+            'other_deductions': self.other_deductions,
+            'net_pay': total_earnings - total_deductions,
+            **statutory,
+        }
+
+    def compute(self):
+        """Yield (employee, payroll_data) with the same fields as compute_payslip"""
+        self.load()
+        columns = self.compute_columns()
+        fields = ('gross_pay', 'overtime_pay', 'holiday_pay', 'night_differential', 'sss', 'philhealth', 'pagibig', 'tax',
+                  'loan_deductions', 'other_deductions', 'net_pay')
+        rows = zip(*(columns[field].tolist() for field in fields))
+        absences = columns['absences'].tolist()
+        tardiness = columns['tardiness'].tolist()
+        for employee, row, days_absent, late, effects in zip(
+            self.employee_list, rows, absences, tardiness, self.posting_effects
+        ):
+            payroll_data = {field: from_centavos(value) for field, value in zip(fields, row)}
+            payroll_data['absences'] = days_absent
+            payroll_data['tardiness_hours'] = Decimal(late).scaleb(-2)
+            payroll_data['posting_effects'] = effects
+            yield employee, payroll_data
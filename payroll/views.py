@@ -1,19 +1,32 @@
+import uuid
 from datetime import date
 from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.core.files.base import ContentFile
 from django import forms
-from accounts.decorators import group_required
-from .models import PayrollRun, Payslip, Loan, OtherDeduction
-from .services import PayrollCalculator, update_loan_balances
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from accounts.decorators import group_required, query_budget
+from .models import PayrollRun, Payslip, Loan, OtherDeduction, YearToDate
+from .jobs import enqueue_payroll_job, run_engine
+from .metrics import new_metrics
+from .workflow import TransitionError, busy_runs, transition_run, transition_runs
+from .simulation import candidate_rates, simulate_rates
+from contributions.rates import get_rates, SSSBracket, PhilHealthRate, PagibigRate
 from .pdf_generator import generate_payslip_pdf
 from .bank_export import BankFileExporter, export_to_excel
 from employees.models import Employee
 
+def new_request_key():
+    """Idempotency key for a POST form; a resubmission carries the same key"""
+    return uuid.uuid4().hex
+
 class PayrollRunForm(forms.ModelForm):
+    request_key = forms.CharField(widget=forms.HiddenInput, required=False, max_length=64)
+
     class Meta:
         model = PayrollRun
         fields = ['period_start', 'period_end']
@@ -22,10 +35,121 @@ class PayrollRunForm(forms.ModelForm):
             'period_end': forms.DateInput(attrs={'type': 'date'}),
         }
 
+class NewPayrollRunForm(PayrollRunForm):
+    """PayrollRunForm with the run type, which is fixed once the run exists"""
+    run_type = forms.ChoiceField(choices=PayrollRun.RUN_TYPE_CHOICES, initial='REGULAR', required=False)
+
+    class Meta(PayrollRunForm.Meta):
+        fields = ['run_type', 'period_start', 'period_end']
+
+    def clean_run_type(self):
+        return self.cleaned_data['run_type'] or 'REGULAR'
+
+def parse_table(text, columns, rate_columns=()):
+    """Parse one comma-separated row of numbers per line into tuples of Decimals"""
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            values = [Decimal(value.strip()) for value in line.split(',')]
+        except ArithmeticError:
+            raise forms.ValidationError(f"Line {number}: values must be numbers")
+        if len(values) != len(columns):
+            raise forms.ValidationError(f"Line {number}: expected {len(columns)} values ({', '.join(columns)})")
+        for column, value in zip(columns, values):
+            places = 4 if column in rate_columns else 2
+            if value < 0 or -value.as_tuple().exponent > places:
+                raise forms.ValidationError(f"Line {number}: {column} must be positive with at most {places} decimal places")
+        rows.append(tuple(values))
+    return rows
+
+class RateSimulationForm(forms.Form):
+    """Candidate contribution and tax tables; a blank table keeps the active one"""
+    SSS_COLUMNS = ('min salary', 'max salary', 'employee share', 'employer share', 'EC share')
+    TAX_COLUMNS = ('min annual compensation', 'base tax', 'rate on excess')
+
+    runs = forms.ModelMultipleChoiceField(
+        queryset=PayrollRun.objects.exclude(status='CANCELLED').order_by('-period_start'),
+        widget=forms.SelectMultiple(attrs={'size': 8}),
+        help_text='Past runs whose payslip earnings are re-costed',
+    )
+    sss_table = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 8}),
+        help_text='One bracket per line: ' + ', '.join(SSS_COLUMNS),
+    )
+    philhealth_rate = forms.DecimalField(required=False, max_digits=5, decimal_places=4, min_value=0)
+    philhealth_cap = forms.DecimalField(required=False, max_digits=12, decimal_places=2, min_value=0)
+    pagibig_employee_rate = forms.DecimalField(required=False, max_digits=5, decimal_places=4, min_value=0)
+    pagibig_employer_rate = forms.DecimalField(required=False, max_digits=5, decimal_places=4, min_value=0)
+    pagibig_employee_cap = forms.DecimalField(required=False, max_digits=12, decimal_places=2, min_value=0)
+    pagibig_employer_cap = forms.DecimalField(required=False, max_digits=12, decimal_places=2, min_value=0)
+    tax_table = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 7}),
+        help_text='One bracket per line: ' + ', '.join(TAX_COLUMNS),
+    )
+
+    @classmethod
+    def initial_from(cls, rates):
+        """Form values for the given compiled rates, so HR edits from the active tables"""
+        initial = {
+            'runs': PayrollRun.objects.exclude(status='CANCELLED').order_by('-period_start')[:24],
+            'sss_table': '\n'.join(
+                f"{b.min_salary}, {b.max_salary}, {b.employee}, {b.employer}, {b.ec}" for b in rates.sss_brackets
+            ),
+            'tax_table': '\n'.join(
+                f"{bound}, {base}, {rate}"
+                for bound, (base, rate) in zip(rates.withholding_tax.breakpoints, rates.withholding_tax.segments)
+            ),
+        }
+        if rates.philhealth:
+            initial['philhealth_rate'] = rates.philhealth.premium_rate
+            initial['philhealth_cap'] = rates.philhealth.max_contribution
+        if rates.pagibig:
+            initial['pagibig_employee_rate'] = rates.pagibig.employee_rate
+            initial['pagibig_employer_rate'] = rates.pagibig.employer_rate
+            initial['pagibig_employee_cap'] = rates.pagibig.max_employee
+            initial['pagibig_employer_cap'] = rates.pagibig.max_employer
+        return initial
+
+    def clean_sss_table(self):
+        rows = parse_table(self.cleaned_data['sss_table'], self.SSS_COLUMNS)
+        for number, row in enumerate(rows, start=1):
+            if row[0] > row[1]:
+                raise forms.ValidationError(f"Bracket {number}: min salary is above max salary")
+        return [SSSBracket(*row, sum(row[2:])) for row in rows] or None
+
+    def clean_tax_table(self):
+        rows = parse_table(self.cleaned_data['tax_table'], self.TAX_COLUMNS, rate_columns=('rate on excess',))
+        return rows or None
+
+    def candidate(self):
+        """ContributionRates for the submitted tables"""
+        data = self.cleaned_data
+        philhealth = pagibig = None
+        if data['philhealth_rate'] is not None:
+            philhealth = PhilHealthRate(data['philhealth_rate'], data['philhealth_cap'])
+        if data['pagibig_employee_rate'] is not None and data['pagibig_employer_rate'] is not None:
+            pagibig = PagibigRate(
+                data['pagibig_employee_rate'],
+                data['pagibig_employer_rate'],
+                data['pagibig_employee_cap'],
+                data['pagibig_employer_cap'],
+            )
+        return candidate_rates(
+            sss_brackets=data['sss_table'],
+            philhealth=philhealth,
+            pagibig=pagibig,
+            tax_brackets=data['tax_table'],
+        )
+
+@query_budget(12)
 @login_required
 @group_required('Staff')
 def run_list(request):
-    runs = PayrollRun.objects.all().order_by('-created_at')
+    runs = PayrollRun.objects.select_related('created_by').order_by('-created_at')
     
     # Calculate status counts
     review_count = runs.filter(status='REVIEW').count()
@@ -40,48 +164,80 @@ def run_list(request):
     }
     return render(request, 'payroll/run_list.html', context)
 
+@query_budget(8)
 @login_required
 @group_required('Staff')
 def run_create(request):
     """Create new payroll run with automated calculations"""
+    preview = None
     if request.method == 'POST':
-        form = PayrollRunForm(request.POST)
-        if form.is_valid():
+        form = NewPayrollRunForm(request.POST)
+        if form.is_valid() and 'preview' in request.POST:
+            # Computation has no side effects, so a sample of the run can be shown without saving anything
+            preview = preview_payroll_run(
+                form.cleaned_data['period_start'], form.cleaned_data['period_end'], form.cleaned_data['run_type']
+            )
+        elif form.is_valid():
+            request_key = form.cleaned_data['request_key'] or None
+            run = request_key and PayrollRun.objects.filter(request_key=request_key).first()
+            if run:
+                # Double-clicked or resubmitted form
+                messages.info(request, "This payroll run was already created.")
+                return redirect('payroll_run_payslips', run_id=run.id)
+
             run = form.save(commit=False)
             run.created_by = request.user
             run.status = 'DRAFT'
-            run.save()
-
-            # Calculate payslips for all active employees using new engine
-            employees = Employee.objects.filter(active=True).select_related('salary_grade')
-            payslips_created = 0
-            
-            for emp in employees:
-                try:
-                    # Use new PayrollCalculator
-                    calculator = PayrollCalculator(
-                        employee=emp,
-                        period_start=run.period_start,
-                        period_end=run.period_end
-                    )
-                    
-                    payroll_data = calculator.compute_payslip()
-                    
-                    Payslip.objects.create(
-                        payroll_run=run,
-                        employee=emp,
-                        **payroll_data
-                    )
-                    payslips_created += 1
-                except Exception as e:
-                    messages.warning(request, f"Could not calculate payroll for {emp}: {str(e)}")
+            run.request_key = request_key
+            try:
+                with transaction.atomic():
+                    run.save()
+                    # Payslips are computed by the background payroll worker
+                    enqueue_payroll_job(run, 'CREATE', request.user)
+            except IntegrityError:
+                # A concurrent submission of the same form won
+                run = PayrollRun.objects.get(request_key=request_key)
+                messages.info(request, "This payroll run was already created.")
+                return redirect('payroll_run_payslips', run_id=run.id)
             
-            messages.success(request, f"Payroll run created successfully! {payslips_created} payslips generated.")
+            messages.success(request, "Payroll run created! Payslips are being calculated in the background.")
             return redirect('payroll_run_payslips', run_id=run.id)
     else:
-        form = PayrollRunForm()
-    return render(request, 'payroll/run_create.html', {'form': form})
+        form = NewPayrollRunForm(initial={'request_key': new_request_key()})
+    return render(request, 'payroll/run_create.html', {'form': form, 'preview': preview})
 
+def preview_payroll_run(period_start, period_end, run_type='REGULAR'):
+    """
+    Compute the first PAYROLL_PREVIEW_LIMIT active employees of a run in
+    memory and return their payslip rows and totals. The request waits for
+    it, so the whole run is left to the payroll worker.
+    """
+    active = Employee.objects.filter(active=True).order_by('pk')
+    sample = list(active.values_list('pk', flat=True)[:settings.PAYROLL_PREVIEW_LIMIT])
+    engine = run_engine(
+        PayrollRun(period_start=period_start, period_end=period_end, run_type=run_type),
+        employees=Employee.objects.filter(pk__in=sample),
+    )
+    fields = ['gross_pay', 'overtime_pay', 'thirteenth_month_pay', 'sss', 'philhealth', 'pagibig', 'tax',
+              'loan_deductions', 'other_deductions', 'net_pay']
+    # 13th-month payslips only carry some of the amounts
+    zero = {field: Decimal('0.00') for field in fields}
+    rows = [
+        {'employee': employee, **zero, **payroll_data}
+        for employee, payroll_data in engine.compute()
+    ]
+    totals = {field: sum((row[field] for row in rows), Decimal('0.00')) for field in fields}
+    return {
+        'period_start': period_start,
+        'period_end': period_end,
+        'rows': rows,
+        'totals': totals,
+        'errors': engine.errors,
+        'sample_size': len(sample),
+        'employee_count': active.count() if len(sample) == settings.PAYROLL_PREVIEW_LIMIT else len(sample),
+    }
+
+@query_budget(13)
 @login_required
 @group_required('Staff')
 def run_payslips(request, run_id):
@@ -100,12 +256,44 @@ def run_payslips(request, run_id):
         total_net=Sum('net_pay')
     )
     
+    # Latest timings of each operation on the run
+    latest_metrics = {}
+    for metrics in run.metrics.all()[:20]:
+        latest_metrics.setdefault(metrics.operation, metrics)
+    
     return render(request, 'payroll/run_payslips.html', {
         'run': run, 
         'slips': slips,
-        'totals': totals
+        'totals': totals,
+        'job': run.jobs.first(),
+        'run_metrics': list(latest_metrics.values()),
+    })
+
+@query_budget(6)
+@login_required
+@group_required('Staff')
+def run_job_progress(request, run_id):
+    """JSON progress of the run's latest background computation (polled by run_payslips)"""
+    run = get_object_or_404(PayrollRun, pk=run_id)
+    job = run.jobs.first()
+    if job is None:
+        return JsonResponse({'status': None})
+    
+    return JsonResponse({
+        'status': job.status,
+        'kind': job.kind,
+        'processed': job.processed,
+        'total': job.total,
+        'percent': job.percent,
+        'eta_seconds': job.eta_seconds,
+        'payslips_created': job.payslips_created,
+        'payslips_updated': job.payslips_updated,
+        'payslips_skipped': job.payslips_skipped,
+        'errors': job.errors,
+        'message': job.message,
     })
 
+@query_budget(10)
 @login_required
 def my_payslips(request):
 
@@ -114,8 +302,11 @@ def my_payslips(request):
     except Employee.DoesNotExist:
         return render(request, 'payroll/my_payslips.html', {'slips': []})
     slips = Payslip.objects.filter(employee=emp).select_related('payroll_run').order_by('-payroll_run__created_at')
-    return render(request, 'payroll/my_payslips.html', {'slips': slips})
+    # Totals of paid payslips for the latest year, kept up to date when runs are posted
+    ytd = YearToDate.objects.filter(employee=emp).first()
+    return render(request, 'payroll/my_payslips.html', {'slips': slips, 'ytd': ytd})
 
+@query_budget(11)
 @login_required
 def my_payslip_detail(request, slip_id):
     try:
@@ -131,9 +322,12 @@ def generate_bank_transfer_file(request, run_id):
     """Generate bank transfer CSV file"""
     run = get_object_or_404(PayrollRun, pk=run_id)
     
-    exporter = BankFileExporter(run)
-    csv_content = exporter.generate_csv()
-    exporter.mark_as_generated()
+    metrics = new_metrics()
+    exporter = BankFileExporter(run, metrics=metrics)
+    with metrics.capture():
+        csv_content = exporter.generate_csv()
+        exporter.mark_as_generated()
+    metrics.save(run, 'BANK_FILE')
     
     response = HttpResponse(csv_content, content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="bank_transfer_{run.id}.csv"'
@@ -141,12 +335,11 @@ def generate_bank_transfer_file(request, run_id):
     messages.success(request, "Bank transfer file generated successfully!")
     return response
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def mark_salaries_deposited(request, run_id):
     """Step 9: Mark salaries as deposited to employee accounts"""
-    from django.utils import timezone
-    
     run = get_object_or_404(PayrollRun, pk=run_id)
     
     # Prevent duplicate processing
@@ -155,36 +348,20 @@ def mark_salaries_deposited(request, run_id):
         return redirect('payroll_run_payslips', run_id=run.id)
     
     if request.method == 'POST':
-        # Update payslips that haven't been deposited yet
-        payslips_to_update = run.payslips.filter(salary_deposited=False)
-        payslips_to_update.update(
-            salary_deposited=True,
-            deposit_date=timezone.now()
-        )
-        
-        # Update payroll run status to PAID
-        run.status = 'PAID'
-        run.paid_date = timezone.now()
-        run.save()
-        
-        # Update loan balances only for payslips that weren't previously deposited
-        for payslip in payslips_to_update:
-            if payslip.loan_deductions > 0:
-                # Find active loans for this employee
-                loans = Loan.objects.filter(employee=payslip.employee, is_active=True)
-                for loan in loans:
-                    # Deduct the payment from remaining balance
-                    loan.remaining_balance -= payslip.loan_deductions
-                    if loan.remaining_balance <= 0:
-                        loan.remaining_balance = 0
-                        loan.is_active = False
-                    loan.save()
+        try:
+            # Marks the payslips deposited and posts loan repayments and used deductions;
+            # a second submission fails the transition and deposits nothing
+            transition_run(run, 'PAID', request.user)
+        except TransitionError as e:
+            messages.error(request, str(e))
+            return redirect('payroll_run_payslips', run_id=run.id)
         
         messages.success(request, f"Payroll run marked as PAID. Salaries deposited and loan balances updated.")
         return redirect('payroll_run_payslips', run_id=run.id)
     
     return render(request, 'payroll/confirm_deposit.html', {'run': run})
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def loan_management(request):
@@ -204,6 +381,7 @@ def loan_management(request):
     }
     return render(request, 'payroll/loan_management.html', context)
 
+@query_budget(14)
 @login_required
 @group_required('Staff')
 def deduction_management(request):
@@ -230,6 +408,7 @@ def deduction_management(request):
     }
     return render(request, 'payroll/deduction_management.html', context)
 
+@query_budget(9)
 @login_required
 def my_deposit_status(request):
     """Employee view of their salary deposit status"""
@@ -278,19 +457,25 @@ def generate_all_payslip_pdfs(request, run_id):
     """Generate PDFs for all payslips in a run"""
     run = get_object_or_404(PayrollRun, pk=run_id)
     generated = 0
+    metrics = new_metrics()
     
-    for payslip in run.payslips.all():
-        if not payslip.pdf_file:
-            try:
-                pdf_buffer = generate_payslip_pdf(payslip)
-                payslip.pdf_file.save(
-                    f'payslip_{payslip.employee.employee_no}_{run.id}.pdf',
-                    ContentFile(pdf_buffer.read())
-                )
-                payslip.save()
-                generated += 1
-            except Exception as e:
-                messages.warning(request, f"Error generating PDF for {payslip.employee}: {str(e)}")
+    with metrics.capture():
+        for payslip in run.payslips.select_related('employee', 'payroll_run'):
+            if not payslip.pdf_file:
+                try:
+                    with metrics.employee():
+                        with metrics.phase('render_pdf'):
+                            pdf_buffer = generate_payslip_pdf(payslip)
+                        with metrics.phase('save_pdf'):
+                            payslip.pdf_file.save(
+                                f'payslip_{payslip.employee.employee_no}_{run.id}.pdf',
+                                ContentFile(pdf_buffer.read())
+                            )
+                            payslip.save()
+                    generated += 1
+                except Exception as e:
+                    messages.warning(request, f"Error generating PDF for {payslip.employee}: {str(e)}")
+    metrics.save(run, 'PDF')
     
     messages.success(request, f"Generated {generated} PDF payslips!")
     return redirect('payroll_run_payslips', run_id=run.id)
@@ -301,7 +486,10 @@ def export_payroll_excel(request, run_id):
     """Export payroll run to Excel"""
     run = get_object_or_404(PayrollRun, pk=run_id)
     
-    excel_buffer = export_to_excel(run)
+    metrics = new_metrics()
+    with metrics.capture():
+        excel_buffer = export_to_excel(run, metrics=metrics)
+    metrics.save(run, 'EXCEL')
     
     response = HttpResponse(
         excel_buffer.read(),
@@ -311,6 +499,7 @@ def export_payroll_excel(request, run_id):
     
     return response
 
+@query_budget(9)
 @login_required
 @group_required('Staff')
 def edit_payroll_run(request, run_id):
@@ -325,7 +514,18 @@ def edit_payroll_run(request, run_id):
     if request.method == 'POST':
         form = PayrollRunForm(request.POST, instance=run)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                # A job computing the run reads its dates once; changing them underneath it mixes two periods
+                locked = PayrollRun.objects.select_for_update().get(pk=run.pk)
+                error = None
+                if locked.status != 'DRAFT':
+                    error = "Cannot edit payroll run. Only DRAFT payroll runs can be edited."
+                elif busy_runs([run.pk]):
+                    error = "Cannot edit payroll run. A calculation for this payroll run is still in progress."
+                if error:
+                    messages.error(request, error)
+                    return redirect('payroll_run_payslips', run_id=run.id)
+                form.save()
             messages.success(request, "Payroll run dates updated! Click 'Recalculate Payslips' to update calculations.")
             return redirect('payroll_run_payslips', run_id=run.id)
     else:
@@ -333,6 +533,7 @@ def edit_payroll_run(request, run_id):
     
     return render(request, 'payroll/edit_payroll_run.html', {'form': form, 'run': run})
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def recalculate_payslips(request, run_id):
@@ -345,68 +546,79 @@ def recalculate_payslips(request, run_id):
         return redirect('payroll_run_payslips', run_id=run.id)
     
     if request.method == 'POST':
-        # Delete existing payslips
-        deleted_count = run.payslips.count()
-        run.payslips.all().delete()
-        
-        # Recalculate payslips for all active employees
-        employees = Employee.objects.filter(active=True).select_related('salary_grade')
-        payslips_created = 0
-        
-        for emp in employees:
-            try:
-                # Use PayrollCalculator with current dates
-                calculator = PayrollCalculator(
-                    employee=emp,
-                    period_start=run.period_start,
-                    period_end=run.period_end
-                )
-                
-                payroll_data = calculator.compute_payslip()
-                
-                Payslip.objects.create(
-                    payroll_run=run,
-                    employee=emp,
-                    **payroll_data
-                )
-                payslips_created += 1
-            except Exception as e:
-                messages.warning(request, f"Could not calculate payroll for {emp}: {str(e)}")
+        # Changed payslips are recomputed by the background payroll worker
+        request_key = request.POST.get('request_key', '')[:64] or None
+        job, created = enqueue_payroll_job(run, 'RECALCULATE', request.user, request_key=request_key)
         
-        messages.success(request, f"Payslips recalculated! Deleted {deleted_count} old payslips, created {payslips_created} new payslips.")
+        if created:
+            messages.success(request, "Recalculation queued. Payslips whose inputs changed will be updated once the worker finishes.")
+        elif job.request_key and job.request_key == request_key:
+            messages.info(request, "This recalculation was already queued.")
+        else:
+            messages.warning(request, "A calculation for this payroll run is already in progress.")
         return redirect('payroll_run_payslips', run_id=run.id)
     
-    return render(request, 'payroll/confirm_recalculate.html', {'run': run})
+    return render(request, 'payroll/confirm_recalculate.html', {'run': run, 'request_key': new_request_key()})
 
 @login_required
 @group_required('Staff')
 def update_payroll_status(request, run_id):
-    """Update payroll run workflow status"""
-    from django.utils import timezone
-    
+    """Update payroll run workflow status (see PayrollRun.TRANSITIONS)"""
     run = get_object_or_404(PayrollRun, pk=run_id)
     
     if request.method == 'POST':
         new_status = request.POST.get('status')
         
-        if new_status in ['REVIEW', 'APPROVED', 'PAID', 'CANCELLED']:
-            run.status = new_status
-            
-            if new_status == 'REVIEW':
-                run.reviewed_by = request.user
-                run.reviewed_at = timezone.now()
-            elif new_status == 'APPROVED':
-                run.approved_by = request.user
-                run.approved_at = timezone.now()
-            elif new_status == 'PAID':
-                run.paid_date = timezone.now()
-                # Update loan balances
-                for payslip in run.payslips.all():
-                    update_loan_balances(payslip)
-            
-            run.save()
-            messages.success(request, f"Payroll run status updated to {new_status}")
+        if new_status in dict(PayrollRun.STATUS_CHOICES):
+            try:
+                transition_run(run, new_status, request.user)
+            except TransitionError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f"Payroll run status updated to {new_status}")
         else:
             messages.error(request, "Invalid status")
     
     return redirect('payroll_run_payslips', run_id=run.id)
+
+@login_required
+@group_required('Staff')
+def bulk_update_payroll_status(request):
+    """Move the selected payroll runs to one status together"""
+    if request.method == 'POST':
+        new_status = request.POST.get('status')
+        run_ids = [run_id for run_id in request.POST.getlist('run_ids') if run_id.isdigit()]
+        
+        if new_status not in dict(PayrollRun.STATUS_CHOICES):
+            messages.error(request, "Invalid status")
+        elif not run_ids:
+            messages.error(request, "Select at least one payroll run.")
+        else:
+            runs = list(PayrollRun.objects.filter(pk__in=run_ids))
+            try:
+                outcomes = transition_runs(runs, new_status, request.user)
+            except TransitionError as e:
+                messages.error(request, str(e))
+            else:
+                moved = [run_id for run_id, error in outcomes.items() if error is None]
+                if moved:
+                    messages.success(request, f"{len(moved)} payroll run(s) updated to {new_status}: " + ", ".join(f"#{run_id}" for run_id in moved))
+                for run_id, error in outcomes.items():
+                    if error:
+                        messages.warning(request, f"Run #{run_id}: {error}")
+    
+    return redirect('payroll_run_list')
+
+@query_budget(15)
+@login_required
+@group_required('Staff')
+def rate_simulation(request):
+    """What-if costing of candidate contribution and tax tables over past runs (nothing is saved)"""
+    result = None
+    if request.method == 'POST':
+        form = RateSimulationForm(request.POST)
+        if form.is_valid():
+            result = simulate_rates(form.candidate(), list(form.cleaned_data['runs']))
+    else:
+        form = RateSimulationForm(initial=RateSimulationForm.initial_from(get_rates()))
+    return render(request, 'payroll/rate_simulation.html', {'form': form, 'result': result})
@@ -0,0 +1,98 @@
+"""
+Payroll run workflow
+PayrollRun.TRANSITIONS lists the allowed status moves. transition_runs
+locks the runs and applies a move with UPDATEs conditional on the status
+each run was read with. Of two concurrent requests for the same move only
+one succeeds, and a resubmitted form is told the run already moved
+instead of repeating the move. A run cannot change status while a
+calculation for it is queued or running. Moving to PAID marks the
+payslips deposited and posts the runs in the same transaction.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.utils import timezone
+from .models import PayrollRun, PayrollJob, Payslip
+from .posting import post_payroll_runs
+
+
+class TransitionError(Exception):
+    """The requested status move is not allowed for the run as it is now"""
+
+
+def busy_runs(run_ids):
+    """The ids among run_ids with a calculation queued or running"""
+    return set(PayrollJob.objects.filter(
+        payroll_run__in=run_ids,
+        status__in=['QUEUED', 'RUNNING']
+    ).values_list('payroll_run_id', flat=True))
+
+
+def transition_error(run, status, busy):
+    """Why run cannot move to status, or None if it can"""
+    if run.status == status:
+        return f"Payroll run is already {run.get_status_display()}."
+    if not run.can_transition(status):
+        label = dict(PayrollRun.STATUS_CHOICES).get(status, status)
+        return f"Cannot move payroll run from {run.get_status_display()} to {label}."
+    if run.pk in busy:
+        return "A calculation for this payroll run is still in progress."
+    return None
+
+
+def transition_runs(payroll_runs, status, user=None):
+    """
+    Move several runs to status together, stamping who reviewed or approved
+    them. Runs that cannot move are left as they are. The number of queries
+    does not depend on how many runs or payslips there are. Returns
+    {run id: None if it moved, else the reason it did not}.
+    """
+    with transaction.atomic():
+        runs = list(PayrollRun.objects.select_for_update().filter(
+            pk__in=[run.pk for run in payroll_runs]
+        ).order_by('pk'))
+        busy = busy_runs([run.pk for run in runs])
+
+        outcomes = {}
+        movable = defaultdict(list)
+        for run in runs:
+            outcomes[run.pk] = transition_error(run, status, busy)
+            if outcomes[run.pk] is None:
+                movable[run.status].append(run.pk)
+
+        now = timezone.now()
+        changes = {'status': status}
+        if status == 'REVIEW':
+            changes.update(reviewed_by=user, reviewed_at=now)
+        elif status == 'APPROVED':
+            changes.update(approved_by=user, approved_at=now)
+        elif status == 'PAID':
+            changes.update(paid_date=now)
+
+        moved = set()
+        for current, run_ids in movable.items():
+            # The status condition is the actual guard on databases without row locks
+            if PayrollRun.objects.filter(pk__in=run_ids, status=current).update(**changes) != len(run_ids):
+                raise TransitionError("Payroll runs were changed by someone else; reload and try again.")
+            moved.update(run_ids)
+
+        if status == 'PAID' and moved:
+            Payslip.objects.filter(payroll_run_id__in=moved, salary_deposited=False).update(
+                salary_deposited=True,
+                deposit_date=now
+            )
+            # Apply loan repayments and used deductions in bulk
+            post_payroll_runs([run for run in payroll_runs if run.pk in moved])
+
+    for run in payroll_runs:
+        if run.pk in moved:
+            for field, value in changes.items():
+                setattr(run, field, value)
+    return outcomes
+
+
+def transition_run(payroll_run, status, user=None):
+    """Move one run to status. Raises TransitionError if it cannot move."""
+    error = transition_runs([payroll_run], status, user).get(payroll_run.pk, "Payroll run no longer exists.")
+    if error:
+        raise TransitionError(error)
+    return payroll_run
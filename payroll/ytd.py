@@ -0,0 +1,196 @@
+"""
+Year-to-date payroll totals
+Each employee has one YearToDate row per year holding the earnings,
+contributions, taxable income and tax withheld of their posted payslips.
+Posting a run adds its payslips to these rows with F() expressions in the
+same transaction that marks it posted; the reports, certificates and the
+withholding tax step read them. The tax step needs the year as it stood
+before the period being computed, so year_to_date takes away the posted
+payslips of runs ending on or after it, which there are only when an
+earlier period is recalculated after later ones were posted.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Payslip, YearToDate
+from .money import to_centavos, from_centavos, div_round
+
+
+BULK_BATCH_SIZE = 500
+
+AMOUNT_FIELDS = ('gross', 'contributions', 'taxable', 'tax_withheld')
+
+# 13th-month pay up to this much (centavos) is not taxable
+THIRTEENTH_MONTH_EXEMPTION = 9000000
+
+# The payslips of posted runs, the only ones year-to-date totals count
+POSTED = Q(payroll_run__posted_at__isnull=False)
+
+# periods is a payslip count, the amounts are centavos
+YtdTotals = namedtuple('YtdTotals', 'periods gross contributions taxable tax_withheld')
+EMPTY_YTD = YtdTotals(0, 0, 0, 0, 0)
+
+
+def periods_per_year(period_start, period_end):
+    """Pay periods in a year of periods this long: weekly, semi-monthly or monthly"""
+    days = (period_end - period_start).days + 1
+    if days <= 7:
+        return 52
+    if days <= 16:
+        return 24
+    return 12
+
+
+def cumulative_tax(withholding_tax, taxable, ytd, per_year):
+    """
+    Withholding tax for one period by cumulative annualization (centavos).
+    The rest of the year is projected at this period's taxable income; the
+    tax due so far is the projected annual tax in proportion to the income so
+    far, less what was already withheld. withholding_tax maps annual taxable
+    income to annual tax.
+    """
+    taxable_to_date = ytd.taxable + taxable
+    remaining = max(per_year - ytd.periods - 1, 0)
+    projected = taxable_to_date + taxable * remaining
+    if projected <= 0:
+        return 0
+    due = div_round(withholding_tax(projected) * taxable_to_date, projected)
+    return max(due - ytd.tax_withheld, 0)
+
+
+def year_to_date(employee_ids, year, before=None):
+    """
+    Map employee id -> YtdTotals of the employees' posted payslips from runs
+    ending in the year, and before the date before if given, 13th-month runs
+    aside (employee_ids may be a queryset). Read from the YearToDate rows.
+    """
+    totals = {
+        employee_id: [periods, *(to_centavos(amount) for amount in amounts)]
+        for employee_id, periods, *amounts in YearToDate.objects.filter(
+            employee__in=employee_ids, year=year
+        ).values_list('employee_id', 'periods', *AMOUNT_FIELDS)
+    }
+    if before is not None:
+        # A 13th-month run covers the year and counts for every period of it once posted
+        later = Payslip.objects.filter(
+            POSTED,
+            employee__in=employee_ids,
+            payroll_run__period_end__year=year,
+            payroll_run__period_end__gte=before,
+        ).exclude(payroll_run__run_type='THIRTEENTH_MONTH')
+        for employee_id, later_totals in sum_payslips(later).items():
+            totals[employee_id] = [total - value for total, value in zip(totals[employee_id], later_totals)]
+    return {employee_id: YtdTotals(*row) for employee_id, row in totals.items()}
+
+
+def sum_payslips(payslips):
+    """
+    Map employee id -> YtdTotals of the payslips, added up in one grouped
+    query as in payslip_totals
+    """
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=money)
+    earnings = F('gross_pay') + F('overtime_pay') + F('holiday_pay') + F('night_differential') + F('allowances')
+    contributions = F('sss') + F('philhealth') + F('pagibig')
+    exemption = Value(from_centavos(THIRTEENTH_MONTH_EXEMPTION), output_field=money)
+
+    rows = payslips.order_by().values('employee_id').annotate(
+        periods=Count('pk', filter=~Q(payroll_run__run_type='THIRTEENTH_MONTH')),
+        gross=Sum(earnings + F('thirteenth_month_pay'), output_field=money),
+        contributions=Sum(contributions, output_field=money),
+        taxable=Sum(
+            Greatest(earnings - contributions, zero) + Greatest(F('thirteenth_month_pay') - exemption, zero),
+            output_field=money,
+        ),
+        tax_withheld=Sum('tax', output_field=money),
+    ).values_list('employee_id', 'periods', *AMOUNT_FIELDS)
+    return {
+        employee_id: YtdTotals(periods, *(to_centavos(amount) for amount in amounts))
+        for employee_id, periods, *amounts in rows
+    }
+
+
+def payslip_totals(payslips):
+    """
+    Add up payslips into {(employee id, year): [periods, gross, contributions,
+    taxable, tax withheld]} in centavos, by the year their run's period ends in.
+    13th-month payslips are not pay periods, and only their pay above
+    THIRTEENTH_MONTH_EXEMPTION is taxable.
+    """
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for employee_id, period_end, run_type, *amounts in payslips.values_list(
+        'employee_id', 'payroll_run__period_end', 'payroll_run__run_type',
+        'gross_pay', 'overtime_pay', 'holiday_pay', 'night_differential', 'allowances',
+        'thirteenth_month_pay', 'sss', 'philhealth', 'pagibig', 'tax',
+    ):
+        *earnings, thirteenth_month, sss, philhealth, pagibig, tax = [to_centavos(amount) for amount in amounts]
+        earnings = sum(earnings)
+        contributions = sss + philhealth + pagibig
+        row = totals[employee_id, period_end.year]
+        if run_type != 'THIRTEENTH_MONTH':
+            row[0] += 1
+        row[1] += earnings + thirteenth_month
+        row[2] += contributions
+        row[3] += max(earnings - contributions, 0) + max(thirteenth_month - THIRTEENTH_MONTH_EXEMPTION, 0)
+        row[4] += tax
+    return totals
+
+
+def add_to_year_to_date(totals):
+    """Add payslip_totals to the YearToDate rows in bulk, creating the missing ones"""
+    if not totals:
+        return
+    YearToDate.objects.bulk_create(
+        [YearToDate(employee_id=employee_id, year=year) for employee_id, year in totals],
+        batch_size=BULK_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    employees_by_year = defaultdict(list)
+    for employee_id, year in totals:
+        employees_by_year[year].append(employee_id)
+
+    now = timezone.now()
+    for year, employee_ids in employees_by_year.items():
+        employee_ids.sort()
+        for offset in range(0, len(employee_ids), BULK_BATCH_SIZE):
+            rows = [(employee_id, totals[employee_id, year]) for employee_id in employee_ids[offset:offset + BULK_BATCH_SIZE]]
+            changes = {'periods': F('periods') + Case(
+                *[When(employee_id=employee_id, then=Value(row[0])) for employee_id, row in rows],
+                output_field=models.PositiveIntegerField(),
+            )}
+            for index, field in enumerate(AMOUNT_FIELDS, start=1):
+                changes[field] = F(field) + Case(
+                    *[When(employee_id=employee_id, then=Value(from_centavos(row[index]))) for employee_id, row in rows],
+                    output_field=models.DecimalField(max_digits=14, decimal_places=2),
+                )
+            YearToDate.objects.filter(year=year, employee_id__in=[employee_id for employee_id, _ in rows]).update(
+                updated_at=now,
+                **changes
+            )
+
+
+def rebuild_year_to_date(year=None):
+    """Recompute the YearToDate rows (all years, or one) from the payslips of posted runs"""
+    payslips = Payslip.objects.filter(POSTED)
+    rows = YearToDate.objects.all()
+    if year is not None:
+        payslips = payslips.filter(payroll_run__period_end__year=year)
+        rows = rows.filter(year=year)
+
+    totals = payslip_totals(payslips)
+    with transaction.atomic():
+        rows.delete()
+        YearToDate.objects.bulk_create([
+            YearToDate(
+                employee_id=employee_id,
+                year=row_year,
+                periods=row[0],
+                **{field: from_centavos(value) for field, value in zip(AMOUNT_FIELDS, row[1:])},
+            )
+            for (employee_id, row_year), row in totals.items()
+        ], batch_size=BULK_BATCH_SIZE)
+    return len(totals)
@@ -62,6 +62,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than in-memory, so payroll worker processes can reach it during tests
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -81,6 +83,18 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Payroll computation: worker processes for large runs (1 = compute in-process)
+PAYROLL_WORKERS = int(os.environ.get('PAYROLL_WORKERS', '1'))
+PAYROLL_PARALLEL_MIN_EMPLOYEES = int(os.environ.get('PAYROLL_PARALLEL_MIN_EMPLOYEES', '2000'))
+# Compute runs (and each worker's shard) with the NumPy engine (payroll.vectorized)
+PAYROLL_VECTORIZED = os.environ.get('PAYROLL_VECTORIZED', '0') == '1'
+# Most employees the run form's preview computes while the request waits; the run itself covers everyone
+PAYROLL_PREVIEW_LIMIT = int(os.environ.get('PAYROLL_PREVIEW_LIMIT', '100'))
+# Record phase timings of payroll runs and exports (PayrollRunMetrics)
+PAYROLL_METRICS = os.environ.get('PAYROLL_METRICS', '1') == '1'
+# Weekly rest days (Monday = 0); holidays and special working days come from CalendarDay
+PAYROLL_REST_DAYS = (5, 6)
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -0,0 +1,246 @@
+"""
+Year-end alphalist and BIR Form 2316
+annual_compensation streams a year's payslips from paid runs, ordered by
+employee, and yields one AnnualCompensation per employee. Only one
+employee's payslips are held at a time, so the memory used does not grow
+with the workforce. The alphalist CSV and the per-employee 2316 PDFs are
+both produced from this generator, one row or certificate at a time, and
+the certificates can be streamed as a zip without building it in memory.
+"""
+import csv
+import zipfile
+from collections import namedtuple
+from datetime import date
+from io import BytesIO
+from itertools import groupby
+from operator import itemgetter
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from contributions.rates import get_rates
+from payroll.models import Payslip
+from payroll.money import to_centavos, from_centavos, centavo_rates
+from payroll.ytd import THIRTEENTH_MONTH_EXEMPTION
+
+
+CHUNK_SIZE = 2000
+
+EMPLOYEE_FIELDS = ('employee_no', 'last_name', 'first_name', 'department', 'position')
+EARNING_FIELDS = ('gross_pay', 'overtime_pay', 'holiday_pay', 'night_differential', 'allowances', 'thirteenth_month_pay')
+CONTRIBUTION_FIELDS = ('sss', 'philhealth', 'pagibig')
+
+# Amounts are centavos; basic is the payslips' gross_pay before overtime and premiums
+AnnualCompensation = namedtuple('AnnualCompensation', (
+    'employee_id', 'employee_no', 'last_name', 'first_name', 'department', 'position', 'periods',
+    'basic', 'overtime', 'holiday', 'night_differential', 'allowances', 'thirteenth_month', 'gross',
+    'sss', 'philhealth', 'pagibig', 'contributions', 'taxable', 'tax_due', 'tax_withheld',
+))
+
+ALPHALIST_HEADER = [
+    'Employee No', 'Last Name', 'First Name', 'Department', 'Position', 'Pay Periods',
+    'Basic Pay', 'Overtime Pay', 'Holiday Pay', 'Night Differential', 'Allowances', '13th Month Pay',
+    'Gross Compensation',
+    'SSS', 'PhilHealth', 'Pag-IBIG', 'Total Contributions', 'Taxable Compensation',
+    'Tax Due', 'Tax Withheld', 'Tax Payable (Refund)',
+]
+
+
+def annual_compensation(year, employees=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield an AnnualCompensation for every employee paid in the year, in
+    employee order. 13th-month pay is taxable only above
+    THIRTEENTH_MONTH_EXEMPTION. Tax due is the annual tax on the year's
+    taxable compensation under the tax table in force on 31 December.
+    """
+    payslips = Payslip.objects.filter(payroll_run__status='PAID', payroll_run__period_end__year=year)
+    if employees is not None:
+        payslips = payslips.filter(employee__in=employees)
+    rows = payslips.order_by('employee_id', 'pk').values_list(
+        'employee_id', 'payroll_run__run_type',
+        *(f'employee__{field}' for field in EMPLOYEE_FIELDS),
+        *EARNING_FIELDS, *CONTRIBUTION_FIELDS, 'tax',
+    ).iterator(chunk_size=chunk_size)
+
+    withholding_tax = centavo_rates(get_rates(as_of=date(year, 12, 31))).withholding_tax
+    amounts_from = 2 + len(EMPLOYEE_FIELDS)
+    for employee_id, slips in groupby(rows, key=itemgetter(0)):
+        totals = [0] * (len(EARNING_FIELDS) + len(CONTRIBUTION_FIELDS) + 1)
+        periods = 0
+        for row in slips:
+            if row[1] != 'THIRTEENTH_MONTH':
+                periods += 1
+            employee = row[2:amounts_from]
+            for index, amount in enumerate(row[amounts_from:]):
+                totals[index] += to_centavos(amount)
+
+        earnings = totals[:len(EARNING_FIELDS)]
+        contributions = totals[len(EARNING_FIELDS):-1]
+        gross = sum(earnings)
+        thirteenth_month = earnings[-1]
+        taxable = (max(gross - thirteenth_month - sum(contributions), 0)
+                   + max(thirteenth_month - THIRTEENTH_MONTH_EXEMPTION, 0))
+        yield AnnualCompensation(
+            employee_id, *employee, periods,
+            *earnings, gross,
+            *contributions, sum(contributions),
+            taxable, withholding_tax(taxable), totals[-1],
+        )
+
+
+class _Echo:
+    """File-like object whose write() hands back what was written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def alphalist_csv(year, employees=None):
+    """Yield the alphalist CSV for the year line by line"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ALPHALIST_HEADER)
+    for row in annual_compensation(year, employees):
+        yield writer.writerow([
+            row.employee_no, row.last_name, row.first_name, row.department, row.position, row.periods,
+            *(from_centavos(value) for value in row[7:]),
+            from_centavos(row.tax_due - row.tax_withheld),
+        ])
+
+
+class Certificate2316Generator:
+    """BIR Form 2316 (certificate of compensation and tax withheld) for one employee"""
+
+    def __init__(self, compensation, year):
+        self.compensation = compensation
+        self.year = year
+
+    def generate(self):
+        """Generate PDF and return BytesIO buffer"""
+        row = self.compensation
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, title=f"BIR 2316 {self.year} {row.employee_no}")
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CertificateTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.HexColor('#2563eb'),
+            spaceAfter=6,
+            alignment=TA_CENTER
+        )
+        subtitle_style = ParagraphStyle('CertificateSubtitle', parent=styles['Normal'], alignment=TA_CENTER)
+
+        story = [
+            Paragraph("BIR Form 2316", title_style),
+            Paragraph(
+                f"Certificate of Compensation Payment / Tax Withheld for the year {self.year}",
+                subtitle_style
+            ),
+            Spacer(1, 20),
+        ]
+
+        employee_table = Table([
+            ['Employee No:', row.employee_no, 'Department:', row.department],
+            ['Name:', f"{row.last_name}, {row.first_name}", 'Position:', row.position],
+            ['Pay Periods:', str(row.periods), 'Year:', str(self.year)],
+        ], colWidths=[1.2 * 72, 2.3 * 72, 1.2 * 72, 2.3 * 72])
+        employee_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        story += [employee_table, Spacer(1, 20)]
+
+        compensation_table = Table([
+            ['Compensation', 'Amount'],
+            ['Basic Pay', self._format_currency(row.basic)],
+            ['Overtime Pay', self._format_currency(row.overtime)],
+            ['Holiday Pay', self._format_currency(row.holiday)],
+            ['Night Differential', self._format_currency(row.night_differential)],
+            ['Allowances', self._format_currency(row.allowances)],
+            ['13th Month Pay', self._format_currency(row.thirteenth_month)],
+            ['Gross Compensation', self._format_currency(row.gross)],
+        ], colWidths=[4.5 * 72, 2.5 * 72])
+        compensation_table.setStyle(self._get_table_style())
+        story += [compensation_table, Spacer(1, 15)]
+
+        tax_table = Table([
+            ['Contributions and Tax', 'Amount'],
+            ['SSS', self._format_currency(row.sss)],
+            ['PhilHealth', self._format_currency(row.philhealth)],
+            ['Pag-IBIG', self._format_currency(row.pagibig)],
+            ['Taxable Compensation', self._format_currency(row.taxable)],
+            ['Tax Due', self._format_currency(row.tax_due)],
+            ['Tax Withheld', self._format_currency(row.tax_withheld)],
+            ['Tax Payable (Refund)', self._format_currency(row.tax_due - row.tax_withheld)],
+        ], colWidths=[4.5 * 72, 2.5 * 72])
+        tax_table.setStyle(self._get_table_style())
+        story.append(tax_table)
+
+        doc.build(story)
+        buffer.seek(0)
+        return buffer
+
+    def _format_currency(self, centavos):
+        """Format centavos as Philippine Peso currency"""
+        return f"₱{from_centavos(centavos):,.2f}"
+
+    def _get_table_style(self):
+        """Common table style"""
+        return TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8fafc')),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f8fafc')),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+
+
+def certificate_filename(compensation, year):
+    return f"2316_{year}_{compensation.employee_no}.pdf"
+
+
+def certificates(year, employees=None):
+    """Yield (filename, PDF bytes) for every employee paid in the year"""
+    for row in annual_compensation(year, employees):
+        yield certificate_filename(row, year), Certificate2316Generator(row, year).generate().getvalue()
+
+
+class _Chunks:
+    """Write-only stream collecting what ZipFile writes until it is taken"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def certificates_zip(year, employees=None):
+    """
+    Yield a zip of the year's 2316 PDFs in pieces, one certificate at a time.
+    The stream is not seekable, so ZipFile writes each entry's sizes after
+    its data and only the entry being written is held in memory.
+    """
+    stream = _Chunks()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, pdf in certificates(year, employees):
+            archive.writestr(filename, pdf)
+            yield stream.take()
+    yield stream.take()
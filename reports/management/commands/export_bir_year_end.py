@@ -0,0 +1,34 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reports.alphalist import alphalist_csv, certificates
+
+
+class Command(BaseCommand):
+    help = 'Writes the year-end alphalist CSV and every employee\'s BIR 2316 PDF, streaming the payslips of paid runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Tax year (default: last year)')
+        parser.add_argument('--output', default='bir_year_end', help='Directory to write the files to')
+        parser.add_argument('--no-pdf', action='store_true', help='Only write the alphalist')
+
+    def handle(self, *args, **options):
+        year = options['year'] or timezone.now().year - 1
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+
+        alphalist = output / f'alphalist_{year}.csv'
+        with alphalist.open('w', newline='', encoding='utf-8') as f:
+            for line in alphalist_csv(year):
+                f.write(line)
+        self.stdout.write(f'Alphalist written to {alphalist}')
+
+        if options['no_pdf']:
+            return
+        folder = output / f'2316_{year}'
+        folder.mkdir(exist_ok=True)
+        count = 0
+        for filename, pdf in certificates(year):
+            (folder / filename).write_bytes(pdf)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} BIR 2316 certificates to {folder}'))
@@ -0,0 +1,70 @@
+import csv
+import zipfile
+from datetime import date
+from io import BytesIO, StringIO
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from payroll.batch import BatchPayrollCalculator
+from payroll.models import PayrollRun, YearToDate
+from payroll.money import to_centavos
+from payroll.tests import create_contribution_tables, create_workforce
+from payroll.workflow import transition_runs
+from .alphalist import annual_compensation
+
+
+class AlphalistTest(TestCase):
+    """The year-end files are built from the paid payslips and match the posted year-to-date totals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_contribution_tables()
+        cls.employees = create_workforce(6, date(2025, 3, 1), date(2025, 3, 31), seed=11)
+        cls.staff = User.objects.create_user('bir-staff')
+        cls.staff.groups.add(Group.objects.get(name='Staff'))
+        runs = []
+        for start, end in ((date(2025, 3, 1), date(2025, 3, 15)), (date(2025, 3, 16), date(2025, 3, 31))):
+            run = PayrollRun.objects.create(period_start=start, period_end=end, status='APPROVED', created_by=cls.staff)
+            BatchPayrollCalculator(start, end).create_payslips(run)
+            runs.append(run)
+        transition_runs(runs, 'PAID', cls.staff)
+        # A run that was never paid is left out
+        draft = PayrollRun.objects.create(period_start=date(2025, 4, 1), period_end=date(2025, 4, 15), created_by=cls.staff)
+        BatchPayrollCalculator(draft.period_start, draft.period_end).create_payslips(draft)
+
+    def test_annual_compensation_matches_year_to_date(self):
+        ytd = {row.employee_id: row for row in YearToDate.objects.filter(year=2025)}
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(annual_compensation(2025, chunk_size=5))
+        self.assertEqual(len(rows), 6)
+        for row in rows:
+            self.assertEqual(row.periods, 2)
+            self.assertEqual(row.gross, to_centavos(ytd[row.employee_id].gross))
+            self.assertEqual(row.contributions, to_centavos(ytd[row.employee_id].contributions))
+            self.assertEqual(row.taxable, to_centavos(ytd[row.employee_id].taxable))
+            self.assertEqual(row.tax_withheld, to_centavos(ytd[row.employee_id].tax_withheld))
+        # Rates plus the payslip stream, however many employees there are
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(list(annual_compensation(2024)), [])
+
+    def test_downloads(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('reports_alphalist', args=[2025]))
+        self.assertTrue(response.streaming)
+        lines = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lines[0][0], 'Employee No')
+        self.assertEqual(len(lines), 7)
+
+        response = self.client.get(reverse('reports_2316', args=[2025]))
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(len(names), 6)
+        self.assertTrue(archive.read(names[0]).startswith(b'%PDF'))
+
+        employee = self.employees[0]
+        response = self.client.get(reverse('reports_2316_employee', args=[2025, employee.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(self.client.get(reverse('reports_2316_employee', args=[2024, employee.pk])).status_code, 404)
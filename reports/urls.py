@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.index, name='reports_index'),
     path('bir/', views.bir_summary, name='reports_bir'),
+    path('bir/<int:year>/alphalist.csv', views.alphalist_export, name='reports_alphalist'),
+    path('bir/<int:year>/2316.zip', views.certificates_export, name='reports_2316'),
+    path('bir/<int:year>/2316/<int:employee_id>/', views.certificate_download, name='reports_2316_employee'),
     path('gsis/', views.gsis_summary, name='reports_gsis'),
     path('export/<str:kind>/', views.export_csv, name='reports_export'),
 ]
@@ -1,19 +1,68 @@
 from django.contrib.auth.decorators import login_required
-from accounts.decorators import group_required
-from django.http import HttpResponse
+from accounts.decorators import group_required, query_budget
+from django.db.models import Count, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from payroll.models import PayrollRun, YearToDate
+from .alphalist import alphalist_csv, annual_compensation, certificates_zip, certificate_filename, Certificate2316Generator
 import csv
 
+@query_budget(8)
 @login_required
 @group_required('Staff')
 def index(request):
     return render(request, 'reports/index.html')
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def bir_summary(request):
-    return render(request, 'reports/bir_summary.html')
+    years = [day.year for day in PayrollRun.objects.filter(status='PAID').dates('period_end', 'year', order='DESC')]
+    try:
+        year = int(request.GET.get('year') or (years[0] if years else timezone.now().year))
+    except ValueError:
+        year = years[0] if years else timezone.now().year
+    # Headline figures come from the posted year-to-date totals; the downloads re-read the payslips
+    totals = YearToDate.objects.filter(year=year).aggregate(
+        employees=Count('pk'),
+        gross=Sum('gross'),
+        taxable=Sum('taxable'),
+        tax_withheld=Sum('tax_withheld'),
+    )
+    return render(request, 'reports/bir_summary.html', {'years': years, 'year': year, 'totals': totals})
 
+
+@login_required
+@group_required('Staff')
+def alphalist_export(request, year: int):
+    """Alphalist of the year's compensation and tax withheld, streamed as CSV"""
+    response = StreamingHttpResponse(alphalist_csv(year), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="alphalist_{year}.csv"'
+    return response
+
+
+@login_required
+@group_required('Staff')
+def certificates_export(request, year: int):
+    """Every employee's BIR 2316 for the year, streamed as a zip"""
+    response = StreamingHttpResponse(certificates_zip(year), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="bir_2316_{year}.zip"'
+    return response
+
+
+@login_required
+@group_required('Staff')
+def certificate_download(request, year: int, employee_id: int):
+    """One employee's BIR 2316 for the year"""
+    compensation = next(annual_compensation(year, employees=[employee_id]), None)
+    if compensation is None:
+        raise Http404("No paid payslips for this employee in that year")
+    response = HttpResponse(Certificate2316Generator(compensation, year).generate().getvalue(), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{certificate_filename(compensation, year)}"'
+    return response
+
+@query_budget(8)
 @login_required
 @group_required('Staff')
 def gsis_summary(request):
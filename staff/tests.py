@@ -1,3 +1,168 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import Group, User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from accounts.models import AuditLog
+from employees.models import Employee, SalaryGrade
+from attendance.models import AttendanceLog, LeaveRequest
+from payroll.models import PayrollRun, Payslip, Loan, OtherDeduction
 
 
+# (url name, attribute holding the object for the url argument) for every staff and employee page
+STAFF_VIEWS = [
+    ('staff_dashboard', None),
+    ('staff_onboarding', None),
+    ('staff_leave_calendar', None),
+    ('staff_attendance_summary', None),
+    ('staff_bank_transfers', None),
+    ('staff_deposit_status', None),
+    ('staff_performance', None),
+    ('staff_benefits', None),
+    ('staff_analytics', None),
+    ('staff_settings', None),
+    ('staff_audit_logs', None),
+    ('employee_list', None),
+    ('employee_create', None),
+    ('employee_update', 'employee'),
+    ('salarygrade_list', None),
+    ('salarygrade_create', None),
+    ('salarygrade_update', 'grade'),
+    ('attendance_list', None),
+    ('attendance_create', None),
+    ('attendance_import', None),
+    ('leave_queue', None),
+    ('payroll_run_list', None),
+    ('payroll_run_create', None),
+    ('payroll_run_payslips', 'payroll_run'),
+    ('payroll_run_progress', 'payroll_run'),
+    ('edit_payroll_run', 'payroll_run'),
+    ('recalculate_payslips', 'payroll_run'),
+    ('mark_salaries_deposited', 'payroll_run'),
+    ('payroll_rate_simulation', None),
+    ('loan_management', None),
+    ('deduction_management', None),
+    ('reports_index', None),
+    ('reports_bir', None),
+    ('reports_gsis', None),
+]
+
+EMPLOYEE_VIEWS = [
+    ('employee_dashboard', None),
+    ('my_salary_info', None),
+    ('leave_submit', None),
+    ('my_leave_history', None),
+    ('my_attendance_records', None),
+    ('my_payslips', None),
+    ('my_payslip_detail', 'payslip'),
+    ('my_deposit_status', None),
+]
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every staff and employee page declares a query budget with
+    accounts.decorators.query_budget. Each page is requested before and after
+    more rows are added everywhere; the query count must not change and must
+    stay within the budget.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('budget-staff', first_name='Budget', last_name='Staff')
+        cls.staff.groups.add(Group.objects.get(name='Staff'))
+        cls.grade = SalaryGrade.objects.create(code='QB1', base_pay=Decimal('25000'))
+        cls.employee = cls.create_employee('QB-SELF')
+        cls.employee.user.groups.add(Group.objects.get(name='Employee'))
+        cls.payroll_run = cls.create_run(date(2025, 3, 1))
+        cls.payslip = Payslip.objects.get(payroll_run=cls.payroll_run, employee=cls.employee)
+        cls.add_rows(2)
+
+    @classmethod
+    def create_employee(cls, employee_no, grade=None):
+        user = User.objects.create_user(f'user-{employee_no}', first_name='Row', last_name=employee_no)
+        return Employee.objects.create(
+            user=user, employee_no=employee_no, first_name='Row', last_name=employee_no,
+            department='IT', position='Staff', salary_grade=grade or cls.grade,
+            date_hired=date.today() - timedelta(days=10), bank_name='BDO', bank_account='001234567890',
+        )
+
+    @classmethod
+    def create_run(cls, period_start, status='DRAFT'):
+        run = PayrollRun.objects.create(
+            period_start=period_start, period_end=period_start + timedelta(days=14),
+            status=status, created_by=User.objects.create_user(f'creator-{period_start}-{status}'),
+        )
+        Payslip.objects.bulk_create([
+            Payslip(payroll_run=run, employee=employee, gross_pay=Decimal('12500'), net_pay=Decimal('11000'),
+                    bank_file_generated=True)
+            for employee in Employee.objects.all()
+        ])
+        return run
+
+    @classmethod
+    def add_rows(cls, count):
+        """Add count more of every kind of row the pages list, for every employee"""
+        start = Employee.objects.count()
+        for i in range(count):
+            grade = SalaryGrade.objects.create(code=f'QB-G{start + i}', base_pay=Decimal('30000'))
+            cls.create_employee(f'QB{start + i:04d}', grade)
+        today = date.today()
+        for employee in Employee.objects.all():
+            for day in range(count):
+                AttendanceLog.objects.get_or_create(
+                    employee=employee, date=today - timedelta(days=day + start),
+                    defaults={'time_in': time(9, 30), 'time_out': time(18, 45)},
+                )
+            LeaveRequest.objects.create(employee=employee, leave_type='Vacation', start_date=today, end_date=today)
+            Loan.objects.create(
+                employee=employee, loan_type='SSS', principal_amount=Decimal('10000'),
+                monthly_deduction=Decimal('500'), remaining_balance=Decimal('9500'), start_date=today,
+            )
+            OtherDeduction.objects.create(employee=employee, description='Uniform', amount=Decimal('100'))
+        for i in range(count):
+            cls.create_run(date(2024, 1 + i + start % 10, 1), status='PAID')
+            AuditLog.objects.create(user=cls.staff, path='/staff/', method='GET')
+
+    def url_for(self, name, target):
+        args = [getattr(self, target).pk] if target else []
+        return reverse(name, args=args)
+
+    def count_queries(self, views, user):
+        self.client.force_login(user)
+        counts = {}
+        for name, target in views:
+            url = self.url_for(name, target)
+            # The first request fills per-process caches (e.g. the compiled rate tables)
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+            counts[name] = len(queries)
+        return counts
+
+    def assertWithinBudget(self, views, user):
+        before = self.count_queries(views, user)
+        self.add_rows(5)
+        after = self.count_queries(views, user)
+        for name, target in views:
+            with self.subTest(view=name):
+                budget = getattr(resolve(self.url_for(name, target)).func, 'query_budget', None)
+                self.assertIsNotNone(budget, f'{name} has no @query_budget')
+                self.assertEqual(after[name], before[name], f'{name} query count grows with rows')
+                self.assertLessEqual(after[name], budget, f'{name} is over its query budget')
+
+    def test_staff_views(self):
+        self.assertWithinBudget(STAFF_VIEWS, self.staff)
+
+    def test_employee_views(self):
+        self.assertWithinBudget(EMPLOYEE_VIEWS, self.employee.user)
+
+    def test_payroll_admin_changelists(self):
+        views = [('admin:payroll_payrollrun_changelist', None), ('admin:payroll_payslip_changelist', None)]
+        admin = User.objects.create_superuser('budget-admin')
+        before = self.count_queries(views, admin)
+        self.add_rows(5)
+        self.assertEqual(self.count_queries(views, admin), before)
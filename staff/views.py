@@ -1,15 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
-from accounts.decorators import group_required
+from accounts.decorators import group_required, query_budget
 from employees.models import Employee, SalaryGrade
-from attendance.models import AttendanceLog, LeaveRequest
+from attendance.models import AttendanceLog, AttendanceSummary, LeaveRequest
 from payroll.models import PayrollRun, Payslip, Loan, OtherDeduction
 
 
+@query_budget(11)
 @login_required
 @group_required('Staff')
 def onboarding_queue(request):
@@ -31,6 +32,7 @@ def onboarding_queue(request):
     })
 
 
+@query_budget(11)
 @login_required
 @group_required('Staff')
 def leave_calendar(request):
@@ -57,6 +59,7 @@ def leave_calendar(request):
     })
 
 
+@query_budget(12)
 @login_required
 @group_required('Staff')
 def attendance_summary(request):
@@ -68,37 +71,44 @@ def attendance_summary(request):
     total_employees = Employee.objects.filter(active=True).count()
     attendance_records = AttendanceLog.objects.filter(
         date__gte=current_month
-    ).select_related('employee')
+    ).select_related('employee', 'summary')
     
 
-    present_today = AttendanceLog.objects.filter(
-        date=timezone.now().date(),
-        time_in__isnull=False
-    ).count()
+    # Today's counts and the month's tardiness (against each employee's shift) and night hours in one query
+    today = timezone.now().date()
+    month = AttendanceSummary.objects.filter(date__gte=current_month).aggregate(
+        present=Count('pk', filter=Q(date=today, present=True)),
+        late=Count('pk', filter=Q(date=today, late_seconds__gt=0)),
+        late_seconds=Sum('late_seconds'),
+        night_seconds=Sum('night_seconds'),
+    )
+    present_today = month['present']
     
     absent_today = total_employees - present_today
     
 
-    late_today = AttendanceLog.objects.filter(
-        date=timezone.now().date(),
-        time_in__gt='09:00:00'
-    ).count()
+    late_today = month['late']
     
     return render(request, 'staff/attendance_summary.html', {
         'total_employees': total_employees,
         'present_today': present_today,
         'absent_today': absent_today,
         'late_today': late_today,
+        'month_late_hours': (month['late_seconds'] or 0) / 3600,
+        'month_night_hours': (month['night_seconds'] or 0) / 3600,
         'attendance_records': attendance_records[:50],  # Recent 50 records
     })
 
 
+@query_budget(14)
 @login_required
 @group_required('Staff')
 def bank_transfers(request):
     """Manage bank transfers and salary deposits"""
 
-    payroll_runs = PayrollRun.objects.all().order_by('-created_at')[:10]
+    payroll_runs = PayrollRun.objects.select_related('created_by').annotate(
+        payslip_count=Count('payslips')
+    ).order_by('-created_at')[:10]
     
 
     recent_payslips = Payslip.objects.select_related(
@@ -127,20 +137,40 @@ def bank_transfers(request):
         'total_deposited': total_deposited,
     })
 
+@query_budget(11)
 @login_required
 @group_required('Staff')
 def deposit_status(request):
     """View detailed deposit status for all employees"""
 
-    employees_with_deposits = Employee.objects.filter(
+    latest_payslip = Payslip.objects.filter(
+        employee=OuterRef('pk')
+    ).order_by('-created_at', '-pk').values('pk')[:1]
+    employees_with_deposits = list(Employee.objects.filter(
         active=True
-    ).select_related('user').prefetch_related('payslip_set')
+    ).select_related('user').annotate(latest_payslip_id=Subquery(latest_payslip)))
+    
+
+    # Latest payslips (with their runs) in one query instead of one per employee
+    payslips = Payslip.objects.select_related('payroll_run').in_bulk(
+        [employee.latest_payslip_id for employee in employees_with_deposits if employee.latest_payslip_id]
+    )
+    for employee in employees_with_deposits:
+        employee.latest_payslip = payslips.get(employee.latest_payslip_id)
+    
+    deposited_count = sum(
+        1 for employee in employees_with_deposits
+        if employee.latest_payslip and employee.latest_payslip.salary_deposited
+    )
     
     return render(request, 'staff/deposit_status.html', {
         'employees_with_deposits': employees_with_deposits,
+        'deposited_count': deposited_count,
+        'pending_count': len(employees_with_deposits) - deposited_count,
     })
 
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def performance_reviews(request):
@@ -160,6 +190,7 @@ def performance_reviews(request):
         'employees': employees,
     })
 
+@query_budget(14)
 @login_required
 @group_required('Staff')
 def benefits_management(request):
@@ -190,6 +221,7 @@ def benefits_management(request):
     })
 
 
+@query_budget(16)
 @login_required
 @group_required('Staff')
 def hr_analytics(request):
@@ -236,6 +268,7 @@ def hr_analytics(request):
     })
 
 
+@query_budget(13)
 @login_required
 @group_required('Staff')
 def hr_settings(request):
@@ -246,7 +279,9 @@ def hr_settings(request):
     total_leave_requests = LeaveRequest.objects.count()
     
 
-    salary_grades = SalaryGrade.objects.all().order_by('code', 'step')
+    salary_grades = SalaryGrade.objects.annotate(
+        employee_count=Count('employee')
+    ).order_by('code', 'step')
     
     return render(request, 'staff/hr_settings.html', {
         'total_payroll_runs': total_payroll_runs,
@@ -255,6 +290,7 @@ def hr_settings(request):
         'salary_grades': salary_grades,
     })
 
+@query_budget(10)
 @login_required
 @group_required('Staff')
 def audit_logs(request):